@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo da árvore k-d do algoritmo de filtragem (Kanungo et al., 2002).
+
+A árvore é construída uma única vez sobre ``sementes`` e guarda, em cada nó,
+a caixa delimitadora dos seus elementos, a sua soma e a sua massa
+(ponderadas). Em cada iteração do k-means, ``filtrar`` percorre a árvore
+de cima para baixo levando, em cada nó, o conjunto de medioides candidatos:
+
+1. :math:`z^*` é o candidato mais próximo do centro da caixa do nó.
+2. Um candidato :math:`z` é descartado se, mesmo no vértice da caixa mais
+   favorável a ele (o mais avançado na direção :math:`z - z^*`), está mais
+   longe que :math:`z^*`; então nenhum elemento do nó é mais próximo de
+   :math:`z`.
+3. Se resta um único candidato, a soma e a massa do nó inteiro vão para
+   ele, sem visitar os seus elementos; nas folhas com mais de um candidato,
+   as distâncias são calculadas somente aos candidatos restantes.
+
+Com poucas variáveis, a maior parte dos nós termina com um único candidato
+muito acima das folhas, e o custo de cada iteração cresce bem mais devagar
+que :math:`n K`. A travessia é feita nível a nível, com todos os nós de um
+nível processados de uma vez (em blocos, dentro do orçamento de memória).
+
+A mesma árvore serve a todas as iterações, rodadas e valores de k de uma
+varredura: os medioides mudam, os dados não.
+
+Exemplo:
+
+.. code-block:: python
+
+    arvore = construir_arvore_kd(sementes)
+    resultado = k_means(..., sementes, ..., algorithm="filtragem",
+                        arvore_kd=arvore)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions.blocos_de_memoria as bm
+
+# Número máximo de elementos em uma folha
+_TAMANHO_DA_FOLHA = 32
+
+
+def construir_arvore_kd(sementes: np.ndarray,
+                        pesos: Optional[np.ndarray] = None,
+                        tamanho_da_folha: int = _TAMANHO_DA_FOLHA) -> Dict[str, Any]:
+    """
+    Constrói a árvore k-d das sementes, com somas e massas por nó.
+
+    Cada nó é dividido na mediana da variável de maior amplitude, até que
+    tenha no máximo ``tamanho_da_folha`` elementos. Os nós de um mesmo nível
+    são divididos de uma vez, com uma única ordenação de todos os elementos.
+
+    :param sementes: Matriz de dados densa (n x p). float.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :param tamanho_da_folha: Número máximo de elementos em uma folha. int.
+    :returns: Dicionário com os elementos reordenados pela árvore
+        (``ordem``, ``pontos``, ``normas`` e ``pesos``) e, por nó, ``inicios``
+        e ``fins`` (faixa dos seus elementos em ``pontos``), ``minimos``,
+        ``maximos``, ``somas``, ``massas``, ``esquerdos`` e ``direitos``
+        (-1 nas folhas).
+    """
+    if sp.issparse(sementes):
+        raise ValueError("A árvore k-d exige sementes densas.")
+    if tamanho_da_folha < 1:
+        raise ValueError("O tamanho da folha deve ser maior ou igual a 1.")
+
+    pontos = np.array(sementes, copy=True)
+    n = pontos.shape[0]
+    ordem = np.arange(n)
+    if pesos is not None:
+        pesos = np.array(pesos, dtype=float).ravel()
+
+    # Segmentos do nível atual (partição de 0..n) e os seus nós
+    inicios = np.zeros(1, dtype=np.intp)
+    nos_dos_segmentos = np.zeros(1, dtype=np.intp)
+    novos = np.ones(1, dtype=bool)
+    num_de_nos = 1
+    por_nivel: Dict[str, list] = {"inicios": [], "tamanhos": [], "minimos": [],
+                                  "maximos": [], "somas": [], "massas": []}
+    pais, esquerdos, direitos = [], [], []
+
+    while True:
+        tamanhos = np.diff(np.append(inicios, n))
+        minimos = np.minimum.reduceat(pontos, inicios, axis=0)
+        maximos = np.maximum.reduceat(pontos, inicios, axis=0)
+
+        # Os nós criados neste nível recebem caixa, soma e massa
+        ponderados = pontos if pesos is None else pontos * pesos[:, np.newaxis]
+        por_nivel["inicios"].append(inicios[novos])
+        por_nivel["tamanhos"].append(tamanhos[novos])
+        por_nivel["minimos"].append(minimos[novos])
+        por_nivel["maximos"].append(maximos[novos])
+        por_nivel["somas"].append(
+            np.add.reduceat(ponderados, inicios, axis=0, dtype=float)[novos])
+        por_nivel["massas"].append(
+            tamanhos[novos].astype(float) if pesos is None
+            else np.add.reduceat(pesos, inicios)[novos])
+
+        dividir = novos & (tamanhos > tamanho_da_folha)
+        if not np.any(dividir):
+            break
+
+        # Ordenação de cada segmento a dividir pela variável de maior
+        # amplitude: a chave é o segmento mais a posição relativa (em [0, 1])
+        # do elemento nessa variável, de modo que uma única ordenação serve a
+        # todos os segmentos
+        segmento_de_cada_ponto = np.repeat(np.arange(inicios.size), tamanhos)
+        amplitudes = maximos - minimos
+        variaveis = np.argmax(amplitudes, axis=1)
+        linhas = np.arange(inicios.size)
+        escalas = np.where(dividir, 1.0 / np.maximum(amplitudes[linhas, variaveis],
+                                                     np.finfo(float).tiny), 0.0)
+        chaves = (pontos[np.arange(n), variaveis[segmento_de_cada_ponto]] -
+                  minimos[linhas, variaveis][segmento_de_cada_ponto]) * \
+            escalas[segmento_de_cada_ponto]
+        chaves += 2.0 * segmento_de_cada_ponto
+        permutacao = np.argsort(chaves, kind="stable")
+        pontos = pontos[permutacao]
+        ordem = ordem[permutacao]
+        if pesos is not None:
+            pesos = pesos[permutacao]
+
+        # Cada segmento dividido vira dois filhos, separados na mediana
+        divididos = np.flatnonzero(dividir)
+        ids_esquerdos = num_de_nos + 2 * np.arange(divididos.size)
+        ids_direitos = ids_esquerdos + 1
+        num_de_nos += 2 * divididos.size
+        pais.append(nos_dos_segmentos[divididos])
+        esquerdos.append(ids_esquerdos)
+        direitos.append(ids_direitos)
+
+        nos_dos_segmentos = nos_dos_segmentos.copy()
+        nos_dos_segmentos[divididos] = ids_esquerdos
+        inicios = np.concatenate(
+            (inicios, inicios[divididos] + tamanhos[divididos] // 2))
+        nos_dos_segmentos = np.concatenate((nos_dos_segmentos, ids_direitos))
+        novos = np.concatenate((dividir, np.ones(divididos.size, dtype=bool)))
+        posicoes = np.argsort(inicios, kind="stable")
+        inicios = inicios[posicoes]
+        nos_dos_segmentos = nos_dos_segmentos[posicoes]
+        novos = novos[posicoes]
+
+    # Os nós de cada nível foram criados em ordem crescente de identificador
+    arvore = {chave: np.concatenate(valores) for chave, valores in por_nivel.items()}
+    arvore["fins"] = arvore["inicios"] + arvore.pop("tamanhos")
+    arvore["esquerdos"] = np.full(num_de_nos, -1, dtype=np.intp)
+    arvore["direitos"] = np.full(num_de_nos, -1, dtype=np.intp)
+    if pais:
+        arvore["esquerdos"][np.concatenate(pais)] = np.concatenate(esquerdos)
+        arvore["direitos"][np.concatenate(pais)] = np.concatenate(direitos)
+    arvore["ordem"] = ordem
+    arvore["pontos"] = pontos
+    arvore["normas"] = np.einsum("ij,ij->i", pontos, pontos)
+    arvore["pesos"] = pesos
+
+    return arvore
+
+
+def _posicoes_das_faixas(inicios: np.ndarray, fins: np.ndarray) -> np.ndarray:
+    """
+    Concatena as posições de várias faixas ``[inicio, fim)``.
+
+    :param inicios: Início de cada faixa. int.
+    :param fins: Fim (exclusivo) de cada faixa. int.
+    :returns: Posições de todas as faixas, na ordem das faixas. int.
+    """
+    tamanhos = fins - inicios
+    deslocamentos = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    return deslocamentos + np.arange(int(np.sum(tamanhos)))
+
+
+def _somar_por_cluster(soma_medioides: np.ndarray, ks: np.ndarray,
+                       valores: np.ndarray) -> None:
+    """
+    Soma, por cluster, as linhas de ``valores`` em ``soma_medioides``.
+
+    :param soma_medioides: Soma por cluster (K x p), atualizada no lugar. float.
+    :param ks: Cluster de cada linha. int.
+    :param valores: Linhas a somar. float.
+    """
+    K = soma_medioides.shape[0]
+    for j in range(soma_medioides.shape[1]):
+        soma_medioides[:, j] += np.bincount(ks, weights=valores[:, j], minlength=K)
+
+
+def filtrar(arvore: Dict[str, Any],
+            medioides: np.ndarray,
+            com_etiquetas: bool = False,
+            memoria_maxima: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray,
+                                                           Optional[np.ndarray], int]:
+    """
+    Atribui os elementos aos medioides pela árvore k-d, com poda de candidatos.
+
+    :param arvore: Árvore de ``construir_arvore_kd``.
+    :param medioides: Medioides (K x p). float.
+    :param com_etiquetas: Se True, retorna também a etiqueta de cada elemento. bool.
+    :param memoria_maxima: Orçamento de memória por bloco de nós em bytes
+        (opcional). int.
+    :returns: (soma_medioides (K x p), num_de_elementos_na_soma (K,),
+        ks_min (n,) na ordem original ou None, distancias_calculadas), em que
+        a soma e o número de elementos são os da atribuição aos medioides
+        dados (ponderados, se a árvore tiver pesos).
+    """
+    medioides = np.asarray(medioides, dtype=float)
+    K, num_de_variaveis = medioides.shape
+    pontos, pesos = arvore["pontos"], arvore["pesos"]
+    n = pontos.shape[0]
+    normas_medioides = np.einsum("ij,ij->i", medioides, medioides)
+    medioides_no_tipo = medioides.astype(pontos.dtype, copy=False)
+
+    soma_medioides = np.zeros((K, num_de_variaveis))
+    num_de_elementos_na_soma = np.zeros(K)
+    ks_min = np.empty(n, dtype=np.intp) if com_etiquetas else None
+    faixas_inteiras = []
+    calculadas = 0
+
+    # Memória de trabalho por nó: caixa, centro e raio (p) e quatro
+    # vetores de candidatos (K)
+    nos_por_bloco = bm.num_de_linhas_por_bloco(
+        (4 * num_de_variaveis + 4 * K) * 8, memoria_maxima)
+
+    nos = np.zeros(1, dtype=np.intp)
+    candidatos = np.ones((1, K), dtype=bool)
+    while nos.size > 0:
+        proximos_nos, proximos_candidatos = [], []
+        for bloco in bm.blocos(nos.size, nos_por_bloco):
+            nos_do_bloco = nos[bloco]
+            candidatos_do_bloco = candidatos[bloco]
+            minimos = arvore["minimos"][nos_do_bloco]
+            maximos = arvore["maximos"][nos_do_bloco]
+
+            # z*: candidato mais próximo do centro da caixa
+            centros = (minimos + maximos) / 2.0
+            raios = (maximos - minimos) / 2.0
+            produtos = centros @ medioides.T
+            distancias = normas_medioides - 2.0 * produtos
+            distancias[~candidatos_do_bloco] = np.inf
+            melhores = np.argmin(distancias, axis=1)
+            calculadas += int(np.sum(candidatos_do_bloco))
+
+            # Com u = z - z* e v o vértice da caixa mais avançado na direção
+            # u, |z - v|^2 - |z* - v|^2 = |z|^2 - |z*|^2 - 2 (u.c + |u|.r),
+            # em que c é o centro e r o meio-lado da caixa
+            linhas = np.arange(nos_do_bloco.size)
+            avancos = produtos - produtos[linhas, melhores][:, np.newaxis]
+            for melhor in np.unique(melhores):
+                do_melhor = melhores == melhor
+                avancos[do_melhor] += raios[do_melhor] @ \
+                    np.abs(medioides - medioides[melhor]).T
+            podados = normas_medioides - normas_medioides[melhores][:, np.newaxis] - \
+                2.0 * avancos >= 0.0
+            podados[linhas, melhores] = False
+            candidatos_do_bloco = candidatos_do_bloco & ~podados
+
+            # Nós com um único candidato: o nó inteiro vai para ele
+            unicos = np.sum(candidatos_do_bloco, axis=1) == 1
+            nos_unicos = nos_do_bloco[unicos]
+            _somar_por_cluster(soma_medioides, melhores[unicos],
+                               arvore["somas"][nos_unicos])
+            num_de_elementos_na_soma += np.bincount(
+                melhores[unicos], weights=arvore["massas"][nos_unicos], minlength=K)
+            if com_etiquetas:
+                faixas_inteiras.append((arvore["inicios"][nos_unicos],
+                                        arvore["fins"][nos_unicos],
+                                        melhores[unicos]))
+
+            # Folhas com mais de um candidato: distâncias elemento a elemento
+            folhas = ~unicos & (arvore["esquerdos"][nos_do_bloco] < 0)
+            if np.any(folhas):
+                inicios = arvore["inicios"][nos_do_bloco[folhas]]
+                fins = arvore["fins"][nos_do_bloco[folhas]]
+                posicoes = _posicoes_das_faixas(inicios, fins)
+                candidatos_dos_pontos = np.repeat(candidatos_do_bloco[folhas],
+                                                  fins - inicios, axis=0)
+                valores = pontos[posicoes]
+                distancias = valores @ medioides_no_tipo.T
+                distancias *= -2.0
+                distancias += arvore["normas"][posicoes][:, np.newaxis]
+                distancias += normas_medioides[np.newaxis, :]
+                distancias[~candidatos_dos_pontos] = np.inf
+                ks = np.argmin(distancias, axis=1)
+                calculadas += int(np.sum(candidatos_dos_pontos))
+
+                if pesos is not None:
+                    valores = valores * pesos[posicoes][:, np.newaxis]
+                _somar_por_cluster(soma_medioides, ks, valores)
+                num_de_elementos_na_soma += np.bincount(
+                    ks, weights=None if pesos is None else pesos[posicoes],
+                    minlength=K)
+                if com_etiquetas:
+                    ks_min[posicoes] = ks
+
+            # Demais nós: os dois filhos herdam os candidatos restantes
+            internos = ~unicos & ~folhas
+            proximos_nos.append(arvore["esquerdos"][nos_do_bloco[internos]])
+            proximos_nos.append(arvore["direitos"][nos_do_bloco[internos]])
+            proximos_candidatos.extend([candidatos_do_bloco[internos]] * 2)
+
+        nos = np.concatenate(proximos_nos)
+        candidatos = np.concatenate(proximos_candidatos)
+
+    if com_etiquetas:
+        for inicios, fins, ks in faixas_inteiras:
+            ks_min[_posicoes_das_faixas(inicios, fins)] = np.repeat(ks, fins - inicios)
+        # De volta à ordem original dos elementos
+        etiquetas = np.empty_like(ks_min)
+        etiquetas[arvore["ordem"]] = ks_min
+        ks_min = etiquetas
+
+    return soma_medioides, num_de_elementos_na_soma, ks_min, calculadas
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de particionamento em blocos com limite de memória.
+
+Define quantas linhas da matriz de dados são processadas por bloco, de modo
+que a memória de trabalho de cada bloco (linhas de dados mais a matriz de
+distâncias do bloco) caiba em um orçamento: o tamanho do cache L2 do
+processador, por padrão, ou um limite de memória dado pelo usuário.
+
+Exemplo:
+
+.. code-block:: python
+
+    linhas = num_de_linhas_por_bloco(bytes_por_linha)
+    for bloco in blocos(n, linhas):
+        ...  # sementes[bloco]
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+from typing import Iterator, Optional
+
+# Tamanho de cache assumido quando o sistema não o informa (bytes)
+_TAMANHO_DO_CACHE_PADRAO = {2: 1024 ** 2, 3: 8 * 1024 ** 2}
+
+# Menor número de linhas por bloco, para diluir o custo fixo de cada
+# produto matricial
+_NUM_MIN_DE_LINHAS_POR_BLOCO = 256
+
+
+def _ler_tamanho(texto: str) -> int:
+    """
+    Converte um tamanho como ``"2048K"`` ou ``"8M"`` em bytes.
+
+    :param texto: Tamanho informado pelo sistema.
+    :returns: Tamanho em bytes.
+    """
+    texto = texto.strip().upper()
+    multiplicadores = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if texto and texto[-1] in multiplicadores:
+        return int(texto[:-1]) * multiplicadores[texto[-1]]
+    return int(texto)
+
+
+def tamanho_do_cache(nivel: int = 2) -> int:
+    """
+    Retorna o tamanho do cache de dados do nível pedido, em bytes.
+
+    Consulta ``os.sysconf`` e, no Linux, ``/sys/devices/system/cpu``; sem
+    essas informações, usa um valor típico (1 MiB para L2 e 8 MiB para L3).
+
+    :param nivel: Nível do cache (2 ou 3).
+    :returns: Tamanho do cache em bytes.
+    """
+    try:
+        tamanho = os.sysconf("SC_LEVEL" + str(nivel) + "_CACHE_SIZE")
+        if tamanho > 0:
+            return int(tamanho)
+    except (ValueError, OSError, AttributeError):
+        pass
+
+    for diretorio in glob.glob("/sys/devices/system/cpu/cpu0/cache/index*"):
+        try:
+            with open(os.path.join(diretorio, "level")) as arquivo:
+                nivel_do_indice = int(arquivo.read())
+            with open(os.path.join(diretorio, "type")) as arquivo:
+                tipo = arquivo.read().strip()
+            with open(os.path.join(diretorio, "size")) as arquivo:
+                tamanho = _ler_tamanho(arquivo.read())
+        except (OSError, ValueError):
+            continue
+        if nivel_do_indice == nivel and tipo in ("Data", "Unified"):
+            return tamanho
+
+    return _TAMANHO_DO_CACHE_PADRAO.get(nivel, _TAMANHO_DO_CACHE_PADRAO[2])
+
+
+def num_de_linhas_por_bloco(bytes_por_linha: int,
+                            memoria_maxima: Optional[int] = None) -> int:
+    """
+    Calcula o número de linhas por bloco dentro do orçamento de memória.
+
+    :param bytes_por_linha: Memória de trabalho de uma linha do bloco (bytes).
+    :param memoria_maxima: Orçamento por bloco em bytes; se omitido, o
+        tamanho do cache L2.
+    :returns: Número de linhas por bloco (ao menos 1).
+    """
+    if memoria_maxima is None:
+        memoria_maxima = tamanho_do_cache(2)
+        minimo = _NUM_MIN_DE_LINHAS_POR_BLOCO
+    else:
+        # Um orçamento explícito é um teto rígido
+        minimo = 1
+    return max(minimo, int(memoria_maxima) // max(int(bytes_por_linha), 1))
+
+
+def blocos(n: int, linhas_por_bloco: int) -> Iterator[slice]:
+    """
+    Percorre as ``n`` linhas em fatias consecutivas.
+
+    :param n: Número total de linhas.
+    :param linhas_por_bloco: Número de linhas por fatia.
+    :returns: Iterador de ``slice``.
+    """
+    for inicio in range(0, n, linhas_por_bloco):
+        yield slice(inicio, min(inicio + linhas_por_bloco, n))
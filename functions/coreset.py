@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de construção de coresets por amostragem de sensibilidade.
+
+Um coreset é um pequeno subconjunto ponderado de ``sementes`` cujo custo de
+k-means, para quaisquer medioides, aproxima o custo do conjunto completo.
+Toda a varredura de k (e os índices de validação e de estabilidade) pode
+ser executada sobre o coreset; as etiquetas finais de cada k são depois
+atribuídas ao conjunto completo em uma única passagem
+(``functions.k_means.atribuir_etiquetas``).
+
+Construção (amostragem de sensibilidade):
+
+1. Um sorteio k-means++ fornece K medioides :math:`B` e a atribuição de
+   cada elemento ao seu medioide mais próximo :math:`b(x)`.
+2. A sensibilidade de cada elemento é limitada por
+
+   .. math:: s(x) = \dfrac{w(x) \, d(x, B)^2}{\sum_y w(y) \, d(y, B)^2}
+                    + \dfrac{w(x)}{\sum_{y : b(y) = b(x)} w(y)},
+
+   cuja soma é :math:`S \le 1 + K`.
+3. São sorteados :math:`m` elementos com probabilidade :math:`q(x) = s(x) / S`
+   e cada um recebe o peso :math:`w(x) / (m \, q(x))`; sorteios repetidos do
+   mesmo elemento somam os seus pesos.
+
+O tamanho padrão é :math:`m = \lceil S / \varepsilon^2 \rceil`: o erro
+relativo do custo cai com :math:`1 / \sqrt{m}` e os fatores de dimensão e
+de confiança da garantia teórica são omitidos. ``erro_relativo_do_coreset``
+mede o erro obtido para medioides concretos.
+
+Exemplo:
+
+.. code-block:: python
+
+    coreset, pesos, _ = construir_coreset(sementes, K, epsilon=0.05)
+    resultado = k_means(..., coreset, ..., sample_weight=pesos)
+    resultado = atribuir_etiquetas(sementes, resultado[1])
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+import functions.k_means as km
+import functions.sortear_sementes as ss
+
+# Menor número de linhas da amostra usada no sorteio k-means++ quando a
+# matriz está em disco
+_NUM_MIN_DE_LINHAS_DA_AMOSTRA_EM_DISCO = 10000
+
+
+def construir_coreset(sementes,
+                      K: int,
+                      epsilon: float = 0.1,
+                      tamanho: Optional[int] = None,
+                      gerador=None,
+                      pesos: Optional[np.ndarray] = None,
+                      dtype=np.float64,
+                      memoria_maxima: Optional[int] = None) -> Tuple[object, np.ndarray, np.ndarray]:
+    r"""
+    Constrói um coreset ponderado por amostragem de sensibilidade.
+
+    :param sementes: Matriz de dados (n x p): densa, esparsa (CSR),
+        ``np.memmap`` ou caminho de um arquivo ``.npy``.
+    :param K: Número de medioides do sorteio k-means++ (o maior k da
+        varredura).
+    :param epsilon: Erro relativo desejado do custo; define o tamanho padrão.
+    :param tamanho: Número de sorteios :math:`m` (opcional; substitui o
+        tamanho obtido de ``epsilon``).
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param pesos: Pesos dos elementos (n,), opcional.
+    :param dtype: Tipo de dado do cálculo das distâncias.
+    :param memoria_maxima: Teto, em bytes, da memória de cada bloco (opcional).
+    :returns: Tupla ``(coreset, pesos_do_coreset, indices)``, em que
+        ``indices`` são as linhas de ``sementes`` que formam o coreset, em
+        ordem crescente. Se :math:`m \ge n`, o próprio conjunto completo.
+    """
+    if epsilon <= 0.0:
+        raise ValueError("O erro relativo do coreset deve ser positivo.")
+
+    gerador = ss.obter_gerador(gerador)
+    if isinstance(sementes, (str, os.PathLike)):
+        sementes = np.load(sementes, mmap_mode="r")
+    em_disco = isinstance(sementes, np.memmap)
+    if not em_disco:
+        sementes = km.converter_sementes(sementes, dtype)
+    n = sementes.shape[0]
+    pesos = np.ones(n) if pesos is None else np.asarray(pesos, dtype=float).ravel()
+
+    # 1. Medioides k-means++ (sobre uma amostra de linhas, se em disco)
+    if em_disco:
+        linhas = np.unique(gerador.choice(
+            n, min(n, max(_NUM_MIN_DE_LINHAS_DA_AMOSTRA_EM_DISCO, 20 * K))))
+        medioides = ss.sortear_sementes_k_means_pp(
+            np.asarray(sementes[linhas], dtype=dtype), K, gerador=gerador,
+            pesos=pesos[linhas])
+    else:
+        medioides = ss.sortear_sementes_k_means_pp(sementes, K, gerador=gerador,
+                                                   pesos=pesos)
+    distancias, _, ks_min, _ = km.atribuir_etiquetas(sementes, medioides, dtype,
+                                                     memoria_maxima)
+    distancias = distancias.ravel()
+    ks_min = ks_min.ravel()
+
+    # 2. Limite de sensibilidade de cada elemento
+    custos = pesos * distancias ** 2
+    custo_total = float(np.sum(custos))
+    massas = np.bincount(ks_min, weights=pesos, minlength=K)
+    sensibilidades = pesos / massas[ks_min]
+    if custo_total > 0.0:
+        sensibilidades += custos / custo_total
+    sensibilidade_total = float(np.sum(sensibilidades))
+
+    if tamanho is None:
+        tamanho = int(math.ceil(sensibilidade_total / epsilon ** 2))
+    if tamanho >= n:
+        return sementes, pesos, np.arange(n)
+
+    # 3. Sorteio proporcional à sensibilidade, com pesos de importância
+    probabilidades = sensibilidades / sensibilidade_total
+    indices, repeticoes = np.unique(gerador.choice(n, tamanho, p=probabilidades),
+                                    return_counts=True)
+    pesos_do_coreset = repeticoes * pesos[indices] / (tamanho * probabilidades[indices])
+    coreset = sementes[indices]
+    if em_disco:
+        coreset = np.ascontiguousarray(coreset, dtype=dtype)
+
+    return coreset, pesos_do_coreset, indices
+
+
+def erro_relativo_do_coreset(sementes, coreset, pesos_do_coreset: np.ndarray,
+                             medioides: np.ndarray,
+                             pesos: Optional[np.ndarray] = None,
+                             dtype=np.float64) -> float:
+    r"""
+    Mede o erro relativo do custo de k-means do coreset para dados medioides.
+
+    :param sementes: Matriz de dados completa (n x p).
+    :param coreset: Linhas do coreset (m x p).
+    :param pesos_do_coreset: Pesos do coreset (m,).
+    :param medioides: Medioides (K x p).
+    :param pesos: Pesos dos elementos completos (n,), opcional.
+    :param dtype: Tipo de dado do cálculo das distâncias.
+    :returns: :math:`|\phi_C - \phi_X| / \phi_X`, em que :math:`\phi` é a soma
+        ponderada das distâncias quadradas aos medioides.
+    """
+    def custo(dados, pesos_dos_dados):
+        distancias = km.atribuir_etiquetas(dados, medioides, dtype)[0].ravel()
+        if pesos_dos_dados is None:
+            return float(np.sum(distancias ** 2))
+        return float(np.dot(pesos_dos_dados, distancias ** 2))
+
+    custo_completo = custo(sementes, pesos)
+    if custo_completo == 0.0:
+        return 0.0
+    return abs(custo(coreset, pesos_do_coreset) - custo_completo) / custo_completo
@@ -11,16 +11,19 @@ Bloco Sphinx de referência:
 
 Notas:
   - Kneedle, distância à corda, regressão segmentada e curvatura discreta.
-  - Índices Silhouette, Calinski–Harabasz, Davies–Bouldin.
+  - Índices Silhouette, Calinski–Harabasz, Davies–Bouldin (também sobre
+    matrizes esparsas, sem densificá-las).
   - Estabilidade por re-inicializações (ARI médio).
 """
 
 from __future__ import annotations
 
 import math
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
+import scipy.sparse as sp
+from sklearn import config_context
 
 try:
     # scikit-learn 0.20 compat
@@ -167,17 +170,113 @@ def summarize_elbow(x: Sequence[float], y: Sequence[float]) -> Dict[str, int]:
     }
 
 
+def _sparse_centroids(data: sp.spmatrix,
+                      labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcula os centróides (densos) de uma matriz esparsa por cluster.
+
+    :param data: Matriz de dados esparsa (n x p).
+    :param labels: Rótulos (n,).
+    :returns: Tupla ``(y, counts, centroids)`` com os rótulos reindexados
+        em 0..k-1, o tamanho de cada cluster e os centróides (k x p).
+    """
+    _, y = np.unique(labels, return_inverse=True)
+    n = data.shape[0]
+    n_labels = int(y.max()) + 1
+    if not 1 < n_labels < n:
+        raise ValueError("Number of labels must be between 2 and n_samples - 1.")
+    # Matriz indicadora (k x n): a soma por cluster percorre só os não nulos
+    indicator = sp.csr_matrix((np.ones(n), (y, np.arange(n))), shape=(n_labels, n))
+    sums = np.asarray((indicator @ data).toarray(), dtype=float)
+    counts = np.bincount(y, minlength=n_labels).astype(float)
+    return y, counts, sums / counts[:, np.newaxis]
+
+
+def _sparse_calinski_harabasz_score(data: sp.spmatrix, labels: np.ndarray) -> float:
+    r"""
+    Calinski–Harabasz para matrizes esparsas.
+
+    A dispersão intra-cluster é :math:`\sum_i \|x_i\|^2 - \sum_l n_l \|c_l\|^2`,
+    de modo que nenhuma diferença densa :math:`x_i - c_l` é formada.
+
+    :param data: Matriz de dados esparsa (n x p).
+    :param labels: Rótulos (n,).
+    :returns: Índice de Calinski–Harabasz (mesma definição do scikit-learn).
+    """
+    data = sp.csr_matrix(data)
+    n = data.shape[0]
+    _, counts, centroids = _sparse_centroids(data, labels)
+    n_labels = centroids.shape[0]
+    mean = np.asarray(data.mean(axis=0, dtype=float)).ravel()
+    extra_disp = float(np.sum(counts * np.sum((centroids - mean) ** 2, axis=1)))
+    total = float(data.multiply(data).sum(dtype=float))
+    intra_disp = max(total - float(np.sum(counts * np.sum(centroids ** 2, axis=1))), 0.0)
+    if intra_disp == 0.0:
+        return 1.0
+    return extra_disp * (n - n_labels) / (intra_disp * (n_labels - 1.0))
+
+
+def _sparse_davies_bouldin_score(data: sp.spmatrix, labels: np.ndarray) -> float:
+    r"""
+    Davies–Bouldin para matrizes esparsas.
+
+    A distância de cada elemento ao seu centróide usa
+    :math:`\|x\|^2 - 2 x \cdot c + \|c\|^2`, com o produto escalar sobre os
+    valores não nulos.
+
+    :param data: Matriz de dados esparsa (n x p).
+    :param labels: Rótulos (n,).
+    :returns: Índice de Davies–Bouldin (mesma definição do scikit-learn).
+    """
+    data = sp.csr_matrix(data)
+    y, counts, centroids = _sparse_centroids(data, labels)
+    rows = np.repeat(np.arange(data.shape[0]), np.diff(data.indptr))
+    values = data.data.astype(float)
+    dots = np.bincount(rows, weights=values * centroids[y[rows], data.indices],
+                       minlength=data.shape[0])
+    norms = np.bincount(rows, weights=values ** 2, minlength=data.shape[0])
+    centroid_norms = np.sum(centroids ** 2, axis=1)
+    dists = np.sqrt(np.maximum(norms - 2.0 * dots + centroid_norms[y], 0.0))
+    intra_dists = np.bincount(y, weights=dists) / counts
+
+    centroid_distances = np.sqrt(np.maximum(
+        centroid_norms[:, np.newaxis] + centroid_norms[np.newaxis, :] -
+        2.0 * centroids @ centroids.T, 0.0))
+    np.fill_diagonal(centroid_distances, 0.0)
+    if np.allclose(intra_dists, 0) or np.allclose(centroid_distances, 0):
+        return 0.0
+    centroid_distances[centroid_distances == 0] = np.inf
+    combined_intra_dists = intra_dists[:, np.newaxis] + intra_dists
+    return float(np.mean(np.max(combined_intra_dists / centroid_distances, axis=1)))
+
+
 def validation_indices(
     data: np.ndarray,
     labels_per_k: Dict[int, np.ndarray],
+    working_memory: Optional[int] = None,
 ) -> Dict[str, Dict[int, float]]:
     r"""
     Calcula Silhouette, Calinski–Harabasz e Davies–Bouldin por k.
 
-    :param data: Matriz de dados (n x p).
+    O Silhouette percorre a matriz de distâncias (n x n) em blocos de linhas;
+    ``working_memory`` limita a memória de cada bloco. Com ``data`` esparsa
+    (``scipy.sparse``), nenhum dos índices densifica a matriz.
+
+    :param data: Matriz de dados (n x p), densa ou esparsa.
     :param labels_per_k: Dicionário {k: labels (n,)}.
+    :param working_memory: Teto de memória por bloco, em MiB (opcional;
+        padrão do scikit-learn, 1024 MiB).
     :returns: Dicionário de métricas por nome e k.
     """
+    if working_memory is not None:
+        with config_context(working_memory=working_memory):
+            return validation_indices(data, labels_per_k)
+
+    if sp.issparse(data):
+        ch_score, db_score = _sparse_calinski_harabasz_score, _sparse_davies_bouldin_score
+    else:
+        ch_score, db_score = calinski_harabasz_score, davies_bouldin_score
+
     metrics: Dict[str, Dict[int, float]] = {"silhouette": {}, "calinski_harabasz": {}, "davies_bouldin": {}}
     for k, y_pred in labels_per_k.items():
         # Requer ao menos 2 clusters e menos que n amostras
@@ -190,14 +289,14 @@ def validation_indices(
         try:
             # Compatibilidade de nome
             try:
-                ch = float(calinski_harabasz_score(data, y_pred))  # type: ignore
+                ch = float(ch_score(data, y_pred))  # type: ignore
             except Exception:
-                ch = float(calinski_harabasz_score(data, y_pred))  # noqa
+                ch = float(ch_score(data, y_pred))  # noqa
             metrics["calinski_harabasz"][k] = ch
         except Exception:
             metrics["calinski_harabasz"][k] = float("nan")
         try:
-            metrics["davies_bouldin"][k] = float(davies_bouldin_score(data, y_pred))
+            metrics["davies_bouldin"][k] = float(db_score(data, y_pred))
         except Exception:
             metrics["davies_bouldin"][k] = float("nan")
     return metrics
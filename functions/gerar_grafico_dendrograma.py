@@ -61,7 +61,8 @@ def gerar_grafico_dendrograma(endereco,
                               populacao,
                               titulo_do_eixo_x_do_dendrograma,
                               k_large,
-                              num_max_I):
+                              num_max_I,
+                              ligacao=None):
     """
     Gera e salva um gráfico dendrograma com base nos dados fornecidos.
 
@@ -73,14 +74,23 @@ def gerar_grafico_dendrograma(endereco,
     :param titulo_do_eixo_x_do_dendrograma: Título do eixo X do gráfico.
     :param k_large: Número total de cluster. int. 
     :param num_max_I: Número máximo de iterações. int.
+    :param ligacao: Matriz de ligação pronta (n - 1 x 4), por exemplo a árvore
+        de divisões do k-means bissecante (``ligacao_das_divisoes``). Sem ela,
+        a ligação de Ward é calculada sobre as distâncias ótimas normalizadas.
 
     :return None
     """
     
-    # Normalização das distâncias
-    distancias_otimas = distancias_otimas / np.max(distancias_otimas)
-    Y = pd.DataFrame(distancias_otimas).loc[:, 0].values
-    Z = linkage(np.reshape(Y, (len(Y), 1)), "ward")
+    if ligacao is None:
+        # Normalização das distâncias
+        distancias_otimas = distancias_otimas / np.max(distancias_otimas)
+        Y = pd.DataFrame(distancias_otimas).loc[:, 0].values
+        Z = linkage(np.reshape(Y, (len(Y), 1)), "ward")
+        titulo_do_eixo_y = "Distâncias Ótimas Normalizadas"
+    else:
+        # Hierarquia já calculada: nenhuma ligação é recalculada
+        Z = ligacao
+        titulo_do_eixo_y = "WS Total Normalizado Antes da Divisão"
 
     # Configuração da exibição dos gráficos
     np.set_printoptions(precision=4, suppress=True)
@@ -105,7 +115,7 @@ def gerar_grafico_dendrograma(endereco,
     subchart.set_title(r"Dendrograma Para Uma População máxima de " + \
                        str(populacao) + r" e $ K = $" + str(k) + " clusteres")
     subchart.set_xlabel(titulo_do_eixo_x_do_dendrograma)
-    subchart.set_ylabel("Distâncias Ótimas Normalizadas")
+    subchart.set_ylabel(titulo_do_eixo_y)
     figure.tight_layout()  # Use 'figure' em vez de 'plt' para aplicar tight_layout na figura inteira
 
     # Encontrar a raiz do projeto (um nível acima de 'functions')
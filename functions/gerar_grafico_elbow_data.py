@@ -5,6 +5,7 @@ from typing import Dict, List, Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
+import scipy.sparse as sp
 from matplotlib.ticker import MaxNLocator
 
 from .elbow_detection import summarize_elbow, validation_indices
@@ -15,7 +16,8 @@ def gerar_grafico_elbow_data(endereco,
                              WSs_total_otimo,
                              num_max_I,
                              sementes: Optional[np.ndarray] = None,
-                             ks_min_otimos_lista: Optional[List[np.ndarray]] = None) -> Dict[str, int]:
+                             ks_min_otimos_lista: Optional[List[np.ndarray]] = None,
+                             working_memory: Optional[int] = None) -> Dict[str, int]:
     r"""
     Gera, anota e salva o gráfico Elbow e um relatório objetivo.
 
@@ -24,8 +26,10 @@ def gerar_grafico_elbow_data(endereco,
     :param k_large: k final (inteiro).
     :param WSs_total_otimo: Lista/array com a distorção por k.
     :param num_max_I: Número máximo de iterações do k-means.
-    :param sementes: Dados originais (n x p), opcional (para índices).
+    :param sementes: Dados originais (n x p), densos ou esparsos, opcional
+        (para índices).
     :param ks_min_otimos_lista: Lista de rótulos por k (cada um (n, 1)), opcional.
+    :param working_memory: Teto de memória por bloco dos índices, em MiB (opcional).
     :returns: Dicionário com os k sugeridos por método.
     """
 
@@ -51,7 +55,12 @@ def gerar_grafico_elbow_data(endereco,
             y_pred = np.asarray(ks_min_otimos_lista[idx], dtype=int).ravel()
             labels_per_k[int(k)] = y_pred
         try:
-            metrics = validation_indices(np.asarray(sementes, dtype=float), labels_per_k)
+            # float32 é mantido, sem cópia em float64; esparsas não são densificadas
+            dados = sementes if sp.issparse(sementes) else np.asarray(sementes)
+            if dados.dtype not in (np.float32, np.float64):
+                dados = dados.astype(float)
+            metrics = validation_indices(dados, labels_per_k,
+                                         working_memory=working_memory)
         except Exception:
             metrics = {}
 
@@ -1,156 +1,1904 @@
 # -*- coding: utf-8 -*-
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import scipy.sparse as sp
+import functions.arvore_kd as akd
+import functions.blocos_de_memoria as bm
+import functions.linhas_repetidas as lr
+import functions.memoria_compartilhada as mc
 import functions.sortear_sementes as ss
 
-def k_means(num_de_k_inicial, K, sementes, num_max_I):
+
+def _normas_quadradas(matriz):
+    r"""
+    Calcula a norma euclidiana quadrada de cada linha da matriz.
+
+    :param matriz: Matriz (linhas x variáveis), densa ou esparsa (CSR). float.
+    :returns: Vetor com :math:`\|x_i\|^2` de cada linha. float.
+    """
+    if sp.issparse(matriz):
+        return np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel()
+    return np.einsum("ij,ij->i", matriz, matriz)
+
+
+def converter_sementes(sementes, dtype=np.float64):
+    """
+    Converte as sementes, uma única vez, na matriz usada em todos os cálculos.
+
+    Matrizes densas viram uma matriz C-contígua do tipo ``dtype``; matrizes
+    esparsas (``scipy.sparse``) viram uma matriz CSR do tipo ``dtype`` em
+    formato canônico (colunas ordenadas e sem repetições em cada linha).
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa. float.
+    :param dtype: ``np.float64`` ou ``np.float32``.
+    :returns: Matriz de dados convertida (sem cópia, se já estiver no formato).
+    """
+    if not sp.issparse(sementes):
+        return np.ascontiguousarray(sementes, dtype=dtype)
+
+    sementes = sp.csr_matrix(sementes, dtype=dtype)
+    if not sementes.has_canonical_format:
+        sementes = sementes.copy()
+        sementes.sum_duplicates()
+    return sementes
+
+
+def _linha_densa(sementes, indice):
+    """
+    Retorna uma linha da matriz de dados como vetor denso.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR). float.
+    :param indice: Índice da linha. int.
+    :returns: Linha (p,). float.
+    """
+    if sp.issparse(sementes):
+        return sementes[indice].toarray().ravel()
+    return sementes[indice]
+
+
+def _distancias_quadradas(sementes, medioides, normas_sementes=None):
+    r"""
+    Calcula as distâncias euclidianas quadradas entre elementos e medioides.
+
+    Usa a expansão :math:`\|x\|^2 - 2 x \cdot c + \|c\|^2`, de modo que o
+    custo dominante é um único produto matricial (BLAS), calculado no tipo de
+    dado das sementes (float32 ou float64). Com sementes esparsas (CSR), o
+    produto percorre somente os valores não nulos e o resultado é denso.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR). float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param normas_sementes: Normas quadradas das sementes (n,), opcional. float.
+    :returns: Matriz de distâncias quadradas (n x K), no tipo das sementes. float.
+    """
+    if normas_sementes is None:
+        normas_sementes = _normas_quadradas(sementes)
+
+    medioides = medioides.astype(sementes.dtype, copy=False)
+    distancias = sementes @ medioides.T
+    distancias *= -2.0
+    distancias += normas_sementes[:, np.newaxis]
+    distancias += _normas_quadradas(medioides)[np.newaxis, :]
+    # Erros de arredondamento podem gerar valores levemente negativos
+    np.maximum(distancias, 0.0, out=distancias)
+
+    return distancias
+
+
+def _linhas_por_bloco(sementes, K, memoria_maxima=None):
+    """
+    Calcula quantos elementos são atribuídos por bloco.
+
+    A memória de trabalho de um bloco são as suas linhas de dados (com
+    sementes esparsas, os valores não nulos e os seus índices de coluna) mais
+    a sua matriz de distâncias (linhas x K).
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR). float.
+    :param K: Número de medioides. int.
+    :param memoria_maxima: Orçamento por bloco em bytes; se omitido, o cache
+        L2 (ver ``functions.blocos_de_memoria``). int.
+    :returns: Número de linhas por bloco. int.
+    """
+    itemsize = sementes.dtype.itemsize
+    if sp.issparse(sementes):
+        nao_nulos_por_linha = sementes.nnz / max(sementes.shape[0], 1)
+        bytes_por_linha = int(K * itemsize + nao_nulos_por_linha *
+                              (itemsize + sementes.indices.itemsize))
+    else:
+        bytes_por_linha = (K + sementes.shape[1]) * itemsize
+    return bm.num_de_linhas_por_bloco(bytes_por_linha, memoria_maxima)
+
+
+def _atribuir(sementes, medioides, normas_sementes=None, memoria_maxima=None):
+    """
+    Associa cada elemento ao medioide mais próximo.
+
+    Os elementos são processados em blocos de linhas, de modo que a matriz de
+    distâncias completa (n x K) nunca é alocada.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param normas_sementes: Normas quadradas das sementes (n,), opcional. float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :returns: Vetor ks_min (n,) com o índice do medioide de menor distância. int.
+    """
+    if normas_sementes is None:
+        normas_sementes = _normas_quadradas(sementes)
+
+    n = sementes.shape[0]
+    ks_min = np.empty(n, dtype=np.intp)
+    for bloco in bm.blocos(n, _linhas_por_bloco(sementes, medioides.shape[0],
+                                                memoria_maxima)):
+        distancias = _distancias_quadradas(sementes[bloco], medioides,
+                                           normas_sementes[bloco])
+        ks_min[bloco] = np.argmin(distancias, axis=1)
+
+    return ks_min
+
+
+def _distancias_por_pares(sementes, medioides, indices_sementes,
+                         indices_medioides, tamanho_do_bloco=65536):
+    """
+    Calcula as distâncias euclidianas para pares (elemento, medioide).
+
+    Os pares são processados em blocos para limitar a memória temporária.
+    Com sementes esparsas (CSR), ver ``_distancias_esparsas_por_pares``.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR). float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param indices_sementes: Índices dos elementos de cada par (m,). int.
+    :param indices_medioides: Índices dos medioides de cada par (m,). int.
+    :param tamanho_do_bloco: Número de pares por bloco. int.
+    :returns: Vetor de distâncias euclidianas (m,). float.
+    """
+    distancias = np.empty(len(indices_sementes), dtype=float)
+    if sp.issparse(sementes):
+        normas_medioides = _normas_quadradas(np.asarray(medioides, dtype=float))
+    for inicio in range(0, len(indices_sementes), tamanho_do_bloco):
+        fim = inicio + tamanho_do_bloco
+        if sp.issparse(sementes):
+            distancias[inicio:fim] = _distancias_esparsas_por_pares(
+                sementes[indices_sementes[inicio:fim]], medioides,
+                normas_medioides, indices_medioides[inicio:fim])
+            continue
+        diferencas = sementes[indices_sementes[inicio:fim]] - \
+            medioides[indices_medioides[inicio:fim]]
+        distancias[inicio:fim] = np.sqrt(_normas_quadradas(diferencas))
+
+    return distancias
+
+
+def _distancias_esparsas_por_pares(linhas, medioides, normas_medioides,
+                                   indices_medioides):
+    r"""
+    Calcula as distâncias euclidianas entre linhas esparsas e medioides.
+
+    Usa :math:`\|x\|^2 - 2 x \cdot c + \|c\|^2`, em que o produto escalar
+    percorre somente os valores não nulos de cada linha; o medioide denso
+    não é subtraído da linha.
+
+    :param linhas: Linhas dos elementos de cada par (m x p), CSR. float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param normas_medioides: Normas quadradas dos medioides (K,). float.
+    :param indices_medioides: Índice do medioide de cada linha (m,). int.
+    :returns: Vetor de distâncias euclidianas (m,). float.
+    """
+    m = linhas.shape[0]
+    linha_de_cada_valor = np.repeat(np.arange(m), np.diff(linhas.indptr))
+    valores = linhas.data.astype(float)
+    produtos = np.bincount(
+        linha_de_cada_valor,
+        weights=valores * medioides[indices_medioides[linha_de_cada_valor],
+                                    linhas.indices],
+        minlength=m)
+    normas_linhas = np.bincount(linha_de_cada_valor, weights=valores ** 2,
+                                minlength=m)
+    distancias = normas_linhas - 2.0 * produtos + normas_medioides[indices_medioides]
+
+    return np.sqrt(np.maximum(distancias, 0.0))
+
+
+def _distancias_aos_medioides(sementes, medioides, ks_min):
+    """
+    Calcula a distância de cada elemento ao medioide do cluster atribuído.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param ks_min: Índice do medioide atribuído a cada elemento (n,). int.
+    :returns: Vetor de distâncias euclidianas (n,). float.
+    """
+    return _distancias_por_pares(sementes, medioides,
+                                 np.arange(sementes.shape[0]), ks_min)
+
+
+def _ws_total(sementes, medioides, ks_min, pesos=None):
+    """
+    Calcula o WS total: a soma (ponderada) das distâncias aos medioides.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param ks_min: Índice do medioide atribuído a cada elemento (n,). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :returns: WS total. float.
+    """
+    distancias = _distancias_aos_medioides(sementes, medioides, ks_min)
+    if pesos is None:
+        return float(np.sum(distancias))
+    return float(np.dot(pesos, distancias))
+
+
+def _distancias_entre_medioides(medioides):
+    """
+    Calcula a matriz de distâncias euclidianas entre os medioides.
+
+    :param medioides: Matriz de medioides (K x p). float.
+    :returns: Matriz simétrica de distâncias (K x K) com diagonal nula. float.
+    """
+    distancias = np.sqrt(_distancias_quadradas(medioides, medioides))
+    np.fill_diagonal(distancias, 0.0)
+
+    return distancias
+
+
+def _contabilizar(estatisticas, calculadas, evitadas):
+    """
+    Acumula o número de distâncias calculadas e evitadas nas estatísticas.
+
+    Cada chamada corresponde a uma passagem de atribuição e registra também a
+    taxa de poda (fração das distâncias evitadas) dessa passagem.
+
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param calculadas: Distâncias elemento-medioide calculadas. int.
+    :param evitadas: Distâncias elemento-medioide evitadas pela poda. int.
+    """
+    estatisticas["distancias_calculadas"] += int(calculadas)
+    estatisticas["distancias_evitadas"] += int(evitadas)
+    total = calculadas + evitadas
+    estatisticas["taxas_de_poda_por_iteracao"].append(
+        float(evitadas) / total if total > 0 else 0.0)
+
+
+def _acumular(sementes, ks_min, K, pesos=None):
+    """
+    Acumula, por cluster, a soma dos elementos e o número de elementos.
+
+    A soma é feita por variável com ``np.bincount``, que acumula sempre em
+    float64, mesmo com sementes em float32. Com sementes esparsas (CSR),
+    cada valor não nulo é somado diretamente na posição (cluster, variável).
+    Com pesos, a soma é ponderada e o número de elementos é a soma dos pesos.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR). float.
+    :param ks_min: Índice do medioide atribuído a cada elemento (n,). int.
+    :param K: Número de k-clusters. int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :returns: (soma_medioides (K x p), num_de_elementos_na_soma (K,))
+    """
+    num_de_variaveis = sementes.shape[1]
+    if sp.issparse(sementes):
+        cluster_de_cada_valor = np.repeat(ks_min, np.diff(sementes.indptr))
+        valores = sementes.data
+        if pesos is not None:
+            valores = valores * np.repeat(pesos, np.diff(sementes.indptr))
+        soma_medioides = np.bincount(
+            cluster_de_cada_valor * num_de_variaveis + sementes.indices,
+            weights=valores,
+            minlength=K * num_de_variaveis).reshape(K, num_de_variaveis)
+    else:
+        soma_medioides = np.empty((K, num_de_variaveis), dtype=float)
+        for j in range(num_de_variaveis):
+            valores = sementes[:, j] if pesos is None else pesos * sementes[:, j]
+            soma_medioides[:, j] = np.bincount(ks_min, weights=valores,
+                                               minlength=K)
+    num_de_elementos_na_soma = np.bincount(ks_min, weights=pesos, minlength=K)
+
+    return soma_medioides, num_de_elementos_na_soma
+
+
+def _reparar_clusters_vazios(sementes, medioides, ks_min, soma_medioides,
+                             num_de_elementos_na_soma, estatisticas,
+                             reparo_de_vazios="mais_distante", gerador=None,
+                             pesos=None):
+    """
+    Realoca cada cluster vazio para um único elemento de outro cluster.
+
+    Com ``"mais_distante"``, o elemento escolhido é o mais distante do medioide
+    do seu cluster; com ``"maior_cluster"``, é sorteado do maior cluster. O
+    elemento passa a ser o único do cluster vazio, de modo que o novo medioide
+    coincide com ele. Somente as atribuições dos elementos movidos mudam;
+    ``ks_min``, ``soma_medioides`` e ``num_de_elementos_na_soma`` são
+    atualizados no próprio lugar. Com pesos, ``num_de_elementos_na_soma`` é
+    a soma dos pesos e o maior cluster é o de maior soma.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Medioides da atribuição atual (K x p). float.
+    :param ks_min: Índice do medioide atribuído a cada elemento (n,). int.
+    :param soma_medioides: Soma dos elementos por cluster (K x p). float.
+    :param num_de_elementos_na_soma: Número de elementos por cluster (K,). int.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param reparo_de_vazios: ``"mais_distante"`` ou ``"maior_cluster"``. str.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :returns: Índices dos elementos movidos (um por cluster vazio). int.
+    """
+    vazios = np.flatnonzero(num_de_elementos_na_soma == 0)
+    if vazios.size == 0:
+        return vazios
+
+    # Com pesos, a elegibilidade do doador usa o número de elementos
+    if pesos is None:
+        contagens = num_de_elementos_na_soma
+    else:
+        contagens = np.bincount(ks_min, minlength=num_de_elementos_na_soma.size)
+
+    movidos = np.empty(vazios.size, dtype=int)
+    if reparo_de_vazios == "mais_distante":
+        distancias = _distancias_aos_medioides(sementes, medioides, ks_min)
+        estatisticas["distancias_calculadas"] += sementes.shape[0]
+
+    for posicao, vazio in enumerate(vazios):
+        if reparo_de_vazios == "mais_distante":
+            # Somente clusters com mais de um elemento podem ceder um elemento
+            elegiveis = contagens[ks_min] > 1
+            elemento = int(np.argmax(np.where(elegiveis, distancias, -1.0)))
+            distancias[elemento] = -1.0
+        else:
+            maior = int(np.argmax(num_de_elementos_na_soma))
+            elemento = int(ss.obter_gerador(gerador).choice(
+                np.flatnonzero(ks_min == maior)))
+
+        doador = ks_min[elemento]
+        peso = 1 if pesos is None else pesos[elemento]
+        linha = peso * _linha_densa(sementes, elemento)
+        soma_medioides[doador] -= linha
+        num_de_elementos_na_soma[doador] -= peso
+        soma_medioides[vazio] = linha
+        num_de_elementos_na_soma[vazio] = peso
+        if pesos is not None:
+            contagens[doador] -= 1
+            contagens[vazio] = 1
+        ks_min[elemento] = vazio
+        movidos[posicao] = elemento
+
+    estatisticas["reparos_de_clusters_vazios"] += int(vazios.size)
+
+    return movidos
+
+
+def _convergiu(medioides, medioides_anteriores, tolerancia):
+    """
+    Verifica a convergência pelo deslocamento dos medioides.
+
+    :param medioides: Medioides atualizados (K x p). float.
+    :param medioides_anteriores: Medioides da iteração anterior (K x p). float.
+    :param tolerancia: Soma máxima dos deslocamentos quadrados; com 0, exige
+        medioides idênticos. float.
+    :returns: True se a rodada convergiu. bool.
+    """
+    if tolerancia <= 0.0:
+        return bool(np.array_equal(medioides, medioides_anteriores))
+    return float(np.sum((medioides - medioides_anteriores) ** 2)) <= tolerancia
+
+
+def _executar_lloyd(sementes, medioides, num_max_iteracoes, normas_sementes,
+                    estatisticas, gerador=None,
+                    reparo_de_vazios="mais_distante", tolerancia=0.0,
+                    memoria_maxima=None, pesos=None):
+    """
+    Executa uma rodada do algoritmo de Lloyd a partir dos medioides dados.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param reparo_de_vazios: Reparo de clusters vazios (ver
+        ``_reparar_clusters_vazios``). str.
+    :param tolerancia: Tolerância de convergência (ver ``_convergiu``). float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, convergiu)
+    """
+
+    n = sementes.shape[0]
+    K = medioides.shape[0]
+
+    ks_min = _atribuir(sementes, medioides, normas_sementes, memoria_maxima)
+    _contabilizar(estatisticas, n * K, 0)
+
+    iteracoes = 0
+    convergiu = False
+    while convergiu is False and iteracoes < num_max_iteracoes:
+
+        soma_medioides, num_de_elementos_na_soma = _acumular(sementes, ks_min, K,
+                                                             pesos)
+        # Cada cluster vazio recebe um único elemento de outro cluster
+        _reparar_clusters_vazios(sementes, medioides, ks_min, soma_medioides,
+                                 num_de_elementos_na_soma, estatisticas,
+                                 reparo_de_vazios, gerador, pesos)
+
+        # recalcular (média dos pontos aglutinados), novos medioides
+        medioides_anteriores = medioides
+        medioides = soma_medioides / num_de_elementos_na_soma[:, np.newaxis]
+
+        # associar cada elemento ao novo medioide de menor distância
+        ks_min = _atribuir(sementes, medioides, normas_sementes, memoria_maxima)
+        _contabilizar(estatisticas, n * K, 0)
+
+        convergiu = _convergiu(medioides, medioides_anteriores, tolerancia)
+        iteracoes = iteracoes + 1
+
+    WS_total = _ws_total(sementes, medioides, ks_min, pesos)
+
+    return medioides, ks_min, WS_total, iteracoes, convergiu
+
+
+def _executar_elkan(sementes, medioides, num_max_iteracoes, normas_sementes,
+                    estatisticas, gerador=None,
+                    reparo_de_vazios="mais_distante", tolerancia=0.0,
+                    memoria_maxima=None, pesos=None):
+    r"""
+    Executa uma rodada do k-means de Elkan a partir dos medioides dados.
+
+    Mantém, para cada elemento, um limite superior da distância ao medioide
+    atribuído e um limite inferior da distância a cada medioide (n x K).
+    Pela desigualdade triangular, a distância ao medioide :math:`k` só é
+    calculada quando o limite superior excede tanto o limite inferior de
+    :math:`k` quanto metade da distância entre o medioide atual e :math:`k`.
+    As atribuições obtidas são idênticas às do algoritmo de Lloyd. Os próprios
+    limites inferiores ocupam :math:`O(nK)` de memória, de modo que
+    ``memoria_maxima`` limita apenas as matrizes temporárias.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param reparo_de_vazios: Reparo de clusters vazios (ver
+        ``_reparar_clusters_vazios``). str.
+    :param tolerancia: Tolerância de convergência (ver ``_convergiu``). float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, convergiu)
+    """
+
+    n = sementes.shape[0]
+    K = medioides.shape[0]
+    indices = np.arange(n)
+
+    def inicializar_limites(medioides):
+        # Na primeira atribuição todas as distâncias são calculadas, em
+        # blocos de linhas, diretamente na matriz de limites inferiores
+        limites_inferiores = np.empty((n, K), dtype=sementes.dtype)
+        for bloco in bm.blocos(n, _linhas_por_bloco(sementes, K, memoria_maxima)):
+            limites_inferiores[bloco] = _distancias_quadradas(
+                sementes[bloco], medioides, normas_sementes[bloco])
+            np.sqrt(limites_inferiores[bloco], out=limites_inferiores[bloco])
+        ks_min = np.argmin(limites_inferiores, axis=1)
+        limites_superiores = limites_inferiores[indices, ks_min]
+        _contabilizar(estatisticas, n * K, 0)
+        return ks_min, limites_superiores, limites_inferiores
+
+    ks_min, limites_superiores, limites_inferiores = inicializar_limites(medioides)
+
+    iteracoes = 0
+    convergiu = False
+    while convergiu is False and iteracoes < num_max_iteracoes:
+
+        soma_medioides, num_de_elementos_na_soma = _acumular(sementes, ks_min, K,
+                                                             pesos)
+        # Cada cluster vazio recebe um único elemento de outro cluster
+        movidos = _reparar_clusters_vazios(sementes, medioides, ks_min,
+                                           soma_medioides, num_de_elementos_na_soma,
+                                           estatisticas, reparo_de_vazios, gerador,
+                                           pesos)
+        if movidos.size > 0:
+            # Limites dos elementos movidos: distância exata ao medioide
+            # (ainda não deslocado) do novo cluster e inferiores nulos
+            limites_superiores[movidos] = \
+                _distancias_por_pares(sementes, medioides, movidos, ks_min[movidos])
+            limites_inferiores[movidos] = 0.0
+            estatisticas["distancias_calculadas"] += int(movidos.size)
+
+        # recalcular (média dos pontos aglutinados), novos medioides
+        medioides_anteriores = medioides
+        medioides = soma_medioides / num_de_elementos_na_soma[:, np.newaxis]
+
+        # O deslocamento de cada medioide afrouxa os limites
+        deslocamentos = np.sqrt(_normas_quadradas(medioides - medioides_anteriores))
+        limites_inferiores -= deslocamentos[np.newaxis, :]
+        np.maximum(limites_inferiores, 0.0, out=limites_inferiores)
+        limites_superiores += deslocamentos[ks_min]
+
+        # Metade da distância de cada medioide ao medioide vizinho mais próximo
+        metades = 0.5 * _distancias_entre_medioides(medioides)
+        metades_vizinho = np.where(np.eye(K, dtype=bool), np.inf, metades).min(axis=1)
+
+        calculadas = 0
+        candidatos = np.flatnonzero(limites_superiores > metades_vizinho[ks_min])
+        if candidatos.size > 0:
+            ks_atuais = ks_min[candidatos]
+            linhas = np.arange(candidatos.size)
+
+            def mascara_de_candidatos(superiores):
+                mascara = (superiores[:, np.newaxis] > limites_inferiores[candidatos]) & \
+                          (superiores[:, np.newaxis] > metades[ks_atuais])
+                mascara[linhas, ks_atuais] = False
+                return mascara
+
+            mascara = mascara_de_candidatos(limites_superiores[candidatos])
+            ativos = mascara.any(axis=1)
+            candidatos = candidatos[ativos]
+            ks_atuais = ks_atuais[ativos]
+            linhas = np.arange(candidatos.size)
+
+            # Apertar o limite superior com a distância exata ao medioide atual
+            superiores = _distancias_por_pares(sementes, medioides, candidatos, ks_atuais)
+            limites_inferiores[candidatos, ks_atuais] = superiores
+            calculadas = calculadas + candidatos.size
+
+            # Calcular somente as distâncias que os limites não descartam
+            mascara = mascara_de_candidatos(superiores)
+            linhas_calculadas, ks_calculados = np.nonzero(mascara)
+            distancias = _distancias_por_pares(sementes, medioides,
+                                               candidatos[linhas_calculadas],
+                                               ks_calculados)
+            limites_inferiores[candidatos[linhas_calculadas], ks_calculados] = distancias
+            calculadas = calculadas + distancias.size
+
+            melhores = np.full(mascara.shape, np.inf)
+            melhores[linhas, ks_atuais] = superiores
+            melhores[linhas_calculadas, ks_calculados] = distancias
+            ks_novos = np.argmin(melhores, axis=1)
+            ks_min[candidatos] = ks_novos
+            limites_superiores[candidatos] = melhores[linhas, ks_novos]
+
+        _contabilizar(estatisticas, calculadas, n * K - calculadas)
+
+        convergiu = _convergiu(medioides, medioides_anteriores, tolerancia)
+        iteracoes = iteracoes + 1
+
+    WS_total = _ws_total(sementes, medioides, ks_min, pesos)
+
+    return medioides, ks_min, WS_total, iteracoes, convergiu
+
+
+def _executar_hamerly(sementes, medioides, num_max_iteracoes, normas_sementes,
+                      estatisticas, gerador=None,
+                      reparo_de_vazios="mais_distante", tolerancia=0.0,
+                      memoria_maxima=None, pesos=None):
+    r"""
+    Executa uma rodada do k-means de Hamerly a partir dos medioides dados.
+
+    Mantém apenas dois limites por elemento: um superior para a distância ao
+    medioide atribuído e um inferior para a distância ao segundo medioide mais
+    próximo, de modo que a memória é :math:`O(n)`. Quando o limite superior não
+    excede o maior entre o limite inferior e metade da distância do medioide
+    atual ao seu vizinho mais próximo, nenhuma distância do elemento é
+    calculada. As atribuições obtidas são idênticas às do algoritmo de Lloyd.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param reparo_de_vazios: Reparo de clusters vazios (ver
+        ``_reparar_clusters_vazios``). str.
+    :param tolerancia: Tolerância de convergência (ver ``_convergiu``). float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, convergiu)
+    """
+
+    n = sementes.shape[0]
+    K = medioides.shape[0]
+
+    linhas_por_bloco = _linhas_por_bloco(sementes, K, memoria_maxima)
+
+    def limites_exatos(indices_sementes, medioides):
+        # Distâncias ao medioide mais próximo e ao segundo mais próximo,
+        # calculadas em blocos de linhas
+        ks_min = np.empty(indices_sementes.size, dtype=np.intp)
+        superiores = np.empty(indices_sementes.size, dtype=float)
+        inferiores = np.empty(indices_sementes.size, dtype=float)
+        for bloco in bm.blocos(indices_sementes.size, linhas_por_bloco):
+            indices = indices_sementes[bloco]
+            distancias = np.sqrt(_distancias_quadradas(sementes[indices], medioides,
+                                                       normas_sementes[indices]))
+            linhas = np.arange(indices.size)
+            ks_do_bloco = np.argmin(distancias, axis=1)
+            ks_min[bloco] = ks_do_bloco
+            superiores[bloco] = distancias[linhas, ks_do_bloco]
+            distancias[linhas, ks_do_bloco] = np.inf
+            inferiores[bloco] = distancias.min(axis=1)
+        return ks_min, superiores, inferiores
+
+    def inicializar_limites(medioides):
+        ks_min, limites_superiores, limites_inferiores = \
+            limites_exatos(np.arange(n), medioides)
+        _contabilizar(estatisticas, n * K, 0)
+        return ks_min, limites_superiores, limites_inferiores
+
+    ks_min, limites_superiores, limites_inferiores = inicializar_limites(medioides)
+
+    iteracoes = 0
+    convergiu = False
+    while convergiu is False and iteracoes < num_max_iteracoes:
+
+        soma_medioides, num_de_elementos_na_soma = _acumular(sementes, ks_min, K,
+                                                             pesos)
+        # Cada cluster vazio recebe um único elemento de outro cluster
+        movidos = _reparar_clusters_vazios(sementes, medioides, ks_min,
+                                           soma_medioides, num_de_elementos_na_soma,
+                                           estatisticas, reparo_de_vazios, gerador,
+                                           pesos)
+        if movidos.size > 0:
+            # Limites dos elementos movidos: distância exata ao medioide
+            # (ainda não deslocado) do novo cluster e inferiores nulos
+            limites_superiores[movidos] = \
+                _distancias_por_pares(sementes, medioides, movidos, ks_min[movidos])
+            limites_inferiores[movidos] = 0.0
+            estatisticas["distancias_calculadas"] += int(movidos.size)
+
+        # recalcular (média dos pontos aglutinados), novos medioides
+        medioides_anteriores = medioides
+        medioides = soma_medioides / num_de_elementos_na_soma[:, np.newaxis]
+
+        # O limite inferior diminui pelo maior deslocamento entre os demais
+        # medioides (o segundo maior, se o maior for o do próprio cluster)
+        deslocamentos = np.sqrt(_normas_quadradas(medioides - medioides_anteriores))
+        ordem = np.argsort(deslocamentos)[::-1]
+        maior_deslocamento = np.full(K, deslocamentos[ordem[0]])
+        if K > 1:
+            maior_deslocamento[ordem[0]] = deslocamentos[ordem[1]]
+        limites_superiores += deslocamentos[ks_min]
+        limites_inferiores -= maior_deslocamento[ks_min]
+
+        # Metade da distância de cada medioide ao medioide vizinho mais próximo
+        metades = 0.5 * _distancias_entre_medioides(medioides)
+        metades_vizinho = np.where(np.eye(K, dtype=bool), np.inf, metades).min(axis=1)
+
+        calculadas = 0
+        limiares = np.maximum(limites_inferiores, metades_vizinho[ks_min])
+        candidatos = np.flatnonzero(limites_superiores > limiares)
+        if candidatos.size > 0:
+            # Apertar o limite superior com a distância exata ao medioide atual
+            superiores = _distancias_por_pares(sementes, medioides, candidatos,
+                                               ks_min[candidatos])
+            limites_superiores[candidatos] = superiores
+            calculadas = calculadas + candidatos.size
+
+            # Recalcular todas as distâncias somente de quem ainda viola o limite
+            candidatos = candidatos[superiores > limiares[candidatos]]
+            if candidatos.size > 0:
+                ks_min[candidatos], limites_superiores[candidatos], \
+                    limites_inferiores[candidatos] = limites_exatos(candidatos, medioides)
+                calculadas = calculadas + candidatos.size * K
+
+        _contabilizar(estatisticas, calculadas, max(n * K - calculadas, 0))
+
+        convergiu = _convergiu(medioides, medioides_anteriores, tolerancia)
+        iteracoes = iteracoes + 1
+
+    WS_total = _ws_total(sementes, medioides, ks_min, pesos)
+
+    return medioides, ks_min, WS_total, iteracoes, convergiu
+
+
+def _agrupar_medioides(medioides, num_de_grupos, gerador=None, num_max_iteracoes=5):
+    """
+    Agrupa os medioides com algumas iterações de k-means sobre eles mesmos.
+
+    :param medioides: Matriz de medioides (K x p). float.
+    :param num_de_grupos: Número desejado de grupos. int.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param num_max_iteracoes: Número de iterações de Lloyd sobre os medioides. int.
+    :returns: Grupo de cada medioide (K,), numerado de 0 a G - 1 sem lacunas. int.
+    """
+    K = medioides.shape[0]
+    centros = medioides[ss.obter_gerador(gerador).choice(K, num_de_grupos,
+                                                        replace=False)]
+    for _ in range(num_max_iteracoes):
+        grupos = _atribuir(medioides, centros)
+        soma, num = _acumular(medioides, grupos, num_de_grupos)
+        ocupados = num > 0
+        centros[ocupados] = soma[ocupados] / num[ocupados, np.newaxis]
+    grupos = _atribuir(medioides, centros)
+
+    # Descartar grupos vazios, renumerando os demais
+    return np.unique(grupos, return_inverse=True)[1].ravel()
+
+
+def _executar_yinyang(sementes, medioides, num_max_iteracoes, normas_sementes,
+                      estatisticas, gerador=None,
+                      reparo_de_vazios="mais_distante", tolerancia=0.0,
+                      memoria_maxima=None, pesos=None):
+    r"""
+    Executa uma rodada do k-means Yinyang a partir dos medioides dados.
+
+    Os K medioides são divididos em :math:`G \approx K / 10` grupos e cada
+    elemento mantém um limite superior para o medioide atribuído e um limite
+    inferior por grupo (n x G). Um filtro global descarta o elemento inteiro
+    e um filtro por grupo descarta todos os medioides de um grupo cujo limite
+    inferior supera o limite superior, de modo que o custo por iteração cresce
+    de forma sublinear com K. As atribuições obtidas são idênticas às do
+    algoritmo de Lloyd.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param reparo_de_vazios: Reparo de clusters vazios (ver
+        ``_reparar_clusters_vazios``). str.
+    :param tolerancia: Tolerância de convergência (ver ``_convergiu``). float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, convergiu)
+    """
+
+    n = sementes.shape[0]
+    K = medioides.shape[0]
+
+    def limites_por_grupo(distancias, ks_min):
+        # Menor distância por grupo, desconsiderando o medioide atribuído
+        linhas = np.arange(distancias.shape[0])
+        distancias[linhas, ks_min] = np.inf
+        return np.minimum.reduceat(distancias[:, ordem_dos_grupos],
+                                   inicio_dos_grupos, axis=1)
+
+    grupos = _agrupar_medioides(medioides, max(1, K // 10), gerador)
+    ordem_dos_grupos = np.argsort(grupos, kind="stable")
+    inicio_dos_grupos = np.flatnonzero(np.r_[True, np.diff(grupos[ordem_dos_grupos]) != 0])
+    linhas_por_bloco = _linhas_por_bloco(sementes, K, memoria_maxima)
+
+    # Na primeira atribuição todas as distâncias são calculadas, em blocos
+    ks_min = np.empty(n, dtype=np.intp)
+    limites_superiores = np.empty(n, dtype=float)
+    limites_inferiores = np.empty((n, inicio_dos_grupos.size), dtype=float)
+    for bloco in bm.blocos(n, linhas_por_bloco):
+        distancias = np.sqrt(_distancias_quadradas(sementes[bloco], medioides,
+                                                   normas_sementes[bloco]))
+        ks_do_bloco = np.argmin(distancias, axis=1)
+        ks_min[bloco] = ks_do_bloco
+        limites_superiores[bloco] = distancias[np.arange(ks_do_bloco.size), ks_do_bloco]
+        limites_inferiores[bloco] = limites_por_grupo(distancias, ks_do_bloco)
+    _contabilizar(estatisticas, n * K, 0)
+
+    iteracoes = 0
+    convergiu = False
+    while convergiu is False and iteracoes < num_max_iteracoes:
+
+        soma_medioides, num_de_elementos_na_soma = _acumular(sementes, ks_min, K,
+                                                             pesos)
+        # Cada cluster vazio recebe um único elemento de outro cluster
+        movidos = _reparar_clusters_vazios(sementes, medioides, ks_min,
+                                           soma_medioides, num_de_elementos_na_soma,
+                                           estatisticas, reparo_de_vazios, gerador,
+                                           pesos)
+        if movidos.size > 0:
+            # Limites dos elementos movidos: distância exata ao medioide
+            # (ainda não deslocado) do novo cluster e inferiores nulos
+            limites_superiores[movidos] = \
+                _distancias_por_pares(sementes, medioides, movidos, ks_min[movidos])
+            limites_inferiores[movidos] = 0.0
+            estatisticas["distancias_calculadas"] += int(movidos.size)
+
+        # recalcular (média dos pontos aglutinados), novos medioides
+        medioides_anteriores = medioides
+        medioides = soma_medioides / num_de_elementos_na_soma[:, np.newaxis]
+
+        # O limite de cada grupo diminui pelo maior deslocamento do grupo
+        deslocamentos = np.sqrt(_normas_quadradas(medioides - medioides_anteriores))
+        deslocamentos_dos_grupos = np.maximum.reduceat(deslocamentos[ordem_dos_grupos],
+                                                       inicio_dos_grupos)
+        limites_superiores += deslocamentos[ks_min]
+        limites_inferiores -= deslocamentos_dos_grupos[np.newaxis, :]
+
+        calculadas = 0
+        # Filtro global: o elemento inteiro é descartado se nenhum grupo
+        # puder conter um medioide mais próximo
+        candidatos = np.flatnonzero(limites_superiores > limites_inferiores.min(axis=1))
+        if candidatos.size > 0:
+            # Apertar o limite superior com a distância exata ao medioide atual
+            ks_atuais = ks_min[candidatos]
+            superiores = _distancias_por_pares(sementes, medioides, candidatos, ks_atuais)
+            limites_superiores[candidatos] = superiores
+            calculadas = calculadas + candidatos.size
+
+            # Filtro por grupo: somente os grupos cujo limite inferior não
+            # supera o limite superior têm suas distâncias calculadas
+            inferiores = limites_inferiores[candidatos]
+            grupos_ativos = superiores[:, np.newaxis] > inferiores
+            ativos = grupos_ativos.any(axis=1)
+            candidatos = candidatos[ativos]
+            ks_atuais = ks_atuais[ativos]
+            superiores = superiores[ativos]
+            inferiores = inferiores[ativos]
+            grupos_ativos = grupos_ativos[ativos]
+
+        # Os candidatos são processados em blocos de linhas (bloco x K)
+        for bloco in bm.blocos(candidatos.size, linhas_por_bloco):
+            candidatos_do_bloco = candidatos[bloco]
+            ks_do_bloco = ks_atuais[bloco]
+            ativos_do_bloco = grupos_ativos[bloco]
+            inferiores_do_bloco = inferiores[bloco]
+
+            linhas = np.arange(candidatos_do_bloco.size)
+            mascara = ativos_do_bloco[:, grupos]
+            mascara[linhas, ks_do_bloco] = False
+            linhas_calculadas, ks_calculados = np.nonzero(mascara)
+            distancias = np.full(mascara.shape, np.inf)
+            distancias[linhas_calculadas, ks_calculados] = \
+                _distancias_por_pares(sementes, medioides,
+                                      candidatos_do_bloco[linhas_calculadas],
+                                      ks_calculados)
+            distancias[linhas, ks_do_bloco] = superiores[bloco]
+            calculadas = calculadas + linhas_calculadas.size
+
+            ks_novos = np.argmin(distancias, axis=1)
+            ks_min[candidatos_do_bloco] = ks_novos
+            limites_superiores[candidatos_do_bloco] = distancias[linhas, ks_novos]
+
+            # Grupos ativos recebem o limite exato; nos demais, apenas o
+            # medioide anteriormente atribuído pode reduzir o limite
+            minimos = limites_por_grupo(distancias, ks_novos)
+            limites_inferiores[candidatos_do_bloco] = \
+                np.where(ativos_do_bloco, minimos,
+                         np.minimum(inferiores_do_bloco, minimos))
+
+        _contabilizar(estatisticas, calculadas, n * K - calculadas)
+
+        convergiu = _convergiu(medioides, medioides_anteriores, tolerancia)
+        iteracoes = iteracoes + 1
+
+    WS_total = _ws_total(sementes, medioides, ks_min, pesos)
+
+    return medioides, ks_min, WS_total, iteracoes, convergiu
+
+
+def _executar_filtragem(sementes, medioides, num_max_iteracoes, normas_sementes,
+                        estatisticas, gerador=None,
+                        reparo_de_vazios="mais_distante", tolerancia=0.0,
+                        memoria_maxima=None, pesos=None, arvore_kd=None):
+    """
+    Executa uma rodada do algoritmo de filtragem (Kanungo et al., 2002).
+
+    As iterações são as de Lloyd, mas a soma e o número de elementos de cada
+    cluster vêm de uma travessia da árvore k-d com poda de candidatos (ver
+    ``functions.arvore_kd``): nós inteiros com um único candidato entram
+    pelas suas somas, sem visitar os elementos. As etiquetas só são obtidas
+    na última travessia (ou para reparar um cluster vazio).
+
+    :param sementes: Matriz de dados densa (n x p). float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param reparo_de_vazios: Reparo de clusters vazios (ver
+        ``_reparar_clusters_vazios``). str.
+    :param tolerancia: Tolerância de convergência (ver ``_convergiu``). float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :param arvore_kd: Árvore k-d de ``sementes`` (e ``pesos``); se omitida, é
+        construída. dict.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, convergiu)
+    """
+    if arvore_kd is None:
+        arvore_kd = akd.construir_arvore_kd(sementes, pesos)
+
+    n = sementes.shape[0]
+    K = medioides.shape[0]
+
+    iteracoes = 0
+    convergiu = False
+    while convergiu is False and iteracoes < num_max_iteracoes:
+
+        soma_medioides, num_de_elementos_na_soma, _, calculadas = \
+            akd.filtrar(arvore_kd, medioides, memoria_maxima=memoria_maxima)
+        _contabilizar(estatisticas, calculadas, max(n * K - calculadas, 0))
+
+        if np.any(num_de_elementos_na_soma == 0):
+            # O reparo escolhe elementos: precisa das etiquetas de todos
+            ks_min = _atribuir(sementes, medioides, normas_sementes, memoria_maxima)
+            estatisticas["distancias_calculadas"] += n * K
+            _reparar_clusters_vazios(sementes, medioides, ks_min, soma_medioides,
+                                     num_de_elementos_na_soma, estatisticas,
+                                     reparo_de_vazios, gerador, pesos)
+
+        medioides_anteriores = medioides
+        medioides = soma_medioides / num_de_elementos_na_soma[:, np.newaxis]
+
+        convergiu = _convergiu(medioides, medioides_anteriores, tolerancia)
+        iteracoes = iteracoes + 1
+
+    _, _, ks_min, calculadas = akd.filtrar(arvore_kd, medioides, com_etiquetas=True,
+                                           memoria_maxima=memoria_maxima)
+    _contabilizar(estatisticas, calculadas, max(n * K - calculadas, 0))
+
+    WS_total = _ws_total(sementes, medioides, ks_min, pesos)
+
+    return medioides, ks_min, WS_total, iteracoes, convergiu
+
+
+def _executar_mini_batch(sementes, medioides, num_max_iteracoes, normas_sementes,
+                         estatisticas, gerador=None, tamanho_do_lote=1024,
+                         num_de_passagens=100, memoria_maxima=None, pesos=None):
+    r"""
+    Executa uma rodada do k-means por mini-lotes a partir dos medioides dados.
+
+    A cada passagem, um lote aleatório de elementos é atribuído aos medioides
+    e cada medioide :math:`k` se desloca em direção à média dos seus elementos
+    no lote com taxa de aprendizado :math:`1 / v_k`, em que :math:`v_k` é o
+    número acumulado de elementos já atribuídos a ele. Ao final das
+    ``num_de_passagens`` passagens, todos os elementos são atribuídos uma única
+    vez para obter as etiquetas e o WS total. A memória de trabalho é limitada
+    pelo tamanho do lote (lote x K).
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Não utilizado; as passagens são fixas. int.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param tamanho_do_lote: Número de elementos por lote. int.
+    :param num_de_passagens: Número de passagens (lotes) por rodada. int.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, convergiu), em que
+        ``iteracoes`` é o trabalho equivalente em iterações completas de Lloyd
+        e ``convergiu`` é sempre False (as passagens são fixas).
+    """
+
+    n = sementes.shape[0]
+    K = medioides.shape[0]
+    tamanho_do_lote = min(int(tamanho_do_lote), n)
+
+    gerador = ss.obter_gerador(gerador)
+    medioides = np.array(medioides, dtype=float)
+    # v_k = Número acumulado de elementos atribuídos a cada medioide
+    contagens = np.zeros(K, dtype=float)
+
+    for _ in range(num_de_passagens):
+        lote = gerador.choice(n, tamanho_do_lote)
+        sementes_do_lote = sementes[lote]
+        ks_do_lote = _atribuir(sementes_do_lote, medioides, normas_sementes[lote])
+        # Sem poda: os elementos fora do lote não são atribuídos, e não
+        # contam como distâncias evitadas
+        _contabilizar(estatisticas, tamanho_do_lote * K, 0)
+
+        soma_do_lote, num_no_lote = _acumular(
+            sementes_do_lote, ks_do_lote, K, None if pesos is None else pesos[lote])
+        atualizados = num_no_lote > 0
+        contagens[atualizados] += num_no_lote[atualizados]
+        # c_k <- c_k + (soma_k - b_k c_k) / v_k
+        medioides[atualizados] += \
+            (soma_do_lote[atualizados] -
+             num_no_lote[atualizados, np.newaxis] * medioides[atualizados]) / \
+            contagens[atualizados, np.newaxis]
+
+    # Atribuição final de todos os elementos
+    ks_min = _atribuir(sementes, medioides, normas_sementes, memoria_maxima)
+    _contabilizar(estatisticas, n * K, 0)
+
+    WS_total = _ws_total(sementes, medioides, ks_min, pesos)
+    iteracoes = int(np.ceil(num_de_passagens * tamanho_do_lote / float(n))) + 1
+
+    return medioides, ks_min, WS_total, iteracoes, False
+
+
+# Memória de trabalho, em bytes, de cada bloco lido da matriz em disco
+_MEMORIA_POR_BLOCO_EM_DISCO = 64 * 1024 ** 2
+
+# Menor número de linhas da amostra usada no sorteio dos medioides iniciais
+# quando a matriz está em disco
+_NUM_MIN_DE_LINHAS_DA_AMOSTRA_EM_DISCO = 10000
+
+
+def _percorrer_em_blocos(sementes, medioides, dtype, memoria_maxima=None):
+    """
+    Percorre a matriz em blocos de linhas, atribuindo cada bloco aos medioides.
+
+    Somente um bloco de cada vez é lido (e convertido para ``dtype``), de
+    modo que a matriz, que pode ser um ``np.memmap``, nunca é carregada por
+    inteiro na memória.
+
+    :param sementes: Matriz de dados (n x p), em memória ou em disco. float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param dtype: Tipo de dado do cálculo das distâncias.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes; se
+        omitido, ``_MEMORIA_POR_BLOCO_EM_DISCO``. int.
+    :returns: Iterador de (bloco, dados_do_bloco, ks_do_bloco,
+        distancias_do_bloco), em que ``bloco`` é um ``slice`` das linhas e
+        ``distancias_do_bloco`` são as distâncias euclidianas exatas de cada
+        elemento ao seu medioide.
+    """
+    n, num_de_variaveis = sementes.shape
+    K = medioides.shape[0]
+    # Por linha: dados convertidos, distâncias (K) e vetores auxiliares
+    bytes_por_linha = (K + num_de_variaveis) * np.dtype(dtype).itemsize + 3 * 8
+    linhas_por_bloco = bm.num_de_linhas_por_bloco(
+        bytes_por_linha,
+        _MEMORIA_POR_BLOCO_EM_DISCO if memoria_maxima is None else memoria_maxima)
+
+    for bloco in bm.blocos(n, linhas_por_bloco):
+        dados_do_bloco = np.ascontiguousarray(sementes[bloco], dtype=dtype)
+        ks_do_bloco = _atribuir(dados_do_bloco, medioides,
+                                memoria_maxima=memoria_maxima)
+        distancias_do_bloco = np.sqrt(_normas_quadradas(
+            dados_do_bloco - medioides[ks_do_bloco]))
+        yield bloco, dados_do_bloco, ks_do_bloco, distancias_do_bloco
+
+
+def _novos_representantes(K, num_de_variaveis):
+    """
+    Cria os representantes por cluster usados no reparo de clusters vazios.
+
+    :param K: Número de k-clusters. int.
+    :param num_de_variaveis: Número de variáveis. int.
+    :returns: Dicionário com ``chave`` (K,), ``indice`` (K,), ``peso`` (K,)
+        e ``linha`` (K x p).
+    """
+    return {"chave": np.full(K, -np.inf),
+            "indice": np.full(K, -1, dtype=np.intp),
+            "peso": np.ones(K),
+            "linha": np.zeros((K, num_de_variaveis), dtype=float)}
+
+
+def _atualizar_representantes(representantes, inicio, ks_do_bloco, chaves,
+                              dados_do_bloco, pesos_do_bloco=None):
+    """
+    Mantém, por cluster, o elemento de maior chave visto até aqui.
+
+    Com a distância ao medioide como chave, o representante é o elemento mais
+    distante do cluster; com chaves uniformes, é uma amostra uniforme do
+    cluster (amostragem por reservatório).
+
+    :param representantes: Representantes por cluster. dict.
+    :param inicio: Índice global da primeira linha do bloco. int.
+    :param ks_do_bloco: Cluster de cada elemento do bloco (m,). int.
+    :param chaves: Chave de cada elemento do bloco (m,). float.
+    :param dados_do_bloco: Linhas do bloco (m x p). float.
+    :param pesos_do_bloco: Pesos das linhas do bloco (m,), opcional. float.
+    """
+    # Último elemento de cada cluster na ordenação por (cluster, chave)
+    ordem = np.lexsort((chaves, ks_do_bloco))
+    ultimos = ordem[np.r_[np.flatnonzero(np.diff(ks_do_bloco[ordem])),
+                          ordem.size - 1]]
+    clusters = ks_do_bloco[ultimos]
+    maiores = chaves[ultimos] > representantes["chave"][clusters]
+    clusters = clusters[maiores]
+    ultimos = ultimos[maiores]
+    representantes["chave"][clusters] = chaves[ultimos]
+    representantes["indice"][clusters] = inicio + ultimos
+    representantes["linha"][clusters] = dados_do_bloco[ultimos]
+    if pesos_do_bloco is not None:
+        representantes["peso"][clusters] = pesos_do_bloco[ultimos]
+
+
+def _reparar_clusters_vazios_em_disco(soma_medioides, num_de_elementos_na_soma,
+                                      representantes, estatisticas,
+                                      reparo_de_vazios="mais_distante",
+                                      contagens=None):
+    """
+    Realoca cada cluster vazio para o representante de outro cluster.
+
+    Equivale a ``_reparar_clusters_vazios`` sem acesso às linhas em disco:
+    com ``"mais_distante"``, cede o seu elemento mais distante o cluster cujo
+    representante está mais longe do medioide; com ``"maior_cluster"``, o
+    maior cluster cede o seu representante sorteado.
+
+    :param soma_medioides: Soma dos elementos por cluster (K x p). float.
+    :param num_de_elementos_na_soma: Número de elementos por cluster (K,). int.
+    :param representantes: Representantes por cluster. dict.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param reparo_de_vazios: ``"mais_distante"`` ou ``"maior_cluster"``. str.
+    :param contagens: Número de elementos por cluster (K,), quando
+        ``num_de_elementos_na_soma`` é a soma dos pesos. int.
+    """
+    if contagens is None:
+        contagens = num_de_elementos_na_soma
+    vazios = np.flatnonzero(num_de_elementos_na_soma == 0)
+    for vazio in vazios:
+        # Somente clusters com mais de um elemento podem ceder um elemento
+        elegiveis = (contagens > 1) & (representantes["indice"] >= 0)
+        if reparo_de_vazios == "mais_distante":
+            doador = int(np.argmax(np.where(elegiveis, representantes["chave"],
+                                            -np.inf)))
+        else:
+            doador = int(np.argmax(np.where(elegiveis, num_de_elementos_na_soma, -1)))
+
+        peso = representantes["peso"][doador]
+        linha = peso * representantes["linha"][doador]
+        soma_medioides[doador] -= linha
+        num_de_elementos_na_soma[doador] -= peso
+        soma_medioides[vazio] = linha
+        num_de_elementos_na_soma[vazio] = peso
+        if contagens is not num_de_elementos_na_soma:
+            contagens[doador] -= 1
+            contagens[vazio] = 1
+        # Cada representante é cedido uma única vez
+        representantes["indice"][doador] = -1
+
+    estatisticas["reparos_de_clusters_vazios"] += int(vazios.size)
+
+
+def _executar_lloyd_em_disco(sementes, medioides, num_max_iteracoes,
+                             normas_sementes, estatisticas, gerador=None,
+                             reparo_de_vazios="mais_distante", tolerancia=0.0,
+                             memoria_maxima=None, pesos=None, dtype=np.float64):
+    r"""
+    Executa uma rodada de Lloyd percorrendo a matriz em blocos.
+
+    Cada iteração é uma única passagem sobre a matriz (possivelmente um
+    ``np.memmap``), em que cada bloco é atribuído e somado aos acumuladores
+    dos medioides. Somente estados de tamanho :math:`O(Kp)` ficam na
+    memória: os acumuladores e um representante por cluster para o reparo de
+    clusters vazios. As etiquetas não são guardadas; uma passagem final
+    calcula o WS total.
+
+    :param sementes: Matriz de dados (n x p), em memória ou em disco. float.
+    :param medioides: Medioides iniciais (K x p). float.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param normas_sementes: Não utilizado; as normas são calculadas por bloco.
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param reparo_de_vazios: Reparo de clusters vazios (ver
+        ``_reparar_clusters_vazios_em_disco``). str.
+    :param tolerancia: Tolerância de convergência (ver ``_convergiu``). float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :param dtype: Tipo de dado do cálculo das distâncias.
+
+    :returns: (medioides, None, WS_total, iteracoes, convergiu)
+    """
+
+    n, num_de_variaveis = sementes.shape
+    K = medioides.shape[0]
+    gerador = ss.obter_gerador(gerador)
+
+    iteracoes = 0
+    convergiu = False
+    while convergiu is False and iteracoes < num_max_iteracoes:
+
+        soma_medioides = np.zeros((K, num_de_variaveis), dtype=float)
+        num_de_elementos_na_soma = np.zeros(K, dtype=np.intp if pesos is None
+                                            else float)
+        contagens = None if pesos is None else np.zeros(K, dtype=np.intp)
+        representantes = _novos_representantes(K, num_de_variaveis)
+
+        # Atribuição e acumulação em uma única passagem
+        for bloco, dados_do_bloco, ks_do_bloco, distancias_do_bloco in \
+                _percorrer_em_blocos(sementes, medioides, dtype, memoria_maxima):
+            pesos_do_bloco = None if pesos is None else pesos[bloco]
+            soma_do_bloco, num_no_bloco = _acumular(dados_do_bloco, ks_do_bloco, K,
+                                                    pesos_do_bloco)
+            soma_medioides += soma_do_bloco
+            num_de_elementos_na_soma += num_no_bloco
+            if contagens is not None:
+                contagens += np.bincount(ks_do_bloco, minlength=K)
+            if reparo_de_vazios == "mais_distante":
+                chaves = distancias_do_bloco
+            else:
+                chaves = gerador.uniform(size=ks_do_bloco.size)
+            _atualizar_representantes(representantes, bloco.start, ks_do_bloco,
+                                      chaves, dados_do_bloco, pesos_do_bloco)
+        _contabilizar(estatisticas, n * K, 0)
+
+        # Cada cluster vazio recebe um único elemento de outro cluster
+        _reparar_clusters_vazios_em_disco(soma_medioides, num_de_elementos_na_soma,
+                                          representantes, estatisticas,
+                                          reparo_de_vazios, contagens)
+
+        # recalcular (média dos pontos aglutinados), novos medioides
+        medioides_anteriores = medioides
+        medioides = soma_medioides / num_de_elementos_na_soma[:, np.newaxis]
+
+        convergiu = _convergiu(medioides, medioides_anteriores, tolerancia)
+        iteracoes = iteracoes + 1
+
+    # Passagem final: WS total dos medioides obtidos
+    WS_total = 0.0
+    for bloco, _, _, distancias_do_bloco in _percorrer_em_blocos(sementes, medioides,
+                                                                 dtype, memoria_maxima):
+        if pesos is None:
+            WS_total = WS_total + float(np.sum(distancias_do_bloco))
+        else:
+            WS_total = WS_total + float(np.dot(pesos[bloco], distancias_do_bloco))
+    _contabilizar(estatisticas, n * K, 0)
+
+    return medioides, None, WS_total, iteracoes, convergiu
+
+
+def _variancias(sementes, em_disco=False, pesos=None):
+    """
+    Calcula a variância (ponderada, com pesos) de cada variável.
+
+    :param sementes: Matriz de dados (n x p), em memória (densa ou esparsa)
+        ou em disco. float.
+    :param em_disco: Se True, a matriz é percorrida em blocos. bool.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :returns: Variâncias (p,). float.
+    """
+    if sp.issparse(sementes):
+        if pesos is None:
+            media = np.asarray(sementes.mean(axis=0, dtype=float)).ravel()
+            media_dos_quadrados = np.asarray(
+                sementes.multiply(sementes).mean(axis=0, dtype=float)).ravel()
+        else:
+            media = sementes.T @ pesos / np.sum(pesos)
+            media_dos_quadrados = sementes.multiply(sementes).T @ pesos / np.sum(pesos)
+        return np.maximum(media_dos_quadrados - media ** 2, 0.0)
+    if not em_disco:
+        if pesos is None:
+            return np.var(sementes, axis=0, dtype=float)
+        media = np.average(sementes, axis=0, weights=pesos)
+        return np.average((sementes - media) ** 2, axis=0, weights=pesos)
+
+    n, num_de_variaveis = sementes.shape
+    linhas_por_bloco = bm.num_de_linhas_por_bloco(num_de_variaveis * 8 * 2,
+                                                  _MEMORIA_POR_BLOCO_EM_DISCO)
+    soma = np.zeros(num_de_variaveis)
+    soma_dos_quadrados = np.zeros(num_de_variaveis)
+    for bloco in bm.blocos(n, linhas_por_bloco):
+        dados_do_bloco = np.asarray(sementes[bloco], dtype=float)
+        pesos_do_bloco = np.ones(dados_do_bloco.shape[0]) if pesos is None \
+            else pesos[bloco]
+        soma += pesos_do_bloco @ dados_do_bloco
+        soma_dos_quadrados += pesos_do_bloco @ (dados_do_bloco * dados_do_bloco)
+    n = n if pesos is None else float(np.sum(pesos))
+    media = soma / n
+
+    return np.maximum(soma_dos_quadrados / n - media ** 2, 0.0)
+
+
+def _amostrar_linhas(sementes, K, dtype, gerador=None, pesos=None):
+    """
+    Lê uma amostra de linhas para o sorteio dos medioides iniciais.
+
+    Com pesos, cada linha é sorteada com probabilidade proporcional ao seu
+    peso, de modo que a amostra já representa os pesos.
+
+    :param sementes: Matriz de dados (n x p), em memória ou em disco. float.
+    :param K: Número de k-clusters. int.
+    :param dtype: Tipo de dado da amostra.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :returns: (amostra (m x p), com m >= K linhas distintas, e pesos da
+        amostra (m,), ou None se a amostra não for ponderada)
+    """
+    n = sementes.shape[0]
+    num_de_linhas = max(_NUM_MIN_DE_LINHAS_DA_AMOSTRA_EM_DISCO, 20 * K)
+    if num_de_linhas >= n:
+        return np.ascontiguousarray(sementes[:], dtype=dtype), pesos
+
+    # Sorteio com reposição (memória O(m)), descartando as repetições
+    gerador = ss.obter_gerador(gerador)
+    probabilidades = None if pesos is None else pesos / np.sum(pesos)
+    indices = np.unique(gerador.choice(n, num_de_linhas, p=probabilidades))
+    while indices.size < K:
+        indices = np.unique(np.r_[indices, gerador.choice(n, num_de_linhas,
+                                                          p=probabilidades)])
+
+    return np.ascontiguousarray(sementes[indices], dtype=dtype), None
+
+
+# Motores de k-means disponíveis em ``k_means(..., algorithm=...)``
+_ALGORITMOS = {
+    "lloyd": _executar_lloyd,
+    "elkan": _executar_elkan,
+    "hamerly": _executar_hamerly,
+    "yinyang": _executar_yinyang,
+    "mini_batch": _executar_mini_batch,
+    "filtragem": _executar_filtragem,
+}
+
+# Até este número de variáveis, ``algorithm="auto"`` escolhe o motor de
+# Hamerly (limites O(n)); acima dele, o de Lloyd com atribuição via BLAS
+_NUM_MAX_DE_VARIAVEIS_HAMERLY = 20
+
+
+def _escolher_algoritmo(algorithm, num_de_variaveis):
+    """
+    Resolve o nome do motor de k-means a ser utilizado.
+
+    :param algorithm: Nome do motor ou ``"auto"``. str.
+    :param num_de_variaveis: Número de variáveis dos dados. int.
+    :returns: Nome de um motor disponível em ``_ALGORITMOS``. str.
+    """
+    if algorithm == "auto":
+        if num_de_variaveis <= _NUM_MAX_DE_VARIAVEIS_HAMERLY:
+            return "hamerly"
+        return "lloyd"
+    if algorithm not in _ALGORITMOS:
+        raise ValueError("Algoritmo de k-means desconhecido: '" + str(algorithm) +
+                         "'. Use \"auto\" ou um de: " +
+                         ", ".join(sorted(_ALGORITMOS)) + ".")
+    return algorithm
+
+
+def _sortear_medioides(sementes, K, inicializacao, normas_sementes, gerador=None,
+                       pesos=None):
+    """
+    Sorteia os medioides iniciais de uma rodada.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param K: Número de k-clusters. int.
+    :param inicializacao: ``"k-means++"`` ou ``"aleatoria"``. str.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+    :returns: Medioides iniciais (K x p). float.
+    """
+    if inicializacao == "k-means++":
+        return ss.sortear_sementes_k_means_pp(sementes, K, gerador=gerador,
+                                              normas_sementes=normas_sementes,
+                                              pesos=pesos)
+    if inicializacao == "aleatoria":
+        return ss.sortear_sementes(sementes.shape[0], K, sementes, gerador, pesos)
+    raise ValueError("Inicialização desconhecida: '" + str(inicializacao) +
+                     "'. Use \"k-means++\" ou \"aleatoria\".")
+
+
+def _novas_estatisticas():
+    """
+    Cria um dicionário de estatísticas de ajuste zerado.
+
+    :returns: Dicionário de estatísticas. dict.
+    """
+    return {"distancias_calculadas": 0,
+            "distancias_evitadas": 0,
+            "taxas_de_poda_por_iteracao": [],
+            "reparos_de_clusters_vazios": 0,
+            "rodadas": []}
+
+
+def _mesclar_estatisticas(estatisticas, estatisticas_da_rodada):
+    """
+    Acumula as estatísticas de uma rodada nas estatísticas do ajuste.
+
+    :param estatisticas: Dicionário de estatísticas do ajuste. dict.
+    :param estatisticas_da_rodada: Dicionário de estatísticas da rodada. dict.
+    """
+    estatisticas["distancias_calculadas"] += estatisticas_da_rodada["distancias_calculadas"]
+    estatisticas["distancias_evitadas"] += estatisticas_da_rodada["distancias_evitadas"]
+    estatisticas["taxas_de_poda_por_iteracao"].extend(
+        estatisticas_da_rodada["taxas_de_poda_por_iteracao"])
+    estatisticas["reparos_de_clusters_vazios"] += \
+        estatisticas_da_rodada["reparos_de_clusters_vazios"]
+    estatisticas["rodadas"].extend(estatisticas_da_rodada["rodadas"])
+
+
+def _executar_rodada(sementes, normas_sementes, K, num_max_iteracoes, opcoes,
+                     estatisticas, gerador=None, medioides_iniciais=None,
+                     pesos=None):
+    """
+    Sorteia os medioides iniciais e executa uma rodada do motor escolhido.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param K: Número de k-clusters. int.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param opcoes: Opções do ajuste (``algorithm``, ``inicializacao``,
+        ``tamanho_do_lote``, ``num_de_passagens``, ``reparo_de_vazios``,
+        ``tolerancia``, ``memoria_maxima``, ``dtype``, ``em_disco`` e
+        ``arvore_kd``). dict.
+    :param estatisticas: Dicionário de estatísticas do ajuste; recebe em
+        ``rodadas`` as iterações e o motivo de parada da rodada. dict.
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param medioides_iniciais: Medioides iniciais (K x p); se omitidos, são
+        sorteados conforme ``opcoes["inicializacao"]``. float.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes)
+    """
+    if opcoes["em_disco"]:
+        executar = functools.partial(_executar_lloyd_em_disco,
+                                     memoria_maxima=opcoes["memoria_maxima"],
+                                     dtype=opcoes["dtype"])
+    else:
+        executar = functools.partial(_ALGORITMOS[opcoes["algorithm"]],
+                                     memoria_maxima=opcoes["memoria_maxima"])
+    if opcoes["algorithm"] == "filtragem":
+        executar = functools.partial(executar, arvore_kd=opcoes["arvore_kd"])
+    if opcoes["algorithm"] == "mini_batch":
+        executar = functools.partial(executar,
+                                     tamanho_do_lote=opcoes["tamanho_do_lote"],
+                                     num_de_passagens=opcoes["num_de_passagens"])
+    else:
+        executar = functools.partial(executar,
+                                     reparo_de_vazios=opcoes["reparo_de_vazios"],
+                                     tolerancia=opcoes["tolerancia"])
+
+    if medioides_iniciais is not None:
+        medioides = np.array(medioides_iniciais, dtype=float)
+    elif opcoes["em_disco"]:
+        # Matriz em disco: sorteio sobre uma amostra de linhas
+        amostra, pesos_da_amostra = _amostrar_linhas(sementes, K, opcoes["dtype"],
+                                                     gerador, pesos)
+        medioides = _sortear_medioides(amostra, K, opcoes["inicializacao"],
+                                       _normas_quadradas(amostra), gerador,
+                                       pesos_da_amostra)
+    else:
+        medioides = _sortear_medioides(sementes, K, opcoes["inicializacao"],
+                                       normas_sementes, gerador, pesos)
+
+    medioides, ks_min, WS_total, iteracoes, convergiu = \
+        executar(sementes, medioides, num_max_iteracoes, normas_sementes,
+                 estatisticas, gerador=gerador, pesos=pesos)
+
+    if opcoes["algorithm"] == "mini_batch":
+        motivo_de_parada = "num_de_passagens"
+    elif not convergiu:
+        motivo_de_parada = "max_iter"
+    elif opcoes["tolerancia"] > 0.0:
+        motivo_de_parada = "tolerancia"
+    else:
+        motivo_de_parada = "medioides_estaveis"
+    estatisticas["rodadas"].append({"iteracoes": int(iteracoes),
+                                    "motivo_de_parada": motivo_de_parada,
+                                    "WS_total": WS_total})
+
+    return medioides, ks_min, WS_total, iteracoes
+
+
+def _executar_rodada_no_processo(K, num_max_iteracoes, opcoes, semente_da_rodada):
+    """
+    Executa uma rodada independente no processo trabalhador, sobre a matriz,
+    os pesos e a árvore k-d compartilhados.
+
+    :param K: Número de k-clusters. int.
+    :param num_max_iteracoes: Número máximo de iterações da rodada. int.
+    :param opcoes: Opções do ajuste. dict.
+    :param semente_da_rodada: Semente própria da rodada. np.random.SeedSequence.
+
+    :returns: (medioides, ks_min, WS_total, iteracoes, estatisticas_da_rodada)
+    """
+    sementes = mc.matriz_do_processo()
+    pesos = mc.arranjo_do_processo("pesos")
+    opcoes = dict(opcoes, arvore_kd=mc.arranjo_do_processo("arvore_kd"))
+    normas_sementes = None if opcoes["em_disco"] else _normas_quadradas(sementes)
+    estatisticas_da_rodada = _novas_estatisticas()
+    resultado = _executar_rodada(sementes, normas_sementes,
+                                 K, num_max_iteracoes, opcoes,
+                                 estatisticas_da_rodada,
+                                 np.random.default_rng(semente_da_rodada),
+                                 pesos=pesos)
+
+    return resultado + (estatisticas_da_rodada,)
+
+
+def _executar_rodadas_independentes(sementes, normas_sementes, K,
+                                    num_max_iteracoes, opcoes,
+                                    sementes_das_rodadas, n_jobs, pesos=None):
+    """
+    Executa rodadas independentes, em sequência ou em um conjunto de processos.
+
+    Cada rodada usa o seu próprio gerador, derivado de ``sementes_das_rodadas``,
+    de modo que os resultados não dependem do número de processos.
+
+    :param sementes: Matriz de dados (n x p). float.
+    :param normas_sementes: Normas quadradas das sementes (n,). float.
+    :param K: Número de k-clusters. int.
+    :param num_max_iteracoes: Número máximo de iterações por rodada. int.
+    :param opcoes: Opções do ajuste. dict.
+    :param sementes_das_rodadas: Uma semente por rodada. list.
+    :param n_jobs: Número de processos (``-1`` para todos os núcleos). int.
+    :param pesos: Pesos dos elementos (n,), opcional. float.
+
+    :returns: Lista, na ordem das rodadas, de
+        (medioides, ks_min, WS_total, iteracoes, estatisticas_da_rodada).
+    """
+    n_jobs = mc.num_de_processos(n_jobs, len(sementes_das_rodadas))
+
+    if n_jobs <= 1:
+        resultados = []
+        for semente_da_rodada in sementes_das_rodadas:
+            estatisticas_da_rodada = _novas_estatisticas()
+            resultado = _executar_rodada(sementes, normas_sementes, K,
+                                         num_max_iteracoes, opcoes,
+                                         estatisticas_da_rodada,
+                                         np.random.default_rng(semente_da_rodada),
+                                         pesos=pesos)
+            resultados.append(resultado + (estatisticas_da_rodada,))
+        return resultados
+
+    def executar_no_conjunto(anexar, descritor):
+        # Os pesos e a árvore k-d também são compartilhados uma única vez, em
+        # vez de serem serializados em cada tarefa
+        arranjos = {"pesos": pesos, "arvore_kd": opcoes["arvore_kd"]}
+        opcoes_das_tarefas = dict(opcoes, arvore_kd=None)
+        with mc.compartilhar_arranjos(arranjos) as descritores_dos_arranjos:
+            with ProcessPoolExecutor(max_workers=n_jobs,
+                                     initializer=mc.anexar_matriz_e_arranjos,
+                                     initargs=(anexar, descritor,
+                                               descritores_dos_arranjos)) as executor:
+                futuros = [executor.submit(_executar_rodada_no_processo, K,
+                                           num_max_iteracoes, opcoes_das_tarefas,
+                                           semente_da_rodada)
+                           for semente_da_rodada in sementes_das_rodadas]
+                return [futuro.result() for futuro in futuros]
+
+    if opcoes["em_disco"]:
+        # Cada processo abre a mesma matriz em disco, sem cópias
+        return executar_no_conjunto(mc.anexar_memmap, mc.descrever_memmap(sementes))
+
+    if sp.issparse(sementes):
+        with mc.compartilhar_matriz_esparsa(sementes) as descritor:
+            return executar_no_conjunto(mc.anexar_matriz_esparsa, descritor)
+
+    # A matriz de sementes é copiada uma única vez para a memória
+    # compartilhada, em vez de ser serializada em cada tarefa
+    with mc.compartilhar_matriz(sementes) as descritor:
+        return executar_no_conjunto(mc.anexar_matriz, descritor)
+
+
+def k_means(num_de_k_inicial, K, sementes, num_max_I, algorithm="auto",
+            estatisticas=None, tamanho_do_lote=1024, num_de_passagens=100,
+            inicializacao="k-means++", n_init=None, n_jobs=1,
+            semente_aleatoria=None, medioides_iniciais=None,
+            reparo_de_vazios="mais_distante", tol=0.0, max_iter=None,
+            dtype=np.float64, memoria_maxima=None, arquivo_de_etiquetas=None,
+            arquivo_de_distancias=None, sample_weight=None,
+            colapsar_repetidas=False, arvore_kd=None):
     r"""
     Executa o algoritmo de k-means e retorna distâncias, centróides e etiquetas.
 
+    A etapa de atribuição é vetorizada: as distâncias de todos os elementos a
+    todos os medioides são obtidas com produtos matriciais e o medioide mais
+    próximo com ``argmin`` ao longo do eixo dos clusters. Os elementos são
+    processados em blocos de linhas cuja memória de trabalho cabe no cache L2
+    (ou em ``memoria_maxima``), de modo que a matriz completa (n x K) não é
+    alocada e o produto matricial aproveita a localidade do cache.
+
+    Sem ``n_init``, as rodadas são executadas em sequência até esgotar o
+    orçamento global de ``num_max_I`` iterações; cada rodada usa no máximo
+    ``max_iter`` delas, e o que sobra de uma rodada que converge cedo fica
+    para as seguintes. Com ``n_init``, são executadas ``n_init`` rodadas
+    independentes, cada uma com até ``max_iter`` (padrão ``num_max_I + 1``)
+    iterações, distribuídas entre ``n_jobs`` processos. Com
+    ``medioides_iniciais``, é executada uma única rodada (partida quente) a
+    partir deles.
+
+    Uma rodada converge quando a soma dos deslocamentos quadrados dos
+    medioides não excede ``tol`` vezes a variância média das variáveis; com
+    ``tol=0``, somente quando os medioides não mudam.
+
+    As sementes são convertidas uma única vez em uma matriz C-contígua do
+    tipo ``dtype``. Com ``np.float32``, as distâncias são calculadas em
+    precisão simples (metade da memória e da banda do produto matricial),
+    enquanto a soma dos medioides e o WS total continuam em float64. O WS
+    total fica, em valor relativo, a até cerca de 1e-5 do obtido em float64;
+    somente elementos praticamente equidistantes de dois medioides podem
+    receber etiquetas diferentes.
+
+    Fora da memória: com ``sementes`` como ``np.memmap`` ou caminho de um
+    arquivo ``.npy``, a matriz é lida em blocos a cada iteração (atribuição
+    e acumulação em uma única passagem, motor de Lloyd) e nunca é carregada
+    por inteiro; os medioides iniciais são sorteados sobre uma amostra de
+    linhas. Durante o ajuste ficam na memória apenas estados de tamanho
+    :math:`O(Kp)`; as etiquetas e as distâncias finais são obtidas em uma
+    última passagem e podem ser gravadas em disco (``arquivo_de_etiquetas``
+    e ``arquivo_de_distancias``). As rodadas em paralelo abrem o mesmo
+    arquivo, sem cópias.
+
+    Matrizes esparsas (``scipy.sparse``, por exemplo tabelas one-hot) são
+    convertidas em CSR e nunca densificadas: as normas dos elementos são
+    calculadas uma única vez, os produtos com os medioides (densos) e a soma
+    dos medioides percorrem somente os valores não nulos. Todos os motores
+    aceitam sementes esparsas.
+
+    Com poucas variáveis, ``algorithm="filtragem"`` percorre uma árvore k-d
+    das sementes (Kanungo et al., 2002; ver ``functions.arvore_kd``) em vez
+    de calcular todas as distâncias: nós inteiros da árvore entram na soma
+    do seu único medioide candidato. A árvore é construída uma única vez e
+    reaproveitada em todas as iterações e rodadas (e, via ``arvore_kd``,
+    em todos os k de uma varredura).
+
+    Com ``sample_weight``, cada elemento conta com o seu peso: os medioides
+    são médias ponderadas, o WS total é a soma ponderada das distâncias e o
+    sorteio dos medioides iniciais é ponderado. Com ``colapsar_repetidas``,
+    as linhas idênticas são substituídas por uma única linha com peso igual
+    ao número de repetições (ver ``functions.linhas_repetidas``); o ajuste
+    é o mesmo, sobre menos linhas, e as etiquetas e distâncias retornadas
+    são expandidas de volta para todas as linhas.
+
+    Um cluster que fica vazio é reparado sem descartar os demais medioides:
+    ele recebe um único elemento de outro cluster e somente a atribuição
+    desse elemento muda.
+
     :param num_de_k_inicial: Número de k inicial. int.
     :param K: Número total de k-clusters. int.
-    :param sementes: Matriz de dados (amostras x variáveis). float.
+    :param sementes: Matriz de dados (amostras x variáveis): densa, esparsa
+        (``scipy.sparse``), ``np.memmap`` ou caminho de um arquivo ``.npy``.
+        float.
     :param num_max_I: Número máximo de iterações. int.
+    :param algorithm: Motor de k-means: ``"lloyd"``, ``"elkan"``, ``"hamerly"``,
+        ``"yinyang"``, ``"mini_batch"``, ``"filtragem"`` (árvore k-d, somente
+        sementes densas) ou ``"auto"`` (Hamerly para poucas variáveis, Lloyd
+        caso contrário). str.
+    :param estatisticas: Dicionário opcional preenchido com as estatísticas
+        do ajuste (``algorithm``, ``distancias_calculadas``,
+        ``distancias_evitadas``, ``taxas_de_poda_por_iteracao``,
+        ``reparos_de_clusters_vazios`` e ``rodadas``, com as iterações
+        usadas, o motivo de parada e o WS total de cada rodada). dict.
+    :param tamanho_do_lote: Elementos por lote em ``"mini_batch"``. int.
+    :param num_de_passagens: Passagens (lotes) por rodada em ``"mini_batch"``.
+        Cada rodada consome do orçamento ``num_max_I`` o equivalente em
+        iterações completas de Lloyd. int.
+    :param inicializacao: Sorteio dos medioides iniciais de cada rodada:
+        ``"k-means++"`` (amostragem D² gulosa) ou ``"aleatoria"`` (uniforme,
+        sem repetição). str.
+    :param n_init: Número de rodadas independentes (opcional). int.
+    :param n_jobs: Número de processos para as rodadas independentes
+        (``-1`` para todos os núcleos). int.
+    :param semente_aleatoria: Semente dos sorteios (das rodadas
+        independentes, com ``n_init``); sem ela, os sorteios usam o estado
+        global do NumPy, que nunca é ressemeado. int.
+    :param medioides_iniciais: Medioides de partida (K x p), opcional. float.
+    :param reparo_de_vazios: Elemento que repara um cluster vazio:
+        ``"mais_distante"`` (o mais distante do seu medioide) ou
+        ``"maior_cluster"`` (sorteado do maior cluster). str.
+    :param tol: Tolerância relativa de convergência do deslocamento dos
+        medioides. float.
+    :param max_iter: Número máximo de iterações de cada rodada (opcional). int.
+    :param dtype: Tipo de dado do cálculo das distâncias: ``np.float64`` ou
+        ``np.float32``. Com ``np.float32``, o WS total dos mesmos medioides
+        difere do de ``np.float64`` em menos de 1e-8 (relativo); o de um
+        ajuste completo, cerca de 1e-5 e até 1e-3 quando o arredondamento
+        leva a outro ótimo local (medido em dados gaussianos de 5 a 30
+        variáveis, K de 5 a 40).
+    :param memoria_maxima: Teto, em bytes, da memória de trabalho de cada
+        bloco de atribuição; se omitido, o tamanho do cache L2 (e, fora da
+        memória, 64 MiB por bloco lido do disco). int.
+    :param arquivo_de_etiquetas: Arquivo ``.npy`` em que as etiquetas finais
+        são gravadas como ``np.memmap`` (somente fora da memória). str.
+    :param arquivo_de_distancias: Arquivo ``.npy`` em que as distâncias
+        finais são gravadas como ``np.memmap`` (somente fora da memória). str.
+    :param sample_weight: Pesos positivos dos elementos (n,), opcional. float.
+    :param colapsar_repetidas: Se True, ajusta sobre as linhas únicas
+        ponderadas pelas suas repetições (somente em memória). bool.
+    :param arvore_kd: Árvore k-d de ``functions.arvore_kd.construir_arvore_kd``
+        sobre as mesmas sementes e pesos (após o colapso), reaproveitada pelo
+        motor ``"filtragem"``; se omitida, é construída uma única vez para
+        todas as rodadas. dict.
 
     :returns: (distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo)
     """
 
-    # I = Iteração
-    I = 0  # Iteração inicial
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("Tipo de dado não suportado: '" + str(dtype) +
+                         "'. Use np.float32 ou np.float64.")
 
-    # n = Número total de elementos
-    n = sementes.shape[0]
+    if isinstance(sementes, (str, os.PathLike)):
+        sementes = np.load(sementes, mmap_mode="r")
+    em_disco = isinstance(sementes, np.memmap)
+    if em_disco:
+        if algorithm not in ("auto", "lloyd"):
+            raise ValueError("Fora da memória, somente o motor de Lloyd "
+                             "(\"lloyd\" ou \"auto\") está disponível.")
+        algorithm = "lloyd"
+    else:
+        # Conversão única para uma matriz C-contígua (ou CSR) do tipo do cálculo
+        sementes = converter_sementes(sementes, dtype)
 
-    # num_de_variaveis = Número de variáveis
-    num_de_variaveis = sementes.shape[1]
+    if reparo_de_vazios not in ("mais_distante", "maior_cluster"):
+        raise ValueError("Reparo de clusters vazios desconhecido: '" +
+                         str(reparo_de_vazios) + "'. Use \"mais_distante\" "
+                         "ou \"maior_cluster\".")
+    if tol < 0.0:
+        raise ValueError("A tolerância deve ser não negativa.")
+    if max_iter is not None and max_iter < 1:
+        raise ValueError("O número máximo de iterações por rodada deve ser "
+                         "maior ou igual a 1.")
 
-    # O medioide deve ser um novo arranjo
-    # medioides = np.zeros((K, num_de_variaveis), dtype=float)
+    pesos = None
+    if sample_weight is not None:
+        pesos = np.asarray(sample_weight, dtype=float).ravel()
+        if pesos.shape != (sementes.shape[0],):
+            raise ValueError("Os pesos devem ter forma (" +
+                             str(sementes.shape[0]) + ",).")
+        if not np.all(np.isfinite(pesos)) or np.any(pesos <= 0.0):
+            raise ValueError("Os pesos devem ser finitos e positivos.")
 
-    # o medioide anterior deve ser um novo arranjo
-    medioides_anteriores = np.ones((K, num_de_variaveis), dtype=float)
+    # Linhas idênticas viram uma única linha ponderada
+    inversa = None
+    if colapsar_repetidas:
+        if em_disco:
+            raise ValueError("O colapso de linhas repetidas não está "
+                             "disponível fora da memória.")
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(sementes, pesos)
+        if K > sementes.shape[0]:
+            raise ValueError("Há somente " + str(sementes.shape[0]) +
+                             " linhas distintas para " + str(K) + " clusters.")
 
-    # num_de_elementos_na_soma = Número de elementos na soma para calcular
-    # os novos medioides
-    num_de_elementos_na_soma = np.zeros((K, 1), dtype=int)
+    # Tolerância absoluta: relativa à variância média das variáveis
+    tolerancia = float(tol * np.mean(_variancias(sementes, em_disco, pesos))) \
+        if tol > 0.0 else 0.0
 
-    # a distância deve ser um novo arranjo
-    distancias = np.zeros((n, K), dtype=float)
+    opcoes = {"algorithm": _escolher_algoritmo(algorithm, sementes.shape[1]),
+              "inicializacao": inicializacao,
+              "tamanho_do_lote": tamanho_do_lote,
+              "num_de_passagens": num_de_passagens,
+              "reparo_de_vazios": reparo_de_vazios,
+              "tolerancia": tolerancia,
+              "memoria_maxima": memoria_maxima,
+              "dtype": dtype,
+              "em_disco": em_disco,
+              "arvore_kd": None}
 
-    # soma_medioides = np.zeros((K, 1, num_de_variaveis), dtype = float)
-    soma_medioides = np.zeros((K, num_de_variaveis), dtype=float)
+    if opcoes["algorithm"] == "filtragem":
+        if sp.issparse(sementes):
+            raise ValueError("O motor de filtragem exige sementes densas.")
+        # A árvore k-d é construída uma única vez para todas as rodadas
+        if arvore_kd is None:
+            arvore_kd = akd.construir_arvore_kd(sementes, pesos)
+        elif arvore_kd["pontos"].shape != sementes.shape:
+            raise ValueError("A árvore k-d não corresponde às sementes.")
+        opcoes["arvore_kd"] = arvore_kd
 
-    # ks_min = Arranjo de k-clusters que as sementes estão mais próximas
-    ks_min = np.zeros((n, 1), dtype=int)
+    # Orçamento de cada rodada independente ou com partida quente
+    num_max_iteracoes_da_rodada = num_max_I + 1 if max_iter is None else max_iter
 
-    # o Within Sum anterior deve ser um novo arranjo
-    # WSs_anteriores = np.zeros((K, 1), dtype = float)
-    # o Within Sum deve ser um novo arranjo
-    WSs = np.ones((K, 1), dtype=float)
+    if estatisticas is None:
+        estatisticas = {}
+    estatisticas.update(_novas_estatisticas())
+    estatisticas["algorithm"] = opcoes["algorithm"]
 
-    # o Within Sum total deve ser um novo arranjo
-    # WStotals = np.ones((K, 1), dtype = float)
-    WS_total = True
+    # Normas quadradas das sementes, reaproveitadas em todas as atribuições
+    # (fora da memória, são calculadas por bloco)
+    normas_sementes = None if em_disco else _normas_quadradas(sementes)
 
     # O Within Sum total ótimo deve ser um novo arranjo
     WS_total_otimo = np.inf
 
-    # Distancias ótimas deve ser um novo arranjo
-    distancias_otimas = np.zeros((n, 1), dtype=float)
-
-    # enquanto WS total for diferente do WS total anterior fazer
-    while I <= num_max_I:
-
-        # para todas os k-clusters fazer
-        # sortear semente k
-        # formar k-medioides
-        # for k in range(0, K, 1):
-        medioides = ss.sortear_sementes(n, K, sementes)
-
-        while np.array_equal(medioides, medioides_anteriores) == False and I <= num_max_I:
-
-            num_de_elementos_na_soma[:] = 0
-            sortear_novamente = False
-            # Enquanto existir algum cluster vazio, reatribuir até todos terem pelo menos 1
-            while (num_de_elementos_na_soma == 0).any():
-
-                if (num_de_elementos_na_soma == 0).any() and sortear_novamente is True:
-                    # for k in range(0, K, 1):
-                    medioides = ss.sortear_sementes(n, K, sementes)
-
-                distancias[:] = 0 # Zerar todos os elementos do array
-                soma_medioides[:] = 0
-                num_de_elementos_na_soma[:] = 0
-                # calcular a distância entre o elemento e o medioide
-                for i in range(0, n, 1):
-                    # para todos os $ k $-clusters
-                    for k in range(0, K, 1):
-                        distancias[i, k] = \
-                            np.linalg.norm(sementes[i] - medioides[k])
-
-                    # comparar a distância entre o elemento do BIG Data e o medioide
-                    # associar esta distância ao medioide de menor distância
-                    # k_min = Índice do medioide m_k de menor distância
-
-                    k_min = distancias.tolist()[i].index(min(distancias[i, :]))
-                    # print(i) # Adicionado
-
-                    ks_min[i, 0] = k_min
-
-                    soma_medioides[k_min] = soma_medioides[k_min] + sementes[i]
-                    num_de_elementos_na_soma[k_min] = \
-                        num_de_elementos_na_soma[k_min] + 1
-
-                if (num_de_elementos_na_soma == 0).any():
-                    sortear_novamente = True
-
-            # recalcular (média dos pontos aglutinados), novos medioides
-            medioides_anteriores = medioides.copy()
-            # para todos os $ k $-clusters
-            for k in range(0, K, 1):
-                # Evitar divisão por zero por segurança (não deveria ocorrer pelo laço acima)
-                if num_de_elementos_na_soma[k] > 0:
-                    medioides[k] = soma_medioides[k] / num_de_elementos_na_soma[k]
-                # Caso raro: manter o centróide anterior
-
-            distancias[:] = 0 # Zerar todos os elementos do array
-            WSs[:] = 0
-            # calcular a distância entre o elemento e o novo medioide
-            for i in range(0, n, 1):
-                # para todos os $ k $-clusters
-                for k in range(0, K, 1):
-                    distancias[i, k] = np.linalg.norm(sementes[i] - medioides[k])
-
-                # comparar a distância entre o elemento do BIG Data e o novo medioide
-                # associar esta distância ao novo medioide de menor distância
-                # k_min = Índice do medioide m_k de menor distância
-                k_min = distancias.tolist()[i].index(min(distancias[i, :]))
-
-                ks_min[i, 0] = k_min
-
-                WSs[k_min] = WSs[k_min] + distancias[i, k_min]
-
-            # Calcular WS
-            ks_min_anteriores = ks_min
-            WS_total_anteriores = WS_total
-            WS_total = sum(WSs)
+    # Gerador próprio, sem alterar o estado global do NumPy
+    gerador = None if semente_aleatoria is None \
+        else np.random.default_rng(semente_aleatoria)
+
+    if medioides_iniciais is not None:
+        if np.shape(medioides_iniciais) != (K, sementes.shape[1]):
+            raise ValueError("Os medioides iniciais devem ter forma (" + str(K) +
+                             ", " + str(sementes.shape[1]) + ").")
+        medioides_otimos, ks_min_otimos, WS_total_otimo, iteracoes = \
+            _executar_rodada(sementes, normas_sementes, K,
+                             num_max_iteracoes_da_rodada, opcoes, estatisticas,
+                             gerador=gerador, medioides_iniciais=medioides_iniciais,
+                             pesos=pesos)
+    elif n_init is None:
+        # I = Iteração
+        I = 0  # Iteração inicial
+
+        # enquanto houver iterações disponíveis, sortear novas sementes
+        while I <= num_max_I:
+
+            num_max_iteracoes = num_max_I - I + 1
+            if max_iter is not None:
+                num_max_iteracoes = min(num_max_iteracoes, max_iter)
+
+            medioides, ks_min, WS_total, iteracoes = \
+                _executar_rodada(sementes, normas_sementes, K,
+                                 num_max_iteracoes, opcoes, estatisticas,
+                                 gerador=gerador, pesos=pesos)
 
             # Comparar WS_total com WS_otimo
             if WS_total <= WS_total_otimo:
-                ks_min_otimos = ks_min_anteriores.copy()
-                medioides_otimos = medioides.copy()
+                ks_min_otimos = ks_min
+                medioides_otimos = medioides
+                WS_total_otimo = WS_total
+
+            I = I + iteracoes
+    else:
+        if semente_aleatoria is None:
+            semente_aleatoria = np.random.randint(0, 2 ** 31 - 1)
+        sementes_das_rodadas = np.random.SeedSequence(semente_aleatoria).spawn(n_init)
+
+        resultados = _executar_rodadas_independentes(sementes, normas_sementes, K,
+                                                     num_max_iteracoes_da_rodada,
+                                                     opcoes, sementes_das_rodadas,
+                                                     n_jobs, pesos)
+
+        # Na ordem das rodadas, fica a primeira de menor WS total
+        for medioides, ks_min, WS_total, iteracoes, estatisticas_da_rodada in resultados:
+            _mesclar_estatisticas(estatisticas, estatisticas_da_rodada)
+            if WS_total < WS_total_otimo:
+                ks_min_otimos = ks_min
+                medioides_otimos = medioides
                 WS_total_otimo = WS_total
-            elif WS_total > WS_total_otimo:
-                ks_min_otimos = ks_min_otimos.copy()
-                medioides_otimos = medioides_otimos.copy()
-                WS_total_otimo = WS_total_otimo
 
-            I = I + 1
+    if em_disco:
+        # Passagem final: etiquetas e distâncias dos medioides ótimos
+        n = sementes.shape[0]
+        if arquivo_de_etiquetas is None:
+            ks_min_otimos = np.empty(n, dtype=np.intp)
+        else:
+            ks_min_otimos = np.lib.format.open_memmap(
+                arquivo_de_etiquetas, mode="w+", dtype=np.intp, shape=(n,))
+        if arquivo_de_distancias is None:
+            distancias_otimas = np.empty(n, dtype=float)
+        else:
+            distancias_otimas = np.lib.format.open_memmap(
+                arquivo_de_distancias, mode="w+", dtype=float, shape=(n,))
+        for bloco, _, ks_do_bloco, distancias_do_bloco in \
+                _percorrer_em_blocos(sementes, medioides_otimos, dtype,
+                                     memoria_maxima):
+            ks_min_otimos[bloco] = ks_do_bloco
+            distancias_otimas[bloco] = distancias_do_bloco
+        _contabilizar(estatisticas, n * K, 0)
+
+        return distancias_otimas[:, np.newaxis], medioides_otimos, \
+            ks_min_otimos[:, np.newaxis], WS_total_otimo
 
-    # calcular a distância entre o elemento e o novo medioide
-    for i in range(0, n, 1):
-        # distância do elemento ao centróide do cluster ao qual foi atribuído
-        k_min = int(ks_min_otimos[i, 0])
-        distancias_otimas[i, 0] = np.linalg.norm(sementes[i] - medioides_otimos[k_min])
+    # distância do elemento ao centróide do cluster ao qual foi atribuído
+    distancias_otimas = \
+        _distancias_aos_medioides(sementes, medioides_otimos,
+                                  ks_min_otimos)[:, np.newaxis]
+    ks_min_otimos = ks_min_otimos[:, np.newaxis]
+
+    if inversa is not None:
+        # De volta às linhas originais
+        return lr.expandir_resultado((distancias_otimas, medioides_otimos,
+                                      ks_min_otimos, WS_total_otimo), inversa)
 
     return distancias_otimas, medioides_otimos, \
            ks_min_otimos, WS_total_otimo
+
+
+def atribuir_etiquetas(sementes, medioides, dtype=np.float64, memoria_maxima=None,
+                       sample_weight=None):
+    """
+    Atribui cada elemento ao medioide mais próximo, em uma única passagem.
+
+    Útil para levar a todos os elementos os medioides ajustados sobre um
+    subconjunto (por exemplo, um coreset; ver ``functions.coreset``).
+
+    :param sementes: Matriz de dados (n x p): densa, esparsa
+        (``scipy.sparse``), ``np.memmap`` ou caminho de um arquivo ``.npy``.
+        float.
+    :param medioides: Matriz de medioides (K x p). float.
+    :param dtype: Tipo de dado do cálculo das distâncias: ``np.float64`` ou
+        ``np.float32``.
+    :param memoria_maxima: Teto, em bytes, da memória de trabalho de cada
+        bloco (opcional). int.
+    :param sample_weight: Pesos dos elementos (n,), opcional; ponderam o WS
+        total. float.
+
+    :returns: (distancias, medioides, ks_min, WS_total), no formato de
+        ``k_means``.
+    """
+    if isinstance(sementes, (str, os.PathLike)):
+        sementes = np.load(sementes, mmap_mode="r")
+    medioides = np.array(medioides, dtype=float)
+    pesos = None if sample_weight is None else np.asarray(sample_weight,
+                                                          dtype=float).ravel()
+
+    if isinstance(sementes, np.memmap):
+        n = sementes.shape[0]
+        ks_min = np.empty(n, dtype=np.intp)
+        distancias = np.empty(n, dtype=float)
+        for bloco, _, ks_do_bloco, distancias_do_bloco in \
+                _percorrer_em_blocos(sementes, medioides, dtype, memoria_maxima):
+            ks_min[bloco] = ks_do_bloco
+            distancias[bloco] = distancias_do_bloco
+    else:
+        sementes = converter_sementes(sementes, dtype)
+        ks_min = _atribuir(sementes, medioides, memoria_maxima=memoria_maxima)
+        distancias = _distancias_aos_medioides(sementes, medioides, ks_min)
+
+    WS_total = float(np.sum(distancias)) if pesos is None \
+        else float(np.dot(pesos, distancias))
+
+    return distancias[:, np.newaxis], medioides, ks_min[:, np.newaxis], WS_total
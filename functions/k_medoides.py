@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de k-medoides (PAM) com a heurística de trocas FasterPAM.
+
+Ao contrário de ``functions.k_means``, cujos centros são médias, aqui os
+medioides são elementos reais dos dados (por exemplo, aeronaves
+representativas), e o custo é a soma (ponderada) das distâncias de cada
+elemento ao seu medioide, o mesmo WS total do resto do pacote.
+
+FasterPAM (Schubert & Rousseeuw, 2021): para cada elemento guardam-se o
+medioide mais próximo e as distâncias ao mais próximo e ao segundo mais
+próximo. A variação do custo da troca de *qualquer* medioide por um
+candidato :math:`x_c` sai de uma única passagem pelos :math:`n` elementos,
+que acumula a perda de remoção de cada medioide por um ``np.bincount`` sobre
+o medioide mais próximo; as trocas são feitas assim que melhoram o custo
+(ansiosas). Cada candidato custa :math:`O(n)` e cada passagem pelos
+candidatos :math:`O(n^2)`, em vez de :math:`O(n^2 k)`.
+
+As distâncias entre todos os pares são calculadas uma única vez, em forma
+condensada (vetor de :math:`n (n - 1) / 2` valores float32, a mesma ordem de
+``scipy.spatial.distance.pdist``), e compartilhadas por todos os k de uma
+varredura.
+
+Exemplo:
+
+.. code-block:: python
+
+    distancias = matriz_de_distancias_condensada(sementes)
+    for k in range(num_de_k_inicial, K + 1):
+        resultado = k_medoides(num_de_k_inicial, k, sementes, num_max_I,
+                               distancias=distancias)
+
+Para muitas linhas, em que a matriz de :math:`n^2 / 2` distâncias não cabe na
+memória, ``clara`` ajusta o k-medoides sobre várias amostras aleatórias, em
+paralelo, e fica com os medioides de menor WS total sobre todos os dados.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions.blocos_de_memoria as bm
+import functions.k_means as km
+import functions.linhas_repetidas as lr
+import functions.memoria_compartilhada as mc
+import functions.sortear_sementes as ss
+
+# Melhora relativa mínima do custo para que uma troca seja feita (evita
+# trocas sem ganho real por arredondamento)
+_MELHORA_RELATIVA_MINIMA = 1e-9
+
+# CLARA: número padrão de amostras e tamanho padrão de cada amostra,
+# 80 + 4 K linhas (Schubert & Rousseeuw, 2021)
+_NUM_DE_AMOSTRAS_CLARA = 5
+_TAMANHO_BASE_DA_AMOSTRA_CLARA = 80
+_TAMANHO_POR_K_DA_AMOSTRA_CLARA = 4
+
+
+def _inicio_da_linha(n: int, i):
+    """
+    Posição, na matriz condensada, do par ``(i, i + 1)``.
+
+    :param n: Número de elementos. int.
+    :param i: Índice (ou índices) da linha. int.
+    :returns: Posição (ou posições). int.
+    """
+    return n * i - i * (i + 1) // 2
+
+
+def _bases_das_colunas(n: int) -> np.ndarray:
+    """
+    Posição do par ``(i, j)`` menos ``j``, para cada linha ``i`` < ``n``.
+
+    :param n: Número de elementos. int.
+    :returns: Deslocamentos (n,). int.
+    """
+    i = np.arange(n)
+    return _inicio_da_linha(n, i) - i - 1
+
+
+def matriz_de_distancias_condensada(sementes, dtype=np.float32,
+                                    memoria_maxima: Optional[int] = None) -> np.ndarray:
+    r"""
+    Calcula as distâncias euclidianas entre todos os pares de elementos.
+
+    Os pares são calculados em blocos de linhas com produtos matriciais
+    (float64) e guardados em forma condensada: o par :math:`(i, j)`, com
+    :math:`i < j`, fica na posição :math:`n i - i (i + 1) / 2 + j - i - 1`.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param dtype: Tipo de dado da matriz condensada (padrão float32, metade
+        da memória).
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :returns: Distâncias condensadas (n (n - 1) / 2,).
+    """
+    sementes = km.converter_sementes(sementes, np.float64)
+    n = sementes.shape[0]
+    if sp.issparse(sementes):
+        normas = np.asarray(sementes.multiply(sementes).sum(axis=1)).ravel()
+    else:
+        normas = np.einsum("ij,ij->i", sementes, sementes)
+    distancias = np.empty(n * (n - 1) // 2, dtype=dtype)
+
+    for bloco in bm.blocos(n, bm.num_de_linhas_por_bloco(2 * n * 8, memoria_maxima)):
+        inicio, fim = bloco.start, min(bloco.stop, n)
+        produtos = sementes[inicio:fim] @ sementes[inicio:].T
+        if sp.issparse(produtos):
+            produtos = produtos.toarray()
+        quadradas = normas[inicio:fim, np.newaxis] - 2.0 * np.asarray(produtos) + \
+            normas[np.newaxis, inicio:]
+        # Somente os pares (i, j) com j > i, na ordem das linhas
+        superiores = np.arange(inicio, n)[np.newaxis, :] > \
+            np.arange(inicio, fim)[:, np.newaxis]
+        distancias[_inicio_da_linha(n, inicio):_inicio_da_linha(n, fim)] = \
+            np.sqrt(np.maximum(quadradas[superiores], 0.0))
+
+    return distancias
+
+
+def _linha(distancias: np.ndarray, n: int, j: int,
+           bases: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Extrai da matriz condensada as distâncias do elemento ``j`` a todos.
+
+    :param distancias: Distâncias condensadas.
+    :param n: Número de elementos. int.
+    :param j: Índice do elemento. int.
+    :param bases: ``_bases_das_colunas(n)``, reaproveitadas entre chamadas
+        (opcional).
+    :returns: Distâncias (n,), com zero na posição ``j``. float.
+    """
+    if bases is None:
+        bases = _bases_das_colunas(n)
+    linha = np.empty(n, dtype=distancias.dtype)
+    linha[:j] = distancias[bases[:j] + j]
+    linha[j] = 0.0
+    inicio = _inicio_da_linha(n, j)
+    linha[j + 1:] = distancias[inicio:inicio + n - j - 1]
+    return linha
+
+
+def _vizinhos(distancias_aos_medioides: np.ndarray):
+    """
+    Medioide mais próximo e distâncias ao primeiro e ao segundo mais próximos.
+
+    :param distancias_aos_medioides: Distâncias (n x k), k >= 2. float.
+    :returns: (proximos (n,), distancias_ao_proximo (n,),
+        distancias_ao_segundo (n,))
+    """
+    proximos = np.argmin(distancias_aos_medioides, axis=1)
+    duas_menores = np.partition(distancias_aos_medioides, 1, axis=1)
+    return proximos, duas_menores[:, 0], duas_menores[:, 1]
+
+
+def _sortear_indices_iniciais(distancias: np.ndarray, n: int, K: int,
+                              pesos: np.ndarray, gerador) -> np.ndarray:
+    """
+    Sorteia K elementos distintos por amostragem D² sobre a matriz condensada.
+
+    :param distancias: Distâncias condensadas.
+    :param n: Número de elementos. int.
+    :param K: Número de medioides. int.
+    :param pesos: Pesos dos elementos (n,). float.
+    :param gerador: Gerador de números aleatórios.
+    :returns: Índices dos medioides (K,). int.
+    """
+    indices = [int(gerador.choice(n, p=pesos / np.sum(pesos)))]
+    menores = _linha(distancias, n, indices[0]).astype(float)
+    for _ in range(1, K):
+        potenciais = pesos * menores ** 2
+        potenciais[indices] = 0.0
+        total = np.sum(potenciais)
+        if total > 0.0:
+            novo = int(gerador.choice(n, p=potenciais / total))
+        else:
+            novo = int(gerador.choice(np.setdiff1d(np.arange(n), indices)))
+        indices.append(novo)
+        np.minimum(menores, _linha(distancias, n, novo), out=menores)
+    return np.array(indices)
+
+
+def _fasterpam(distancias: np.ndarray, n: int, indices: np.ndarray,
+               pesos: np.ndarray, num_max_passagens: int,
+               estatisticas: Dict[str, Any],
+               memoria_maxima: Optional[int] = None):
+    """
+    Melhora os medioides com as trocas ansiosas do FasterPAM.
+
+    :param distancias: Distâncias condensadas.
+    :param n: Número de elementos. int.
+    :param indices: Índices dos medioides iniciais (k,), k >= 2. int.
+    :param pesos: Pesos dos elementos (n,). float.
+    :param num_max_passagens: Número máximo de passagens pelos candidatos. int.
+    :param estatisticas: Recebe ``passagens`` e ``trocas``. dict.
+    :param memoria_maxima: Orçamento de memória por bloco de candidatos em
+        bytes (opcional).
+    :returns: (indices, proximos, distancias_ao_proximo, convergiu)
+    """
+    indices = np.array(indices, dtype=np.intp)
+    K = indices.size
+    distancias_aos_medioides = np.stack(
+        [_linha(distancias, n, indice) for indice in indices], axis=1).astype(float)
+    e_medioide = np.zeros(n, dtype=bool)
+    e_medioide[indices] = True
+    bases = _bases_das_colunas(n)
+
+    def atualizar():
+        proximos, ao_proximo, ao_segundo = _vizinhos(distancias_aos_medioides)
+        custo = float(np.dot(pesos, ao_proximo))
+        limiar = -_MELHORA_RELATIVA_MINIMA * max(custo, np.finfo(float).tiny)
+        return proximos, ao_proximo, ao_segundo, custo, limiar
+
+    proximos, ao_proximo, ao_segundo, custo, limiar = atualizar()
+    # Os candidatos são avaliados em blocos; a primeira troca vantajosa do
+    # bloco é feita e a avaliação recomeça logo após o candidato trocado, o
+    # que equivale a avaliá-los um a um. O bloco cresce enquanto não há
+    # trocas e encolhe a cada troca, limitando a avaliação desperdiçada
+    linhas_por_bloco = bm.num_de_linhas_por_bloco(4 * n * 8, memoria_maxima)
+    deslocamentos = np.arange(linhas_por_bloco)[:, np.newaxis] * K
+    tamanho_do_bloco = 1
+    convergiu = False
+    for _ in range(num_max_passagens):
+        estatisticas["passagens"] += 1
+        trocou = False
+        inicio = 0
+        while inicio < n:
+            candidatos = np.arange(inicio, min(inicio + tamanho_do_bloco, n))
+            linhas = np.stack([_linha(distancias, n, candidato, bases)
+                               for candidato in candidatos]).astype(float)
+
+            # Com d_1 <= d_2 as distâncias ao primeiro e ao segundo medioide,
+            # a troca do medioide i pelo candidato c muda o custo em
+            #   sum_{x em i} w (clip(d(x, c), d_1, d_2) - d_1)
+            #     + sum_x w (min(d(x, c), d_1) - d_1),
+            # em que a primeira soma inclui a perda de remoção do FasterPAM.
+            # A primeira soma é um único np.bincount por medioide mais
+            # próximo (O(n) por candidato); a segunda, um produto escalar
+            ganhos = pesos * (np.clip(linhas, ao_proximo, ao_segundo) - ao_proximo)
+            variacoes = np.bincount(
+                (deslocamentos[:candidatos.size] + proximos).ravel(),
+                weights=ganhos.ravel(),
+                minlength=candidatos.size * K).reshape(candidatos.size, K)
+            removidos = np.argmin(variacoes, axis=1)
+            variacao = variacoes[np.arange(candidatos.size), removidos] + \
+                np.minimum(linhas, ao_proximo) @ pesos - custo
+            variacao[e_medioide[candidatos]] = np.inf
+
+            vantajosos = np.flatnonzero(variacao < limiar)
+            if vantajosos.size == 0:
+                inicio = candidatos[-1] + 1
+                tamanho_do_bloco = min(2 * tamanho_do_bloco, linhas_por_bloco)
+                continue
+            tamanho_do_bloco = max(tamanho_do_bloco // 2, 1)
+            escolhido = vantajosos[0]
+            candidato, removido = candidatos[escolhido], removidos[escolhido]
+            e_medioide[indices[removido]] = False
+            e_medioide[candidato] = True
+            indices[removido] = candidato
+            distancias_aos_medioides[:, removido] = linhas[escolhido]
+            proximos, ao_proximo, ao_segundo, custo, limiar = atualizar()
+            estatisticas["trocas"] += 1
+            trocou = True
+            inicio = candidato + 1
+        if not trocou:
+            convergiu = True
+            break
+
+    return indices, proximos, ao_proximo, convergiu
+
+
+def k_medoides(num_de_k_inicial, K, sementes, num_max_I, estatisticas=None,
+               distancias=None, indices_iniciais=None, semente_aleatoria=None,
+               sample_weight=None, memoria_maxima=None, colapsar_repetidas=False):
+    r"""
+    Executa o k-medoides (FasterPAM) e retorna distâncias, medioides e etiquetas.
+
+    Os medioides iniciais são sorteados por amostragem D² sobre a matriz de
+    distâncias (ou dados por ``indices_iniciais``, por exemplo os de k - 1
+    mais um novo elemento) e melhorados por passagens de trocas FasterPAM
+    até que nenhuma troca reduza o custo ou até ``num_max_I`` passagens.
+
+    :param num_de_k_inicial: Número de k inicial. int.
+    :param K: Número de medioides. int.
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR). float.
+    :param num_max_I: Número máximo de passagens de trocas. int.
+    :param estatisticas: Dicionário opcional preenchido com ``algorithm``,
+        ``passagens``, ``trocas``, ``convergiu`` e ``indices_dos_medioides``
+        (linhas de ``sementes`` escolhidas como medioides). dict.
+    :param distancias: Matriz de distâncias condensada de
+        ``matriz_de_distancias_condensada`` (opcional; reaproveitada entre k).
+    :param indices_iniciais: Índices dos medioides iniciais (K,), opcional.
+    :param semente_aleatoria: Semente do sorteio inicial; sem ela, o sorteio
+        usa o estado global do NumPy. int.
+    :param sample_weight: Pesos positivos dos elementos (n,), opcional. float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :param colapsar_repetidas: Se True, ajusta sobre as linhas únicas
+        ponderadas pelas suas repetições (a matriz de distâncias é a das
+        linhas únicas). bool.
+
+    :returns: (distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo)
+    """
+    sementes = km.converter_sementes(sementes, np.float64)
+
+    pesos = np.ones(sementes.shape[0]) if sample_weight is None \
+        else np.asarray(sample_weight, dtype=float).ravel()
+    if pesos.shape != (sementes.shape[0],) or not np.all(np.isfinite(pesos)) or \
+            np.any(pesos <= 0.0):
+        raise ValueError("Os pesos devem ser finitos, positivos e ter forma (" +
+                         str(sementes.shape[0]) + ",).")
+
+    inversa = None
+    if colapsar_repetidas:
+        if distancias is not None or indices_iniciais is not None:
+            raise ValueError("Com colapsar_repetidas, a matriz de distâncias e "
+                             "os índices iniciais são os das linhas únicas; "
+                             "colapse as linhas antes de calculá-los.")
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(sementes, pesos)
+
+    n = sementes.shape[0]
+    if K < 1 or K > n:
+        raise ValueError("Há somente " + str(n) + " linhas para " + str(K) +
+                         " medioides.")
+    if distancias is None:
+        distancias = matriz_de_distancias_condensada(sementes,
+                                                     memoria_maxima=memoria_maxima)
+    elif np.shape(distancias) != (n * (n - 1) // 2,):
+        raise ValueError("A matriz de distâncias não corresponde às sementes.")
+
+    if estatisticas is None:
+        estatisticas = {}
+    estatisticas.update({"algorithm": "fasterpam", "passagens": 0, "trocas": 0})
+
+    if indices_iniciais is None:
+        gerador = ss.obter_gerador(None if semente_aleatoria is None
+                                   else np.random.default_rng(semente_aleatoria))
+        indices = _sortear_indices_iniciais(distancias, n, K, pesos, gerador)
+    else:
+        indices = np.asarray(indices_iniciais, dtype=np.intp).ravel()
+        if indices.size != K or np.unique(indices).size != K:
+            raise ValueError("Os índices iniciais devem ser " + str(K) +
+                             " elementos distintos.")
+
+    if K == 1:
+        # Um único medioide: o elemento de menor soma de distâncias
+        custos = np.array([np.dot(pesos, _linha(distancias, n, j)) for j in range(n)])
+        indices = np.array([int(np.argmin(custos))])
+        ks_min = np.zeros(n, dtype=np.intp)
+        distancias_otimas = _linha(distancias, n, indices[0]).astype(float)
+        convergiu = True
+    else:
+        indices, ks_min, distancias_otimas, convergiu = _fasterpam(
+            distancias, n, indices, pesos, num_max_I, estatisticas, memoria_maxima)
+
+    estatisticas["convergiu"] = bool(convergiu)
+    estatisticas["indices_dos_medioides"] = indices.copy()
+
+    medioides_otimos = sementes[indices]
+    if sp.issparse(medioides_otimos):
+        medioides_otimos = medioides_otimos.toarray()
+    WS_total_otimo = float(np.dot(pesos, distancias_otimas))
+    resultado = (distancias_otimas[:, np.newaxis], np.asarray(medioides_otimos),
+                 ks_min[:, np.newaxis], WS_total_otimo)
+
+    if inversa is not None:
+        # Cada linha única é representada pela sua primeira ocorrência
+        estatisticas["indices_dos_medioides"] = \
+            np.unique(inversa, return_index=True)[1][indices]
+        return lr.expandir_resultado(resultado, inversa)
+    return resultado
+
+
+def _ajustar_amostra(linhas: np.ndarray, K: int, num_max_I: int,
+                     semente_da_amostra: np.random.SeedSequence,
+                     pesos_da_amostra: Optional[np.ndarray], dtype,
+                     memoria_maxima: Optional[int], sementes=None,
+                     pesos=None) -> Tuple[float, np.ndarray, Dict[str, Any]]:
+    """
+    Ajusta o k-medoides sobre uma amostra e avalia os medioides em todos os
+    dados.
+
+    :param linhas: Linhas da amostra, em ordem crescente (s,). int.
+    :param K: Número de medioides. int.
+    :param num_max_I: Número máximo de passagens de trocas. int.
+    :param semente_da_amostra: Estado aleatório próprio da amostra.
+    :param pesos_da_amostra: Pesos das linhas da amostra (s,), opcional. float.
+    :param dtype: Tipo de dado do cálculo das distâncias a todos os dados.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :param sementes: Matriz de dados completa; se omitida, a matriz
+        compartilhada do processo trabalhador.
+    :param pesos: Pesos de todos os elementos (n,), opcional; com
+        ``sementes`` omitida, os pesos compartilhados do processo
+        trabalhador, se houver. float.
+    :returns: ``(WS_total, indices_dos_medioides, estatisticas)``, com os
+        índices nas linhas de todos os dados.
+    """
+    if sementes is None:
+        sementes = mc.matriz_do_processo()
+        pesos = mc.arranjo_do_processo("pesos")
+    amostra = sementes[linhas]
+    if isinstance(amostra, np.memmap):
+        amostra = np.array(amostra)
+
+    estatisticas: Dict[str, Any] = {}
+    _, medioides, _, _ = k_medoides(
+        K, K, amostra, num_max_I, estatisticas=estatisticas,
+        semente_aleatoria=int(semente_da_amostra.generate_state(1)[0]),
+        sample_weight=pesos_da_amostra,
+        memoria_maxima=memoria_maxima)
+
+    # Avaliação em todos os dados: uma passagem em blocos, sem matriz n x n
+    WS_total = km.atribuir_etiquetas(sementes, medioides, dtype, memoria_maxima,
+                                     pesos)[3]
+    return WS_total, linhas[estatisticas["indices_dos_medioides"]], estatisticas
+
+
+def clara(num_de_k_inicial, K, sementes, num_max_I, estatisticas=None,
+          num_de_amostras=_NUM_DE_AMOSTRAS_CLARA, tamanho_da_amostra=None,
+          n_jobs=1, semente_aleatoria=None, sample_weight=None,
+          dtype=np.float64, memoria_maxima=None, colapsar_repetidas=False):
+    r"""
+    Executa o k-medoides por amostragem (CLARA) para muitas linhas.
+
+    Cada amostra aleatória de ``tamanho_da_amostra`` linhas é ajustada por
+    ``k_medoides`` (FasterPAM, com a matriz de distâncias da amostra), e os
+    seus medioides são avaliados sobre todos os dados por uma passagem em
+    blocos até o medioide mais próximo; ficam os medioides de menor WS
+    total. As amostras são independentes e ajustadas em paralelo, com a
+    matriz de dados compartilhada uma única vez entre os processos. A
+    memória de cada ajuste é a da matriz de distâncias da amostra
+    (:math:`s^2 / 2` valores float32), e não a de todos os dados.
+
+    :param num_de_k_inicial: Número de k inicial. int.
+    :param K: Número de medioides. int.
+    :param sementes: Matriz de dados (n x p): densa, esparsa (CSR),
+        ``np.memmap`` ou caminho de um arquivo ``.npy``. float.
+    :param num_max_I: Número máximo de passagens de trocas de cada amostra. int.
+    :param estatisticas: Dicionário opcional preenchido com ``algorithm``,
+        ``WSs_das_amostras``, ``amostra_escolhida``, ``indices_dos_medioides``
+        e as estatísticas do ajuste da amostra escolhida. dict.
+    :param num_de_amostras: Número de amostras. int.
+    :param tamanho_da_amostra: Número de linhas de cada amostra (padrão
+        80 + 4 K). int.
+    :param n_jobs: Número de processos (``-1`` para todos os núcleos). int.
+    :param semente_aleatoria: Semente das amostras; sem ela, é sorteada do
+        estado global do NumPy. int.
+    :param sample_weight: Pesos positivos dos elementos (n,), opcional;
+        ponderam o ajuste de cada amostra e o WS total. float.
+    :param dtype: Tipo de dado da avaliação sobre todos os dados.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :param colapsar_repetidas: Se True, amostra as linhas únicas ponderadas
+        pelas suas repetições. bool.
+
+    :returns: (distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo)
+    """
+    if isinstance(sementes, (str, os.PathLike)):
+        sementes = np.load(sementes, mmap_mode="r")
+    em_disco = isinstance(sementes, np.memmap)
+    if not em_disco:
+        sementes = km.converter_sementes(sementes, np.float64)
+    n = sementes.shape[0]
+
+    pesos = None if sample_weight is None \
+        else np.asarray(sample_weight, dtype=float).ravel()
+    if pesos is not None and (pesos.shape != (n,) or not np.all(np.isfinite(pesos))
+                              or np.any(pesos <= 0.0)):
+        raise ValueError("Os pesos devem ser finitos, positivos e ter forma (" +
+                         str(n) + ",).")
+
+    if colapsar_repetidas:
+        if em_disco:
+            raise ValueError("Fora da memória, as linhas repetidas não são "
+                             "colapsadas.")
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(sementes, pesos)
+        if estatisticas is None:
+            estatisticas = {}
+        resultado = clara(num_de_k_inicial, K, sementes, num_max_I, estatisticas,
+                          num_de_amostras, tamanho_da_amostra, n_jobs,
+                          semente_aleatoria, pesos, dtype, memoria_maxima)
+        estatisticas["indices_dos_medioides"] = \
+            np.unique(inversa, return_index=True)[1][estatisticas["indices_dos_medioides"]]
+        return lr.expandir_resultado(resultado, inversa)
+
+    if tamanho_da_amostra is None:
+        tamanho_da_amostra = _TAMANHO_BASE_DA_AMOSTRA_CLARA + \
+            _TAMANHO_POR_K_DA_AMOSTRA_CLARA * K
+    tamanho_da_amostra = min(tamanho_da_amostra, n)
+    if K < 1 or K > tamanho_da_amostra:
+        raise ValueError("Há somente " + str(tamanho_da_amostra) +
+                         " linhas por amostra para " + str(K) + " medioides.")
+    if num_de_amostras < 1:
+        raise ValueError("O número de amostras deve ser ao menos 1.")
+
+    if semente_aleatoria is None:
+        semente_aleatoria = np.random.randint(0, 2 ** 31 - 1)
+    sementes_das_amostras = np.random.SeedSequence(semente_aleatoria).spawn(
+        2 * num_de_amostras)
+    # Linhas em ordem crescente: leitura sequencial de matrizes em disco
+    amostras = [np.sort(np.random.default_rng(semente).choice(
+        n, tamanho_da_amostra, replace=False))
+        for semente in sementes_das_amostras[:num_de_amostras]]
+    # Cada tarefa leva só os pesos da sua amostra; os de todos os dados são
+    # compartilhados uma única vez entre os processos
+    tarefas = [(linhas, K, num_max_I, semente,
+                None if pesos is None else pesos[linhas], dtype, memoria_maxima)
+               for linhas, semente in zip(amostras,
+                                          sementes_das_amostras[num_de_amostras:])]
+
+    n_jobs = mc.num_de_processos(n_jobs, num_de_amostras)
+    if n_jobs <= 1:
+        resultados = [_ajustar_amostra(*tarefa, sementes=sementes, pesos=pesos)
+                      for tarefa in tarefas]
+    else:
+        if em_disco:
+            compartilhar = None
+            anexar, descritor = mc.anexar_memmap, mc.descrever_memmap(sementes)
+        elif sp.issparse(sementes):
+            compartilhar, anexar = mc.compartilhar_matriz_esparsa, mc.anexar_matriz_esparsa
+        else:
+            compartilhar, anexar = mc.compartilhar_matriz, mc.anexar_matriz
+
+        with ExitStack() as pilha:
+            # Uma matriz em disco é aberta por cada processo, sem cópias
+            if compartilhar is not None:
+                descritor = pilha.enter_context(compartilhar(sementes))
+            descritores_dos_arranjos = pilha.enter_context(
+                mc.compartilhar_arranjos({"pesos": pesos}))
+            with ProcessPoolExecutor(max_workers=n_jobs,
+                                     initializer=mc.anexar_matriz_e_arranjos,
+                                     initargs=(anexar, descritor,
+                                               descritores_dos_arranjos)) as executor:
+                futuros = [executor.submit(_ajustar_amostra, *tarefa)
+                           for tarefa in tarefas]
+                resultados = [futuro.result() for futuro in futuros]
+
+    WSs_das_amostras = [resultado[0] for resultado in resultados]
+    escolhida = int(np.argmin(WSs_das_amostras))
+    _, indices, estatisticas_da_amostra = resultados[escolhida]
+
+    if estatisticas is None:
+        estatisticas = {}
+    estatisticas.update(estatisticas_da_amostra)
+    estatisticas.update({"algorithm": "clara",
+                         "WSs_das_amostras": WSs_das_amostras,
+                         "amostra_escolhida": escolhida,
+                         "indices_dos_medioides": indices})
+
+    medioides_otimos = sementes[indices]
+    if sp.issparse(medioides_otimos):
+        medioides_otimos = medioides_otimos.toarray()
+    return km.atribuir_etiquetas(sementes, np.asarray(medioides_otimos, dtype=float),
+                                 dtype, memoria_maxima, pesos)
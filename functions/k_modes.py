@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de k-modes para variáveis categóricas.
+
+Codificar categóricas como rótulos inteiros e usar a distância euclidiana
+induz distâncias artificiais, e a codificação one-hot multiplica o número
+de colunas. O k-modes (Huang, 1998) usa a dissimilaridade de Hamming (o
+número de variáveis em que dois elementos diferem) e, como centro de cada
+cluster, a moda de cada variável.
+
+As categorias de cada coluna são codificadas uma única vez como inteiros
+compactos (uint8 até 256 categorias, uint16 até 65536), e:
+
+- as dissimilaridades de um bloco de linhas a todas as modas saem de uma
+  única comparação vetorizada (bloco x K x p), dentro do orçamento de
+  memória;
+- as modas são atualizadas por um único ``np.bincount`` dos pares
+  (cluster, categoria) de todas as colunas.
+
+Exemplo:
+
+.. code-block:: python
+
+    codigos, categorias = codificar_categoricas(tabela_categorica)
+    resultado = k_modes(num_de_k_inicial, K, codigos, num_max_I)
+    modos = decodificar_modos(resultado[1], categorias)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import functions.blocos_de_memoria as bm
+import functions.sortear_sementes as ss
+
+
+def _tipo_dos_codigos(num_de_categorias: int):
+    """
+    Menor tipo inteiro sem sinal capaz de guardar os códigos.
+
+    :param num_de_categorias: Maior número de categorias de uma coluna. int.
+    :returns: ``np.uint8``, ``np.uint16`` ou ``np.uint32``.
+    """
+    for tipo in (np.uint8, np.uint16):
+        if num_de_categorias <= np.iinfo(tipo).max + 1:
+            return tipo
+    return np.uint32
+
+
+def codificar_categoricas(tabela) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Codifica cada coluna categórica como inteiros compactos.
+
+    :param tabela: Tabela categórica (n x p): ``np.ndarray``, lista de
+        linhas ou ``pd.DataFrame``; valores de qualquer tipo comparável
+        (textos, inteiros...). Colunas com tipos misturados são comparadas
+        como texto.
+    :returns: ``(codigos, categorias)``: matriz C-contígua (n x p) de
+        inteiros sem sinal e, por coluna, as categorias em ordem, de modo
+        que ``categorias[j][codigos[i, j]]`` é o valor original.
+    """
+    tabela = np.asarray(getattr(tabela, "values", tabela), dtype=object)
+    if tabela.ndim == 1:
+        tabela = tabela[:, np.newaxis]
+    if tabela.ndim != 2:
+        raise ValueError("A tabela categórica deve ter duas dimensões (n x p).")
+
+    categorias = []
+    codigos = []
+    for coluna in tabela.T:
+        try:
+            valores, codigos_da_coluna = np.unique(coluna, return_inverse=True)
+        except TypeError:
+            valores, codigos_da_coluna = np.unique(coluna.astype(str),
+                                                   return_inverse=True)
+        categorias.append(valores)
+        codigos.append(codigos_da_coluna)
+
+    tipo = _tipo_dos_codigos(max((len(valores) for valores in categorias), default=1))
+    codigos = np.ascontiguousarray(np.column_stack(codigos) if codigos else
+                                   np.empty((tabela.shape[0], 0)), dtype=tipo)
+    return codigos, categorias
+
+
+def decodificar_modos(modos: np.ndarray, categorias: List[np.ndarray]) -> np.ndarray:
+    """
+    Converte os códigos das modas de volta para as categorias originais.
+
+    :param modos: Modas (K x p), em códigos.
+    :param categorias: Categorias por coluna, de ``codificar_categoricas``.
+    :returns: Modas (K x p) com os valores originais. object.
+    """
+    modos = np.asarray(modos)
+    decodificados = np.empty(modos.shape, dtype=object)
+    for j, valores in enumerate(categorias):
+        decodificados[:, j] = valores[modos[:, j]]
+    return decodificados
+
+
+def converter_codigos(codigos) -> np.ndarray:
+    """
+    Valida a matriz de códigos e a converte em uma matriz C-contígua.
+
+    :param codigos: Códigos (n x p) não negativos. int.
+    :returns: Matriz C-contígua de inteiros sem sinal.
+    """
+    codigos = np.asarray(codigos)
+    if codigos.ndim != 2:
+        raise ValueError("Os códigos categóricos devem ter duas dimensões (n x p).")
+    if not np.issubdtype(codigos.dtype, np.integer):
+        raise ValueError("Os códigos categóricos devem ser inteiros; use "
+                         "codificar_categoricas.")
+    if codigos.size and codigos.min() < 0:
+        raise ValueError("Os códigos categóricos devem ser não negativos.")
+    if np.issubdtype(codigos.dtype, np.unsignedinteger) and codigos.dtype.itemsize <= 4:
+        return np.ascontiguousarray(codigos)
+    maximo = int(codigos.max()) + 1 if codigos.size else 1
+    return np.ascontiguousarray(codigos, dtype=_tipo_dos_codigos(maximo))
+
+
+def distancias_de_hamming(codigos: np.ndarray, modos: np.ndarray,
+                          memoria_maxima: Optional[int] = None) -> np.ndarray:
+    """
+    Dissimilaridade de Hamming de cada elemento a cada moda.
+
+    :param codigos: Códigos (n x p).
+    :param modos: Modas (K x p), em códigos.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :returns: Número de variáveis diferentes (n x K). int.
+    """
+    n, p = codigos.shape
+    K = modos.shape[0]
+    modos = np.asarray(modos, dtype=codigos.dtype)
+    distancias = np.empty((n, K), dtype=np.intp)
+    for bloco in bm.blocos(n, bm.num_de_linhas_por_bloco(K * (p + 8), memoria_maxima)):
+        # Uma única comparação do bloco com todas as modas
+        np.sum(codigos[bloco, np.newaxis, :] != modos[np.newaxis, :, :], axis=2,
+               out=distancias[bloco])
+    return distancias
+
+
+def atualizar_modos(codigos: np.ndarray, ks_min: np.ndarray, K: int,
+                    num_de_categorias: np.ndarray,
+                    pesos: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Moda de cada coluna em cada cluster, por um único histograma.
+
+    :param codigos: Códigos (n x p).
+    :param ks_min: Cluster de cada elemento (n,). int.
+    :param K: Número de clusters. int.
+    :param num_de_categorias: Número de categorias de cada coluna (p,). int.
+    :param pesos: Pesos dos elementos (n,), opcional.
+    :returns: ``(modos, massas)``: modas (K x p), em códigos, e massa (soma
+        dos pesos) de cada cluster (K,).
+    """
+    n, p = codigos.shape
+    num_de_categorias = np.asarray(num_de_categorias, dtype=np.intp)
+    deslocamentos = np.concatenate(([0], np.cumsum(num_de_categorias)[:-1])).astype(np.intp)
+    total = int(np.sum(num_de_categorias))
+    # Par (cluster, coluna, categoria) de cada valor, em um único índice
+    pares = ks_min[:, np.newaxis] * total + deslocamentos + codigos
+    histograma = np.bincount(pares.ravel(),
+                             weights=None if pesos is None else np.repeat(pesos, p),
+                             minlength=K * total).reshape(K, total)
+
+    modos = np.empty((K, p), dtype=codigos.dtype)
+    for j in range(p):
+        inicio = deslocamentos[j]
+        modos[:, j] = np.argmax(histograma[:, inicio:inicio + num_de_categorias[j]],
+                                axis=1)
+    massas = np.bincount(ks_min, weights=pesos, minlength=K)
+    return modos, massas
+
+
+def _sortear_modos_iniciais(codigos: np.ndarray, K: int, inicializacao: str,
+                            pesos: Optional[np.ndarray], gerador,
+                            memoria_maxima: Optional[int]) -> np.ndarray:
+    """
+    Sorteia K linhas como modas iniciais.
+
+    :param codigos: Códigos (n x p).
+    :param K: Número de clusters. int.
+    :param inicializacao: ``"k-modes++"`` (probabilidade proporcional ao
+        quadrado da dissimilaridade à moda mais próxima) ou ``"aleatoria"``.
+    :param pesos: Pesos dos elementos (n,), opcional.
+    :param gerador: Gerador de números aleatórios.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :returns: Modas iniciais (K x p), em códigos.
+    """
+    n = codigos.shape[0]
+    probabilidades = None if pesos is None else pesos / np.sum(pesos)
+    if inicializacao == "aleatoria":
+        return codigos[gerador.choice(n, K, replace=False, p=probabilidades)].copy()
+
+    linhas = [int(gerador.choice(n, p=probabilidades))]
+    menores = distancias_de_hamming(codigos, codigos[linhas], memoria_maxima)[:, 0]
+    for _ in range(1, K):
+        potenciais = menores.astype(float) ** 2
+        if pesos is not None:
+            potenciais *= pesos
+        total = np.sum(potenciais)
+        if total > 0.0:
+            linha = int(gerador.choice(n, p=potenciais / total))
+        else:
+            linha = int(gerador.choice(n))
+        linhas.append(linha)
+        np.minimum(menores,
+                   distancias_de_hamming(codigos, codigos[[linha]], memoria_maxima)[:, 0],
+                   out=menores)
+    return codigos[linhas].copy()
+
+
+def _executar_k_modes(codigos: np.ndarray, modos: np.ndarray, num_max_iteracoes: int,
+                      num_de_categorias: np.ndarray, pesos: Optional[np.ndarray],
+                      memoria_maxima: Optional[int]):
+    """
+    Iterações de k-modes: atribuição pela menor dissimilaridade e
+    atualização das modas, até que nenhuma etiqueta mude.
+
+    Um cluster vazio recebe o elemento mais distante da sua moda.
+
+    :returns: (modos, distancias, ks_min, iteracoes, convergiu)
+    """
+    K = modos.shape[0]
+    ks_anteriores = None
+    iteracoes = 0
+    convergiu = False
+    while True:
+        todas = distancias_de_hamming(codigos, modos, memoria_maxima)
+        ks_min = np.argmin(todas, axis=1)
+        distancias = todas[np.arange(codigos.shape[0]), ks_min]
+        if ks_anteriores is not None and np.array_equal(ks_min, ks_anteriores):
+            convergiu = True
+            break
+        if iteracoes >= num_max_iteracoes:
+            break
+        iteracoes += 1
+
+        modos, massas = atualizar_modos(codigos, ks_min, K, num_de_categorias, pesos)
+        for vazio in np.flatnonzero(massas == 0):
+            mais_distante = int(np.argmax(distancias))
+            modos[vazio] = codigos[mais_distante]
+            distancias[mais_distante] = 0
+        ks_anteriores = ks_min
+
+    return modos, distancias, ks_min, iteracoes, convergiu
+
+
+def k_modes(num_de_k_inicial, K, sementes, num_max_I, estatisticas=None,
+            inicializacao="k-modes++", n_init=1, semente_aleatoria=None,
+            modos_iniciais=None, sample_weight=None, memoria_maxima=None):
+    r"""
+    Executa o k-modes e retorna dissimilaridades, modas e etiquetas.
+
+    :param num_de_k_inicial: Número de k inicial. int.
+    :param K: Número de clusters. int.
+    :param sementes: Códigos categóricos (n x p), de ``codificar_categoricas``.
+        int.
+    :param num_max_I: Número máximo de iterações de cada rodada. int.
+    :param estatisticas: Dicionário opcional preenchido com ``algorithm``,
+        ``iteracoes``, ``convergiu`` e ``WSs_das_rodadas``. dict.
+    :param inicializacao: ``"k-modes++"`` ou ``"aleatoria"``. str.
+    :param n_init: Número de rodadas independentes; fica a de menor WS
+        total. int.
+    :param semente_aleatoria: Semente das rodadas; sem ela, o sorteio usa o
+        estado global do NumPy. int.
+    :param modos_iniciais: Modas de partida (K x p), em códigos (opcional;
+        uma única rodada).
+    :param sample_weight: Pesos positivos dos elementos (n,), opcional. float.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+
+    :returns: (distancias_otimas, modos_otimos, ks_min_otimos, WS_total_otimo),
+        no formato de ``k_means``: ``distancias_otimas`` (n x 1) é o número
+        de variáveis em que cada elemento difere da moda do seu cluster e
+        ``WS_total_otimo`` a sua soma (ponderada).
+    """
+    codigos = converter_codigos(sementes)
+    n, p = codigos.shape
+    if K < 1 or K > n:
+        raise ValueError("Há somente " + str(n) + " linhas para " + str(K) +
+                         " clusters.")
+    if inicializacao not in ("k-modes++", "aleatoria"):
+        raise ValueError("Inicialização desconhecida: '" + str(inicializacao) +
+                         "'. Use \"k-modes++\" ou \"aleatoria\".")
+
+    pesos = None
+    if sample_weight is not None:
+        pesos = np.asarray(sample_weight, dtype=float).ravel()
+        if pesos.shape != (n,) or not np.all(np.isfinite(pesos)) or np.any(pesos <= 0.0):
+            raise ValueError("Os pesos devem ser finitos, positivos e ter forma (" +
+                             str(n) + ",).")
+
+    num_de_categorias = codigos.max(axis=0).astype(np.intp) + 1 if n and p \
+        else np.ones(p, dtype=np.intp)
+
+    if modos_iniciais is not None:
+        modos_iniciais = np.asarray(modos_iniciais)
+        if modos_iniciais.shape != (K, p):
+            raise ValueError("As modas iniciais devem ter forma (" + str(K) + ", " +
+                             str(p) + ").")
+        num_de_categorias = np.maximum(num_de_categorias,
+                                       modos_iniciais.max(axis=0).astype(np.intp) + 1)
+        partidas = [modos_iniciais.astype(codigos.dtype)]
+    else:
+        gerador = ss.obter_gerador(None if semente_aleatoria is None
+                                   else np.random.default_rng(semente_aleatoria))
+        partidas = [_sortear_modos_iniciais(codigos, K, inicializacao, pesos, gerador,
+                                            memoria_maxima)
+                    for _ in range(max(1, n_init))]
+
+    melhor = None
+    WSs_das_rodadas = []
+    for modos in partidas:
+        modos, distancias, ks_min, iteracoes, convergiu = _executar_k_modes(
+            codigos, modos, num_max_I, num_de_categorias, pesos, memoria_maxima)
+        WS_total = float(np.sum(distancias)) if pesos is None \
+            else float(np.dot(pesos, distancias))
+        WSs_das_rodadas.append(WS_total)
+        if melhor is None or WS_total < melhor[3]:
+            melhor = (distancias, modos, ks_min, WS_total, iteracoes, convergiu)
+
+    distancias, modos, ks_min, WS_total, iteracoes, convergiu = melhor
+    if estatisticas is not None:
+        estatisticas.update({"algorithm": "k_modes", "iteracoes": iteracoes,
+                             "convergiu": bool(convergiu),
+                             "WSs_das_rodadas": WSs_das_rodadas})
+
+    return (distancias.astype(float)[:, np.newaxis], modos,
+            ks_min[:, np.newaxis], WS_total)
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de k-prototypes para tabelas mistas (numéricas e categóricas).
+
+O k-prototypes (Huang, 1997) agrupa a tabela bruta sem a exportação one-hot:
+cada protótipo tem as médias das variáveis numéricas e as modas das
+categóricas, e o custo de um elemento :math:`x` a um protótipo
+:math:`(\mu, m)` é
+
+.. math:: c(x) = \lVert x^{num} - \mu \rVert^2
+                 + \gamma \sum_j [x^{cat}_j \neq m_j].
+
+O bloco numérico é uma matriz float32 (ou float64, densa ou CSR) e o
+categórico, os códigos inteiros compactos de
+``functions.k_modes.codificar_categoricas``. Em cada bloco de linhas, as
+duas parcelas do custo a todos os protótipos são calculadas juntas (um
+produto matricial e uma comparação vetorizada), dentro do orçamento de
+memória. Sem :math:`\gamma` explícito, ``gama_automatico`` o estima a partir
+da dispersão das variáveis numéricas.
+
+As distâncias retornadas são :math:`\sqrt{c(x)}`, de modo que, sem
+variáveis categóricas, coincidem com as de ``functions.k_means``, e o WS
+total é a sua soma (ponderada).
+
+Exemplo:
+
+.. code-block:: python
+
+    codigos, categorias = codificar_categoricas(tabela[colunas_categoricas])
+    numericas = tabela[colunas_numericas].values
+    resultado = k_prototypes(num_de_k_inicial, K, numericas, codigos, num_max_I)
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions.blocos_de_memoria as bm
+import functions.k_means as km
+import functions.k_modes as kmo
+import functions.sortear_sementes as ss
+
+# Fração do desvio padrão médio das variáveis numéricas usada como gama
+# (Huang sugere entre 1/3 e 2/3)
+_FRACAO_DO_DESVIO_PADRAO_NO_GAMA = 0.5
+
+
+def gama_automatico(sementes, pesos: Optional[np.ndarray] = None) -> float:
+    r"""
+    Estima o peso :math:`\gamma` das variáveis categóricas.
+
+    :math:`\gamma` é metade do desvio padrão médio (ponderado) das variáveis
+    numéricas, de modo que diferir em uma categoria pesa como um desvio
+    típico das numéricas.
+
+    :param sementes: Bloco numérico (n x p), denso ou esparso (CSR).
+    :param pesos: Pesos dos elementos (n,), opcional.
+    :returns: Gama. float.
+    """
+    sementes = km.converter_sementes(sementes, np.float64)
+    if sementes.shape[1] == 0:
+        return 1.0
+    pesos = np.ones(sementes.shape[0]) if pesos is None \
+        else np.asarray(pesos, dtype=float).ravel()
+    massa = float(np.sum(pesos))
+    medias = np.asarray(sementes.T @ pesos).ravel() / massa
+    quadrados = sementes.multiply(sementes) if sp.issparse(sementes) else sementes ** 2
+    variancias = np.asarray(quadrados.T @ pesos).ravel() / massa - medias ** 2
+    gama = _FRACAO_DO_DESVIO_PADRAO_NO_GAMA * float(np.mean(np.sqrt(np.maximum(variancias, 0.0))))
+    return gama if gama > 0.0 else 1.0
+
+
+def _normas_quadradas(sementes) -> np.ndarray:
+    """
+    Norma quadrada de cada linha, em float64.
+
+    :param sementes: Bloco numérico (n x p), denso ou esparso (CSR).
+    :returns: Normas quadradas (n,).
+    """
+    if sp.issparse(sementes):
+        return np.asarray(sementes.multiply(sementes).sum(axis=1), dtype=float).ravel()
+    return np.einsum("ij,ij->i", sementes, sementes, dtype=float)
+
+
+def _custos_do_bloco(numericas, normas, codigos, medias, normas_medias, modos,
+                     gama: float) -> np.ndarray:
+    """
+    Custo de cada linha do bloco a cada protótipo, em uma única passagem.
+
+    :param numericas: Bloco numérico (b x p).
+    :param normas: Normas quadradas das linhas (b,).
+    :param codigos: Códigos categóricos (b x q).
+    :param medias: Médias dos protótipos (K x p), no tipo do cálculo.
+    :param normas_medias: Normas quadradas das médias (K,).
+    :param modos: Modas dos protótipos (K x q), em códigos.
+    :param gama: Peso das variáveis categóricas. float.
+    :returns: Custos (b x K).
+    """
+    produtos = numericas @ medias.T
+    custos = normas[:, np.newaxis] - 2.0 * np.asarray(produtos) + normas_medias
+    np.maximum(custos, 0.0, out=custos)
+    # Uma única comparação do bloco com todas as modas
+    custos += gama * np.sum(codigos[:, np.newaxis, :] != modos[np.newaxis, :, :], axis=2)
+    return custos
+
+
+def _percorrer(numericas, normas, codigos, medias, modos, gama: float,
+               memoria_maxima: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Atribui cada elemento ao protótipo de menor custo, em blocos de linhas.
+
+    :returns: ``(ks_min, custos)``, ambos (n,).
+    """
+    n = numericas.shape[0]
+    K = medias.shape[0]
+    medias = np.asarray(medias, dtype=numericas.dtype)
+    normas_medias = np.einsum("ij,ij->i", medias, medias, dtype=float)
+    ks_min = np.empty(n, dtype=np.intp)
+    custos = np.empty(n)
+    bytes_por_linha = (numericas.shape[1] * numericas.dtype.itemsize
+                       + K * (codigos.shape[1] + 3 * 8))
+    for bloco in bm.blocos(n, bm.num_de_linhas_por_bloco(bytes_por_linha, memoria_maxima)):
+        custos_do_bloco = _custos_do_bloco(numericas[bloco], normas[bloco],
+                                           codigos[bloco], medias, normas_medias,
+                                           modos, gama)
+        ks_min[bloco] = np.argmin(custos_do_bloco, axis=1)
+        custos[bloco] = custos_do_bloco[np.arange(custos_do_bloco.shape[0]),
+                                        ks_min[bloco]]
+    return ks_min, custos
+
+
+def _medias_por_cluster(numericas, ks_min: np.ndarray, K: int,
+                        pesos: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Soma, por cluster, as variáveis numéricas com ``np.bincount`` (em float64).
+
+    :returns: ``(somas (K x p), massas (K,))``
+    """
+    p = numericas.shape[1]
+    if sp.issparse(numericas):
+        cluster_de_cada_valor = np.repeat(ks_min, np.diff(numericas.indptr))
+        valores = numericas.data if pesos is None else \
+            numericas.data * np.repeat(pesos, np.diff(numericas.indptr))
+        somas = np.bincount(cluster_de_cada_valor * p + numericas.indices,
+                            weights=valores, minlength=K * p).reshape(K, p)
+    else:
+        somas = np.empty((K, p))
+        for j in range(p):
+            somas[:, j] = np.bincount(ks_min, weights=numericas[:, j] if pesos is None
+                                      else pesos * numericas[:, j], minlength=K)
+    return somas, np.bincount(ks_min, weights=pesos, minlength=K)
+
+
+def _linha_densa(numericas, linha: int) -> np.ndarray:
+    """
+    Uma linha do bloco numérico como vetor denso float64.
+    """
+    valores = numericas[linha]
+    if sp.issparse(valores):
+        valores = valores.toarray()
+    return np.asarray(valores, dtype=float).ravel()
+
+
+def _sortear_prototipos_iniciais(numericas, normas, codigos, K: int, gama: float,
+                                 pesos: Optional[np.ndarray], gerador,
+                                 memoria_maxima: Optional[int]):
+    """
+    Sorteia K linhas como protótipos iniciais, com probabilidade proporcional
+    ao custo ao protótipo mais próximo já sorteado.
+
+    :returns: ``(medias (K x p), modos (K x q))``
+    """
+    n = numericas.shape[0]
+    linhas = [int(gerador.choice(n, p=None if pesos is None else pesos / np.sum(pesos)))]
+    menores = np.full(n, np.inf)
+    for _ in range(1, K):
+        _, custos = _percorrer(numericas, normas, codigos,
+                               _linha_densa(numericas, linhas[-1])[np.newaxis, :],
+                               codigos[[linhas[-1]]], gama, memoria_maxima)
+        np.minimum(menores, custos, out=menores)
+        potenciais = menores if pesos is None else pesos * menores
+        total = float(np.sum(potenciais))
+        linhas.append(int(gerador.choice(n, p=potenciais / total)) if total > 0.0
+                      else int(gerador.choice(n)))
+    medias = np.vstack([_linha_densa(numericas, linha) for linha in linhas])
+    return medias, codigos[linhas].copy()
+
+
+def _executar_k_prototypes(numericas, normas, codigos, medias, modos,
+                           num_max_iteracoes: int, gama: float,
+                           num_de_categorias: np.ndarray,
+                           pesos: Optional[np.ndarray], memoria_maxima: Optional[int]):
+    """
+    Iterações de k-prototypes: atribuição pelo menor custo e atualização das
+    médias e modas, até que nenhuma etiqueta mude.
+
+    Um cluster vazio recebe o elemento de maior custo.
+
+    :returns: (medias, modos, custos, ks_min, iteracoes, convergiu)
+    """
+    K = medias.shape[0]
+    ks_anteriores = None
+    iteracoes = 0
+    convergiu = False
+    while True:
+        ks_min, custos = _percorrer(numericas, normas, codigos, medias, modos, gama,
+                                    memoria_maxima)
+        if ks_anteriores is not None and np.array_equal(ks_min, ks_anteriores):
+            convergiu = True
+            break
+        if iteracoes >= num_max_iteracoes:
+            break
+        iteracoes += 1
+
+        somas, massas = _medias_por_cluster(numericas, ks_min, K, pesos)
+        medias = np.where(massas[:, np.newaxis] > 0.0,
+                          somas / np.maximum(massas, np.finfo(float).tiny)[:, np.newaxis],
+                          medias)
+        modos = np.where(massas[:, np.newaxis] > 0.0,
+                         kmo.atualizar_modos(codigos, ks_min, K, num_de_categorias,
+                                             pesos)[0],
+                         modos).astype(codigos.dtype)
+        for vazio in np.flatnonzero(massas == 0.0):
+            mais_distante = int(np.argmax(custos))
+            medias[vazio] = _linha_densa(numericas, mais_distante)
+            modos[vazio] = codigos[mais_distante]
+            custos[mais_distante] = 0.0
+        ks_anteriores = ks_min
+
+    return medias, modos, custos, ks_min, iteracoes, convergiu
+
+
+def _converter_blocos(sementes, codigos, dtype):
+    """
+    Converte o bloco numérico e os códigos e confere se têm as mesmas linhas.
+
+    :returns: ``(numericas, codigos)``
+    """
+    numericas = km.converter_sementes(sementes, dtype)
+    codigos = kmo.converter_codigos(codigos)
+    if numericas.shape[0] != codigos.shape[0]:
+        raise ValueError("O bloco numérico tem " + str(numericas.shape[0]) +
+                         " linhas e o categórico, " + str(codigos.shape[0]) + ".")
+    return numericas, codigos
+
+
+def atribuir_prototipos(sementes, codigos, prototipos, gama: float,
+                        dtype=np.float32, memoria_maxima=None, sample_weight=None):
+    """
+    Atribui cada elemento ao protótipo de menor custo, em uma única passagem.
+
+    Útil para levar a todos os elementos os protótipos ajustados sobre um
+    subconjunto (por exemplo, um coreset; ver ``functions.coreset``).
+
+    :param sementes: Bloco numérico (n x p), denso ou esparso (CSR). float.
+    :param codigos: Códigos categóricos (n x q). int.
+    :param prototipos: Protótipos (K x (p + q)): médias e, em seguida, os
+        códigos das modas, como retornados por ``k_prototypes``. float.
+    :param gama: Peso das variáveis categóricas. float.
+    :param dtype: Tipo de dado do bloco numérico no cálculo.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+    :param sample_weight: Pesos dos elementos (n,), opcional; ponderam o WS
+        total. float.
+
+    :returns: (distancias, prototipos, ks_min, WS_total), no formato de
+        ``k_means``.
+    """
+    numericas, codigos = _converter_blocos(sementes, codigos, dtype)
+    prototipos = np.asarray(prototipos, dtype=float)
+    p = numericas.shape[1]
+    if prototipos.ndim != 2 or prototipos.shape[1] != p + codigos.shape[1]:
+        raise ValueError("Os protótipos devem ter " + str(p + codigos.shape[1]) +
+                         " colunas (numéricas e categóricas).")
+    ks_min, custos = _percorrer(numericas, _normas_quadradas(numericas), codigos,
+                                prototipos[:, :p],
+                                prototipos[:, p:].astype(codigos.dtype), gama,
+                                memoria_maxima)
+    distancias = np.sqrt(custos)
+    WS_total = float(np.sum(distancias)) if sample_weight is None \
+        else float(np.dot(np.asarray(sample_weight, dtype=float).ravel(), distancias))
+    return distancias[:, np.newaxis], prototipos, ks_min[:, np.newaxis], WS_total
+
+
+def k_prototypes(num_de_k_inicial, K, sementes, codigos, num_max_I, estatisticas=None,
+                 gama=None, n_init=1, semente_aleatoria=None, prototipos_iniciais=None,
+                 sample_weight=None, dtype=np.float32, memoria_maxima=None):
+    r"""
+    Executa o k-prototypes e retorna distâncias, protótipos e etiquetas.
+
+    :param num_de_k_inicial: Número de k inicial. int.
+    :param K: Número de clusters. int.
+    :param sementes: Bloco numérico (n x p), denso ou esparso (CSR). float.
+    :param codigos: Códigos categóricos (n x q), de
+        ``functions.k_modes.codificar_categoricas``. int.
+    :param num_max_I: Número máximo de iterações de cada rodada. int.
+    :param estatisticas: Dicionário opcional preenchido com ``algorithm``,
+        ``gama``, ``iteracoes``, ``convergiu`` e ``WSs_das_rodadas``. dict.
+    :param gama: Peso das variáveis categóricas (padrão: ``gama_automatico``).
+        float.
+    :param n_init: Número de rodadas independentes; fica a de menor WS
+        total. int.
+    :param semente_aleatoria: Semente das rodadas; sem ela, o sorteio usa o
+        estado global do NumPy. int.
+    :param prototipos_iniciais: Protótipos de partida (K x (p + q)), com as
+        médias e os códigos das modas (opcional; uma única rodada). float.
+    :param sample_weight: Pesos positivos dos elementos (n,), opcional. float.
+    :param dtype: Tipo de dado do bloco numérico no cálculo: ``np.float32``
+        ou ``np.float64``.
+    :param memoria_maxima: Orçamento de memória por bloco em bytes (opcional).
+
+    :returns: (distancias_otimas, prototipos_otimos, ks_min_otimos,
+        WS_total_otimo), no formato de ``k_means``: ``prototipos_otimos``
+        (K x (p + q)) tem as médias e, em seguida, os códigos das modas, e
+        ``distancias_otimas`` (n x 1) é a raiz do custo de cada elemento.
+    """
+    numericas, codigos = _converter_blocos(sementes, codigos, dtype)
+    n, p = numericas.shape
+    q = codigos.shape[1]
+    if K < 1 or K > n:
+        raise ValueError("Há somente " + str(n) + " linhas para " + str(K) +
+                         " clusters.")
+
+    pesos = None
+    if sample_weight is not None:
+        pesos = np.asarray(sample_weight, dtype=float).ravel()
+        if pesos.shape != (n,) or not np.all(np.isfinite(pesos)) or np.any(pesos <= 0.0):
+            raise ValueError("Os pesos devem ser finitos, positivos e ter forma (" +
+                             str(n) + ",).")
+    if gama is None:
+        gama = gama_automatico(numericas, pesos)
+    elif gama < 0.0:
+        raise ValueError("O peso das variáveis categóricas deve ser não negativo.")
+
+    normas = _normas_quadradas(numericas)
+    num_de_categorias = codigos.max(axis=0).astype(np.intp) + 1 if n and q \
+        else np.ones(q, dtype=np.intp)
+
+    if prototipos_iniciais is not None:
+        prototipos_iniciais = np.asarray(prototipos_iniciais, dtype=float)
+        if prototipos_iniciais.shape != (K, p + q):
+            raise ValueError("Os protótipos iniciais devem ter forma (" + str(K) +
+                             ", " + str(p + q) + ").")
+        modos = prototipos_iniciais[:, p:].astype(codigos.dtype)
+        if q:
+            num_de_categorias = np.maximum(num_de_categorias,
+                                           modos.max(axis=0).astype(np.intp) + 1)
+        partidas = [(prototipos_iniciais[:, :p].copy(), modos)]
+    else:
+        gerador = ss.obter_gerador(None if semente_aleatoria is None
+                                   else np.random.default_rng(semente_aleatoria))
+        partidas = [_sortear_prototipos_iniciais(numericas, normas, codigos, K, gama,
+                                                 pesos, gerador, memoria_maxima)
+                    for _ in range(max(1, n_init))]
+
+    melhor = None
+    WSs_das_rodadas = []
+    for medias, modos in partidas:
+        medias, modos, custos, ks_min, iteracoes, convergiu = _executar_k_prototypes(
+            numericas, normas, codigos, medias, modos, num_max_I, gama,
+            num_de_categorias, pesos, memoria_maxima)
+        distancias = np.sqrt(custos)
+        WS_total = float(np.sum(distancias)) if pesos is None \
+            else float(np.dot(pesos, distancias))
+        WSs_das_rodadas.append(WS_total)
+        if melhor is None or WS_total < melhor[3]:
+            melhor = (distancias, np.hstack([medias, modos.astype(float)]), ks_min,
+                      WS_total, iteracoes, convergiu)
+
+    distancias, prototipos, ks_min, WS_total, iteracoes, convergiu = melhor
+    if estatisticas is not None:
+        estatisticas.update({"algorithm": "k_prototypes", "gama": gama,
+                             "iteracoes": iteracoes, "convergiu": bool(convergiu),
+                             "WSs_das_rodadas": WSs_das_rodadas})
+
+    return distancias[:, np.newaxis], prototipos, ks_min[:, np.newaxis], WS_total
+
+
+def incorporar_tabela_mista(sementes, codigos, gama: float, dtype=np.float64):
+    r"""
+    Representa a tabela mista por uma matriz esparsa (CSR) cujas distâncias
+    euclidianas são as do k-prototypes.
+
+    Cada coluna categórica vira um bloco de indicadores com valor
+    :math:`\sqrt{\gamma / 2}`, de modo que duas categorias diferentes somam
+    :math:`\gamma` à distância quadrada; a distância quadrada entre duas
+    linhas é então o custo :math:`c` do k-prototypes. Útil para os índices
+    de validação (CH, DB, silhueta), que só conhecem a distância euclidiana.
+
+    :param sementes: Bloco numérico (n x p), denso ou esparso (CSR). float.
+    :param codigos: Códigos categóricos (n x q). int.
+    :param gama: Peso das variáveis categóricas. float.
+    :param dtype: Tipo de dado da matriz.
+    :returns: Matriz CSR (n x (p + número total de categorias)).
+    """
+    numericas, codigos = _converter_blocos(sementes, codigos, dtype)
+    n, q = codigos.shape
+    num_de_categorias = codigos.max(axis=0).astype(np.intp) + 1 if n \
+        else np.zeros(q, dtype=np.intp)
+    deslocamentos = np.cumsum(num_de_categorias) - num_de_categorias
+    indicadores = sp.csr_matrix(
+        (np.full(n * q, np.sqrt(gama / 2.0), dtype=dtype),
+         (np.repeat(np.arange(n), q), (codigos + deslocamentos).ravel())),
+        shape=(n, int(np.sum(num_de_categorias))))
+    return sp.hstack([sp.csr_matrix(numericas), indicadores], format="csr")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de colapso de linhas repetidas.
+
+Substitui as linhas idênticas da matriz de dados por uma única linha com
+peso igual ao número de repetições (ou à soma dos pesos das repetições). O
+k-means ponderado sobre as linhas únicas tem os mesmos medioides e o mesmo
+WS total que o k-means sobre a matriz original; as etiquetas e as distâncias
+são depois expandidas de volta para as linhas originais.
+
+Exemplo:
+
+.. code-block:: python
+
+    unicas, pesos, inversa = colapsar_linhas_repetidas(sementes)
+    resultado = k_means(..., unicas, ..., sample_weight=pesos)
+    resultado = expandir_resultado(resultado, inversa)
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _renumerar_por_primeira_ocorrencia(grupos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Renumera os grupos na ordem da sua primeira ocorrência.
+
+    :param grupos: Grupo de cada linha (n,). int.
+    :returns: Tupla ``(grupos, primeiras)`` com os grupos renumerados (n,) e
+        o índice da primeira linha de cada grupo.
+    """
+    _, primeiras, grupos = np.unique(grupos, return_index=True, return_inverse=True)
+    ordem = np.argsort(primeiras, kind="stable")
+    posicoes = np.empty_like(ordem)
+    posicoes[ordem] = np.arange(ordem.size)
+    return posicoes[grupos.ravel()], primeiras[ordem]
+
+
+def _agrupar_linhas_esparsas(sementes: sp.csr_matrix) -> np.ndarray:
+    """
+    Agrupa as linhas idênticas de uma matriz CSR.
+
+    As linhas são agrupadas por duas projeções aleatórias (impressões
+    digitais) e cada linha é comparada, exatamente, à primeira do seu grupo;
+    as raras colisões de impressão digital viram grupos próprios.
+
+    :param sementes: Matriz de dados (n x p), CSR em formato canônico.
+    :returns: Grupo de cada linha (n,). int.
+    """
+    num_de_variaveis = sementes.shape[1]
+    projecoes = np.random.default_rng(0).standard_normal((num_de_variaveis, 2))
+    impressoes = np.asarray(sementes @ projecoes, dtype=float)
+    _, primeiras, grupos = np.unique(impressoes, axis=0, return_index=True,
+                                     return_inverse=True)
+    grupos = grupos.ravel()
+
+    # Verificação exata: diferença nula em relação à primeira linha do grupo
+    diferencas = sementes - sementes[primeiras[grupos]]
+    colisoes = np.flatnonzero(np.asarray(abs(diferencas).sum(axis=1)).ravel() > 0)
+    grupos[colisoes] = primeiras.size + np.arange(colisoes.size)
+
+    return grupos
+
+
+def colapsar_linhas_repetidas(sementes,
+                              pesos: Optional[np.ndarray] = None) -> Tuple[object, np.ndarray, np.ndarray]:
+    """
+    Colapsa as linhas idênticas da matriz de dados em linhas únicas ponderadas.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param pesos: Pesos das linhas (n,), opcional; sem eles, cada linha pesa 1.
+    :returns: Tupla ``(unicas, pesos_das_unicas, inversa)``, em que ``unicas``
+        são as linhas únicas na ordem da primeira ocorrência, ``pesos_das_unicas``
+        a soma dos pesos das suas repetições e ``inversa`` (n,) o índice da
+        linha única de cada linha original.
+    """
+    if sp.issparse(sementes):
+        grupos = _agrupar_linhas_esparsas(sementes)
+    else:
+        _, grupos = np.unique(sementes, axis=0, return_inverse=True)
+    inversa, primeiras = _renumerar_por_primeira_ocorrencia(grupos)
+
+    pesos_das_unicas = np.bincount(inversa, weights=pesos,
+                                   minlength=primeiras.size).astype(float)
+
+    return sementes[primeiras], pesos_das_unicas, inversa
+
+
+def expandir_resultado(resultado: tuple, inversa: np.ndarray) -> tuple:
+    """
+    Expande o resultado de ``k_means`` sobre as linhas únicas para as originais.
+
+    :param resultado: (distancias_otimas, medioides_otimos, ks_min_otimos,
+        WS_total_otimo) sobre as linhas únicas.
+    :param inversa: Índice da linha única de cada linha original (n,).
+    :returns: O mesmo resultado com distâncias e etiquetas (n, 1) por linha
+        original; medioides e WS total (ponderado) não mudam.
+    """
+    distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo = resultado
+    return distancias_otimas[inversa], medioides_otimos, \
+        ks_min_otimos[inversa], WS_total_otimo
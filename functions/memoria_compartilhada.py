@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de memória compartilhada entre processos.
+
+Disponibiliza uma matriz NumPy a um conjunto de processos trabalhadores sem
+serializá-la em cada tarefa: o processo principal a copia uma única vez para
+um bloco de ``multiprocessing.shared_memory`` e cada trabalhador a anexa no
+seu inicializador.
+
+Uma matriz esparsa (CSR) é compartilhada pelos seus três vetores (valores,
+índices das colunas e ponteiros das linhas), sem ser densificada.
+
+Uma matriz que já está em disco (``np.memmap``) não precisa ser copiada:
+cada trabalhador a abre diretamente no seu inicializador.
+
+Arranjos auxiliares de tamanho proporcional a n (por exemplo, os pesos dos
+elementos ou os vetores de uma árvore k-d) também são compartilhados uma
+única vez, com ``compartilhar_arranjos``, e anexados no mesmo inicializador
+por ``anexar_matriz_e_arranjos``; nas tarefas, ``arranjo_do_processo``.
+
+Exemplo:
+
+.. code-block:: python
+
+    with compartilhar_matriz(sementes) as descritor:
+        with ProcessPoolExecutor(initializer=anexar_matriz,
+                                 initargs=descritor) as executor:
+            ...  # nas tarefas: sementes = matriz_do_processo()
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+from contextlib import ExitStack, contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Matriz anexada pelo processo trabalhador (e o bloco que a mantém viva)
+_MATRIZ_DO_PROCESSO: Dict[str, object] = {}
+
+# Arranjos auxiliares anexados pelo processo trabalhador, por nome (e os
+# blocos que os mantêm vivos)
+_ARRANJOS_DO_PROCESSO: Dict[str, Any] = {}
+_BLOCOS_DO_PROCESSO: list = []
+
+
+@contextmanager
+def compartilhar_matriz(matriz: np.ndarray) -> Iterator[Tuple[str, Tuple[int, ...], str]]:
+    """
+    Copia a matriz para a memória compartilhada enquanto o contexto durar.
+
+    :param matriz: Matriz a compartilhar.
+    :returns: Descritor ``(nome, forma, tipo)``, a ser passado a ``anexar_matriz``.
+    """
+    matriz = np.ascontiguousarray(matriz)
+    memoria = shared_memory.SharedMemory(create=True, size=max(matriz.nbytes, 1))
+    try:
+        np.ndarray(matriz.shape, dtype=matriz.dtype, buffer=memoria.buf)[...] = matriz
+        yield memoria.name, matriz.shape, matriz.dtype.str
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+
+def anexar_matriz(nome: str, forma: Tuple[int, ...], tipo: str) -> None:
+    """
+    Anexa, no processo trabalhador, a matriz compartilhada.
+
+    Próprio para o ``initializer`` de ``ProcessPoolExecutor``.
+
+    :param nome: Nome do bloco de memória compartilhada.
+    :param forma: Forma da matriz.
+    :param tipo: Tipo de dado da matriz.
+    """
+    memoria = shared_memory.SharedMemory(name=nome)
+    _MATRIZ_DO_PROCESSO["memoria"] = memoria
+    _MATRIZ_DO_PROCESSO["matriz"] = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+
+
+@contextmanager
+def compartilhar_matriz_esparsa(matriz: sp.csr_matrix) -> Iterator[tuple]:
+    """
+    Copia uma matriz CSR para a memória compartilhada enquanto o contexto durar.
+
+    :param matriz: Matriz esparsa a compartilhar (CSR).
+    :returns: Descritor ``(forma, valores, indices, ponteiros)``, em que os
+        três últimos são descritores de ``compartilhar_matriz``, a ser
+        passado a ``anexar_matriz_esparsa``.
+    """
+    with ExitStack() as pilha:
+        descritores = [pilha.enter_context(compartilhar_matriz(vetor))
+                       for vetor in (matriz.data, matriz.indices, matriz.indptr)]
+        yield (matriz.shape, *descritores)
+
+
+def anexar_matriz_esparsa(forma: Tuple[int, int], valores: tuple,
+                          indices: tuple, ponteiros: tuple) -> None:
+    """
+    Anexa, no processo trabalhador, a matriz CSR compartilhada.
+
+    Próprio para o ``initializer`` de ``ProcessPoolExecutor``.
+
+    :param forma: Forma da matriz.
+    :param valores: Descritor do vetor de valores não nulos.
+    :param indices: Descritor do vetor de índices das colunas.
+    :param ponteiros: Descritor do vetor de ponteiros das linhas.
+    """
+    vetores = []
+    for posicao, (nome, forma_do_vetor, tipo) in enumerate((valores, indices,
+                                                            ponteiros)):
+        memoria = shared_memory.SharedMemory(name=nome)
+        _MATRIZ_DO_PROCESSO["memoria_" + str(posicao)] = memoria
+        vetores.append(np.ndarray(forma_do_vetor, dtype=tipo, buffer=memoria.buf))
+    matriz = sp.csr_matrix(tuple(vetores), shape=forma, copy=False)
+    # Os vetores vieram de uma matriz já em formato canônico
+    matriz.has_sorted_indices = True
+    matriz.has_canonical_format = True
+    _MATRIZ_DO_PROCESSO["matriz"] = matriz
+
+
+def descrever_memmap(matriz: np.memmap) -> Tuple[str, Tuple[int, ...], str, int]:
+    """
+    Descreve uma matriz em disco para que outros processos a abram.
+
+    :param matriz: Matriz C-contígua em disco (``np.memmap`` ou fatia dela).
+    :returns: Descritor ``(arquivo, forma, tipo, deslocamento)``, a ser
+        passado a ``anexar_memmap``.
+    """
+    if not matriz.flags.c_contiguous:
+        raise ValueError("A matriz em disco deve ser C-contígua.")
+
+    # O memmap raiz é o que mapeia o arquivo; o deslocamento da matriz no
+    # arquivo é o da raiz mais a distância entre os seus dados e os da raiz
+    raiz = matriz
+    while isinstance(raiz.base, np.memmap):
+        raiz = raiz.base
+    if not isinstance(raiz.base, mmap.mmap) or raiz.filename is None:
+        raise ValueError("A matriz não está associada a um arquivo em disco.")
+    deslocamento = raiz.offset + \
+        matriz.__array_interface__["data"][0] - raiz.__array_interface__["data"][0]
+
+    return raiz.filename, matriz.shape, matriz.dtype.str, int(deslocamento)
+
+
+def anexar_memmap(arquivo: str, forma: Tuple[int, ...], tipo: str,
+                  deslocamento: int) -> None:
+    """
+    Abre, no processo trabalhador, a matriz em disco (somente leitura).
+
+    Próprio para o ``initializer`` de ``ProcessPoolExecutor``.
+
+    :param arquivo: Caminho do arquivo.
+    :param forma: Forma da matriz.
+    :param tipo: Tipo de dado da matriz.
+    :param deslocamento: Posição, em bytes, do início da matriz no arquivo.
+    """
+    _MATRIZ_DO_PROCESSO["matriz"] = np.memmap(arquivo, dtype=tipo, mode="r",
+                                              offset=deslocamento, shape=forma)
+
+
+@contextmanager
+def compartilhar_arranjos(arranjos: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Copia arranjos auxiliares para a memória compartilhada enquanto o
+    contexto durar.
+
+    :param arranjos: Arranjos por nome; cada valor é um arranjo NumPy, None
+        ou um dicionário de arranjos (ou None), como uma árvore k-d.
+    :returns: Descritores com a mesma estrutura (None onde o valor é None),
+        a serem passados a ``anexar_matriz_e_arranjos``.
+    """
+    def compartilhar(valor, pilha):
+        if valor is None:
+            return None
+        return pilha.enter_context(compartilhar_matriz(np.asarray(valor)))
+
+    with ExitStack() as pilha:
+        descritores: Dict[str, Any] = {}
+        for nome, valor in arranjos.items():
+            if isinstance(valor, dict):
+                descritores[nome] = {chave: compartilhar(arranjo, pilha)
+                                     for chave, arranjo in valor.items()}
+            else:
+                descritores[nome] = compartilhar(valor, pilha)
+        yield descritores
+
+
+def _anexar_arranjo(descritor: Optional[Tuple[str, Tuple[int, ...], str]]):
+    """
+    Anexa um arranjo de ``compartilhar_matriz`` (None para None).
+
+    :param descritor: Descritor ``(nome, forma, tipo)`` ou None.
+    :returns: Arranjo anexado ou None.
+    """
+    if descritor is None:
+        return None
+    nome, forma, tipo = descritor
+    memoria = shared_memory.SharedMemory(name=nome)
+    _BLOCOS_DO_PROCESSO.append(memoria)
+    return np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+
+
+def anexar_matriz_e_arranjos(anexar: Callable[..., None], descritor: tuple,
+                             descritores_dos_arranjos: Dict[str, Any]) -> None:
+    """
+    Anexa, no processo trabalhador, a matriz e os arranjos auxiliares.
+
+    Próprio para o ``initializer`` de ``ProcessPoolExecutor``.
+
+    :param anexar: ``anexar_matriz``, ``anexar_matriz_esparsa`` ou
+        ``anexar_memmap``, conforme a matriz.
+    :param descritor: Descritor da matriz.
+    :param descritores_dos_arranjos: Descritores de ``compartilhar_arranjos``.
+    """
+    anexar(*descritor)
+    for nome, valor in descritores_dos_arranjos.items():
+        if isinstance(valor, dict):
+            _ARRANJOS_DO_PROCESSO[nome] = {chave: _anexar_arranjo(descritor_do_arranjo)
+                                           for chave, descritor_do_arranjo in valor.items()}
+        else:
+            _ARRANJOS_DO_PROCESSO[nome] = _anexar_arranjo(valor)
+
+
+def num_de_processos(n_jobs: int | None, num_de_tarefas: int) -> int:
+    """
+    Resolve o número de processos trabalhadores a utilizar.
+
+    :param n_jobs: Número pedido (``-1`` para todos os núcleos; None ou 0 para 1).
+    :param num_de_tarefas: Número de tarefas a distribuir.
+    :returns: Número de processos, entre 1 e ``num_de_tarefas``.
+    """
+    if n_jobs is None or n_jobs == 0:
+        n_jobs = 1
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    return max(1, min(n_jobs, num_de_tarefas))
+
+
+def matriz_do_processo() -> np.ndarray:
+    """
+    Retorna a matriz anexada por ``anexar_matriz``, ``anexar_matriz_esparsa``
+    ou ``anexar_memmap``.
+
+    :returns: Matriz compartilhada (somente leitura por convenção).
+    """
+    return _MATRIZ_DO_PROCESSO["matriz"]  # type: ignore[return-value]
+
+
+def arranjo_do_processo(nome: str) -> Any:
+    """
+    Retorna um arranjo auxiliar anexado por ``anexar_matriz_e_arranjos``.
+
+    :param nome: Nome do arranjo em ``compartilhar_arranjos``.
+    :returns: Arranjo (ou dicionário de arranjos); None se não foi
+        compartilhado ou era None.
+    """
+    return _ARRANJOS_DO_PROCESSO.get(nome)
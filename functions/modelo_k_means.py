@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo do modelo de k-means ajustado.
+
+``KMeansModel`` guarda somente o necessário para classificar novos
+elementos contra uma clusterização congelada: os medioides, as suas normas
+quadradas (calculadas uma única vez), a configuração do ajuste e o esquema
+dos dados (nomes das variáveis). ``predict`` e ``transform`` são vetorizados
+(um produto matricial por bloco de linhas) e não refazem o ajuste.
+
+Com as massas (somas dos pesos) e as etiquetas do ajuste, ``partial_fit``
+acrescenta novas linhas sem refazer a varredura: somente elas são
+atribuídas, as somas e as massas dos clusters são atualizadas e algumas
+iterações de Lloyd locais, restritas aos clusters afetados, acomodam as
+linhas anteriores.
+
+O modelo é salvo e carregado como ``.npz`` ou ``.json``, sem ``pickle``.
+
+Exemplo:
+
+.. code-block:: python
+
+    resultado = k_means(..., sementes, ...)
+    modelo = KMeansModel.a_partir_do_resultado(resultado, variaveis=colunas)
+    modelo.salvar("modelo.npz")
+    etiquetas = KMeansModel.carregar("modelo.npz").predict(novas_linhas)
+    modelo.partial_fit(novas_linhas, sementes_anteriores=sementes)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions.blocos_de_memoria as bm
+import functions.k_means as km
+
+
+class KMeansModel:
+    """
+    Modelo de k-means ajustado: medioides, configuração e esquema dos dados.
+
+    :param medioides: Medioides ajustados (K x p). float.
+    :param configuracao: Configuração do ajuste (por exemplo ``K``,
+        ``num_max_I``, ``algorithm`` e ``WS_total``), com valores
+        serializáveis em JSON. dict.
+    :param variaveis: Nomes das p variáveis, na ordem das colunas dos
+        medioides (opcional). Com eles, ``predict`` e ``transform`` aceitam
+        tabelas (``pandas.DataFrame``) com as colunas em qualquer ordem.
+    :param dtype: Tipo de dado do cálculo das distâncias: ``np.float64`` ou
+        ``np.float32``.
+    :param massas: Soma dos pesos (ou número de elementos) de cada cluster
+        (K,), necessária a ``partial_fit`` (opcional). float.
+    :param somas: Soma (ponderada) dos elementos de cada cluster (K x p);
+        sem ela, ``medioides * massas``. float.
+    :param etiquetas: Etiqueta de cada linha já ajustada (n,), necessária às
+        iterações locais de ``partial_fit`` (opcional). int.
+    """
+
+    __slots__ = ("medioides", "normas_medioides", "configuracao", "variaveis",
+                 "dtype", "somas", "massas", "etiquetas")
+
+    def __init__(self, medioides, configuracao: Optional[Dict[str, Any]] = None,
+                 variaveis: Optional[Sequence[str]] = None, dtype=np.float64,
+                 massas=None, somas=None, etiquetas=None):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("Tipo de dado não suportado: '" + str(self.dtype) +
+                             "'. Use np.float32 ou np.float64.")
+        self.medioides = np.ascontiguousarray(medioides, dtype=self.dtype)
+        if self.medioides.ndim != 2:
+            raise ValueError("Os medioides devem ser uma matriz (K x p).")
+        # Normas quadradas dos medioides, reaproveitadas em todas as chamadas
+        self.normas_medioides = np.einsum("ij,ij->i", self.medioides,
+                                          self.medioides)
+        self.configuracao = dict(configuracao or {})
+        self.variaveis = None if variaveis is None else tuple(str(nome) for nome
+                                                              in variaveis)
+        if self.variaveis is not None and len(self.variaveis) != self.medioides.shape[1]:
+            raise ValueError("O esquema tem " + str(len(self.variaveis)) +
+                             " variáveis, mas os medioides têm " +
+                             str(self.medioides.shape[1]) + ".")
+        # Somas e massas acumuladas, sempre em float64
+        self.massas = None if massas is None else np.array(massas, dtype=float)
+        if somas is None and massas is not None:
+            somas = np.asarray(medioides, dtype=float) * self.massas[:, np.newaxis]
+        self.somas = None if somas is None else np.array(somas, dtype=float)
+        self.etiquetas = None if etiquetas is None \
+            else np.array(etiquetas, dtype=np.intp).ravel()
+
+    @classmethod
+    def a_partir_do_resultado(cls, resultado: tuple,
+                              configuracao: Optional[Dict[str, Any]] = None,
+                              variaveis: Optional[Sequence[str]] = None,
+                              dtype=np.float64,
+                              sample_weight=None) -> "KMeansModel":
+        """
+        Cria o modelo a partir da tupla retornada por ``k_means``.
+
+        As massas de cada cluster vêm das etiquetas do resultado; como os
+        medioides convergidos são as médias dos seus elementos, as somas são
+        ``medioides * massas``.
+
+        :param resultado: (distancias_otimas, medioides_otimos, ks_min_otimos,
+            WS_total_otimo).
+        :param configuracao: Configuração do ajuste (opcional); ``K`` e
+            ``WS_total`` são acrescentados a partir do resultado.
+        :param variaveis: Nomes das variáveis (opcional).
+        :param dtype: Tipo de dado do cálculo das distâncias.
+        :param sample_weight: Pesos usados no ajuste (n,), opcional. float.
+        :returns: Modelo ajustado.
+        """
+        _, medioides, ks_min, WS_total = resultado
+        configuracao = dict(configuracao or {})
+        configuracao.setdefault("K", int(np.shape(medioides)[0]))
+        configuracao.setdefault("WS_total", float(WS_total))
+        etiquetas = np.asarray(ks_min, dtype=np.intp).ravel()
+        massas = np.bincount(etiquetas, weights=sample_weight,
+                             minlength=np.shape(medioides)[0]).astype(float)
+        return cls(medioides, configuracao, variaveis, dtype, massas=massas,
+                   etiquetas=etiquetas)
+
+    def _converter(self, X):
+        """
+        Confere o esquema e converte as novas linhas para o tipo do cálculo.
+
+        :param X: Novas linhas (m x p): matriz densa, esparsa ou tabela com
+            as colunas do esquema.
+        :returns: Matriz densa C-contígua ou CSR (m x p).
+        """
+        if hasattr(X, "columns"):
+            if self.variaveis is not None:
+                colunas = set(map(str, X.columns))
+                faltantes = [nome for nome in self.variaveis if nome not in colunas]
+                if faltantes:
+                    raise ValueError("Variáveis ausentes: " +
+                                     ", ".join(faltantes) + ".")
+                X = X[list(self.variaveis)]
+            X = X.to_numpy()
+        if not sp.issparse(X):
+            X = np.asarray(X)
+            if X.ndim == 1:
+                X = X[np.newaxis, :]
+        if X.shape[1] != self.medioides.shape[1]:
+            raise ValueError("As novas linhas devem ter " +
+                             str(self.medioides.shape[1]) + " variáveis.")
+        return km.converter_sementes(X, self.dtype)
+
+    def _percorrer(self, X, memoria_maxima=None):
+        """
+        Percorre as novas linhas em blocos com as distâncias quadradas.
+
+        :param X: Novas linhas convertidas (m x p).
+        :param memoria_maxima: Orçamento de memória por bloco em bytes
+            (opcional). int.
+        :returns: Iterador de ``(bloco, distancias_quadradas)``.
+        """
+        K, num_de_variaveis = self.medioides.shape
+        linhas_por_bloco = bm.num_de_linhas_por_bloco(
+            (K + num_de_variaveis) * self.dtype.itemsize, memoria_maxima)
+        for bloco in bm.blocos(X.shape[0], linhas_por_bloco):
+            linhas = X[bloco]
+            if sp.issparse(linhas):
+                normas = np.asarray(linhas.multiply(linhas).sum(axis=1)).ravel()
+            else:
+                normas = np.einsum("ij,ij->i", linhas, linhas)
+            distancias = np.asarray(linhas @ self.medioides.T)
+            distancias *= -2.0
+            distancias += normas[:, np.newaxis]
+            distancias += self.normas_medioides[np.newaxis, :]
+            # Erros de arredondamento podem gerar valores levemente negativos
+            np.maximum(distancias, 0.0, out=distancias)
+            yield bloco, distancias
+
+    def predict(self, X, memoria_maxima=None) -> np.ndarray:
+        """
+        Atribui cada nova linha ao medioide mais próximo.
+
+        :param X: Novas linhas (m x p): matriz densa, esparsa (CSR) ou tabela
+            com as colunas do esquema.
+        :param memoria_maxima: Orçamento de memória por bloco em bytes
+            (opcional). int.
+        :returns: Etiquetas (m,). int.
+        """
+        X = self._converter(X)
+        ks_min = np.empty(X.shape[0], dtype=np.intp)
+        for bloco, distancias in self._percorrer(X, memoria_maxima):
+            ks_min[bloco] = np.argmin(distancias, axis=1)
+        return ks_min
+
+    def transform(self, X, memoria_maxima=None) -> np.ndarray:
+        """
+        Calcula a distância euclidiana de cada nova linha a todos os medioides.
+
+        :param X: Novas linhas (m x p): matriz densa, esparsa (CSR) ou tabela
+            com as colunas do esquema.
+        :param memoria_maxima: Orçamento de memória por bloco em bytes
+            (opcional). int.
+        :returns: Distâncias (m x K), no tipo do cálculo. float.
+        """
+        X = self._converter(X)
+        distancias = np.empty((X.shape[0], self.medioides.shape[0]),
+                              dtype=self.dtype)
+        for bloco, quadradas in self._percorrer(X, memoria_maxima):
+            np.sqrt(quadradas, out=distancias[bloco])
+        return distancias
+
+    def _distancias_quadradas(self, X, clusters) -> np.ndarray:
+        """
+        Calcula as distâncias quadradas das linhas a alguns medioides.
+
+        :param X: Linhas convertidas (m x p), densas ou CSR.
+        :param clusters: Índices dos medioides. int.
+        :returns: Distâncias quadradas (m x len(clusters)). float.
+        """
+        if sp.issparse(X):
+            normas = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+        else:
+            normas = np.einsum("ij,ij->i", X, X)
+        distancias = np.asarray(X @ self.medioides[clusters].T, dtype=float)
+        distancias *= -2.0
+        distancias += normas[:, np.newaxis]
+        distancias += self.normas_medioides[clusters][np.newaxis, :]
+        return np.maximum(distancias, 0.0)
+
+    def _distancias_quadradas_aos_proprios(self, X, ks) -> np.ndarray:
+        """
+        Calcula a distância quadrada de cada linha ao medioide do seu cluster.
+
+        :param X: Linhas convertidas (m x p), densas ou CSR.
+        :param ks: Cluster de cada linha (m,). int.
+        :returns: Distâncias quadradas (m,). float.
+        """
+        if sp.issparse(X):
+            produtos = np.asarray(X.multiply(self.medioides[ks]).sum(axis=1)).ravel()
+            distancias = np.asarray(X.multiply(X).sum(axis=1)).ravel() - \
+                2.0 * produtos + self.normas_medioides[ks]
+            return np.maximum(distancias, 0.0)
+        diferencas = X - self.medioides[ks]
+        return np.einsum("ij,ij->i", diferencas, diferencas, dtype=float)
+
+    def _acumular(self, X, ks, pesos, sinal=1.0) -> None:
+        """
+        Soma (ou subtrai, com ``sinal=-1``) as linhas às somas e massas.
+
+        :param X: Linhas convertidas (m x p), densas ou CSR.
+        :param ks: Cluster de cada linha (m,). int.
+        :param pesos: Peso de cada linha (m,). float.
+        :param sinal: 1 para acrescentar, -1 para retirar. float.
+        """
+        K = self.medioides.shape[0]
+        ponderados = sp.diags(sinal * pesos) @ X if sp.issparse(X) \
+            else X * (sinal * pesos)[:, np.newaxis]
+        if sp.issparse(ponderados):
+            ponderados = ponderados.toarray()
+        for j in range(self.somas.shape[1]):
+            self.somas[:, j] += np.bincount(ks, weights=ponderados[:, j], minlength=K)
+        self.massas += np.bincount(ks, weights=sinal * pesos, minlength=K)
+
+    def _atualizar_medioides(self, clusters) -> None:
+        """
+        Recalcula os medioides (e as suas normas) dos clusters dados a partir
+        das somas e massas; um cluster sem massa mantém o seu medioide.
+
+        :param clusters: Índices dos clusters. int.
+        """
+        clusters = clusters[self.massas[clusters] > 0.0]
+        self.medioides[clusters] = self.somas[clusters] / \
+            self.massas[clusters][:, np.newaxis]
+        self.normas_medioides[clusters] = np.einsum(
+            "ij,ij->i", self.medioides[clusters], self.medioides[clusters])
+
+    def partial_fit(self, X, sample_weight=None, sementes_anteriores=None,
+                    pesos_anteriores=None, num_max_iteracoes=3) -> "KMeansModel":
+        r"""
+        Acrescenta novas linhas ao modelo, sem refazer o ajuste.
+
+        As novas linhas são atribuídas aos medioides atuais e somadas às
+        somas e massas dos seus clusters, cujos medioides são recalculados.
+        Com ``sementes_anteriores`` (as linhas já ajustadas, na ordem de
+        ``etiquetas``), seguem até ``num_max_iteracoes`` iterações de Lloyd
+        locais: os elementos dos clusters afetados podem ir para qualquer
+        cluster, os demais são comparados somente aos medioides afetados (os
+        seus próprios não mudaram), e os clusters afetados da iteração
+        seguinte são os que ganharam ou perderam elementos. O custo de cada
+        iteração é :math:`O(n \, |A| \, p)`, com :math:`|A|` clusters
+        afetados, em vez de :math:`O(n K p)`.
+
+        :param X: Novas linhas (m x p): matriz densa, esparsa (CSR) ou tabela
+            com as colunas do esquema.
+        :param sample_weight: Pesos positivos das novas linhas (m,), opcional.
+        :param sementes_anteriores: Linhas já ajustadas (n x p), opcional.
+        :param pesos_anteriores: Pesos das linhas já ajustadas (n,), opcional.
+        :param num_max_iteracoes: Número máximo de iterações locais. int.
+        :returns: O próprio modelo, com ``etiquetas`` estendidas às novas
+            linhas (e ``configuracao["WS_total"]`` recalculado, com
+            ``sementes_anteriores``).
+        """
+        if self.massas is None:
+            raise ValueError("O modelo não tem as massas dos clusters; crie-o "
+                             "com a_partir_do_resultado ou informe massas.")
+        X = self._converter(X)
+        pesos = np.ones(X.shape[0]) if sample_weight is None \
+            else np.asarray(sample_weight, dtype=float).ravel()
+        if pesos.shape != (X.shape[0],) or np.any(pesos <= 0.0):
+            raise ValueError("Os pesos devem ser positivos e ter forma (" +
+                             str(X.shape[0]) + ",).")
+
+        # Somente as novas linhas são atribuídas
+        K = self.medioides.shape[0]
+        ks_novos = np.argmin(self._distancias_quadradas(X, np.arange(K)), axis=1)
+        self._acumular(X, ks_novos, pesos)
+        afetados = np.unique(ks_novos)
+        if self.etiquetas is not None:
+            self.etiquetas = np.concatenate((self.etiquetas, ks_novos))
+        self._atualizar_medioides(afetados)
+
+        if sementes_anteriores is None or num_max_iteracoes < 1:
+            return self
+        if self.etiquetas is None:
+            raise ValueError("As iterações locais exigem as etiquetas do ajuste.")
+        anteriores = self._converter(sementes_anteriores)
+        if anteriores.shape[0] + X.shape[0] != self.etiquetas.size:
+            raise ValueError("As linhas anteriores devem ser as " +
+                             str(self.etiquetas.size - X.shape[0]) +
+                             " linhas já ajustadas.")
+        if sp.issparse(anteriores) or sp.issparse(X):
+            todas = sp.vstack([sp.csr_matrix(anteriores), sp.csr_matrix(X)],
+                              format="csr")
+        else:
+            todas = np.concatenate((anteriores, X))
+        pesos_todos = np.concatenate(
+            (np.ones(anteriores.shape[0]) if pesos_anteriores is None
+             else np.asarray(pesos_anteriores, dtype=float).ravel(), pesos))
+        ks = self.etiquetas
+
+        for _ in range(num_max_iteracoes):
+            novos_ks = ks.copy()
+            # Elementos dos clusters afetados: todos os medioides
+            do_afetado = np.isin(ks, afetados)
+            linhas = np.flatnonzero(do_afetado)
+            if linhas.size > 0:
+                novos_ks[linhas] = np.argmin(
+                    self._distancias_quadradas(todas[linhas], np.arange(K)), axis=1)
+            # Demais elementos: somente os medioides afetados podem atraí-los
+            linhas = np.flatnonzero(~do_afetado)
+            if linhas.size > 0:
+                distancias = self._distancias_quadradas(todas[linhas], afetados)
+                melhores = np.argmin(distancias, axis=1)
+                mover = distancias[np.arange(linhas.size), melhores] < \
+                    self._distancias_quadradas_aos_proprios(todas[linhas], ks[linhas])
+                novos_ks[linhas[mover]] = afetados[melhores[mover]]
+
+            movidos = np.flatnonzero(novos_ks != ks)
+            if movidos.size == 0:
+                break
+            self._acumular(todas[movidos], ks[movidos], pesos_todos[movidos], -1.0)
+            self._acumular(todas[movidos], novos_ks[movidos], pesos_todos[movidos])
+            afetados = np.unique(np.concatenate((ks[movidos], novos_ks[movidos])))
+            ks[movidos] = novos_ks[movidos]
+            self._atualizar_medioides(afetados)
+
+        self.configuracao["WS_total"] = float(np.dot(
+            pesos_todos, np.sqrt(self._distancias_quadradas_aos_proprios(todas, ks))))
+        return self
+
+    def salvar(self, caminho) -> None:
+        """
+        Salva o modelo em ``.npz`` (binário, exato) ou ``.json`` (texto).
+
+        :param caminho: Caminho do arquivo, com extensão ``.npz`` ou ``.json``.
+        """
+        extensao = os.path.splitext(str(caminho))[1].lower()
+        if extensao == ".npz":
+            np.savez(caminho,
+                     medioides=self.medioides,
+                     configuracao=np.array(json.dumps(self.configuracao)),
+                     variaveis=np.array([] if self.variaveis is None
+                                        else self.variaveis, dtype=str),
+                     tem_variaveis=np.array(self.variaveis is not None),
+                     **{nome: valor for nome, valor in
+                        (("massas", self.massas), ("somas", self.somas),
+                         ("etiquetas", self.etiquetas)) if valor is not None})
+        elif extensao == ".json":
+            # O repr dos floats do Python recupera os medioides exatamente
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                json.dump({"medioides": self.medioides.astype(float).tolist(),
+                           "dtype": self.dtype.name,
+                           "configuracao": self.configuracao,
+                           "variaveis": None if self.variaveis is None
+                           else list(self.variaveis),
+                           "massas": None if self.massas is None
+                           else self.massas.tolist(),
+                           "somas": None if self.somas is None
+                           else self.somas.tolist(),
+                           "etiquetas": None if self.etiquetas is None
+                           else self.etiquetas.tolist()},
+                          arquivo, ensure_ascii=False)
+        else:
+            raise ValueError("Extensão não suportada: '" + extensao +
+                             "'. Use .npz ou .json.")
+
+    @classmethod
+    def carregar(cls, caminho) -> "KMeansModel":
+        """
+        Carrega um modelo salvo por ``salvar``.
+
+        :param caminho: Caminho do arquivo ``.npz`` ou ``.json``.
+        :returns: Modelo ajustado.
+        """
+        extensao = os.path.splitext(str(caminho))[1].lower()
+        if extensao == ".npz":
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                medioides = arquivo["medioides"]
+                variaveis = arquivo["variaveis"].tolist() \
+                    if bool(arquivo["tem_variaveis"]) else None
+                opcionais = {nome: arquivo[nome] for nome in
+                             ("massas", "somas", "etiquetas") if nome in arquivo}
+                return cls(medioides, json.loads(str(arquivo["configuracao"])),
+                           variaveis, medioides.dtype, **opcionais)
+        if extensao == ".json":
+            with open(caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+            return cls(np.array(dados["medioides"], dtype=float),
+                       dados["configuracao"], dados["variaveis"], dados["dtype"],
+                       massas=dados.get("massas"), somas=dados.get("somas"),
+                       etiquetas=dados.get("etiquetas"))
+        raise ValueError("Extensão não suportada: '" + extensao +
+                         "'. Use .npz ou .json.")
@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 
 # n = 6
 # K = 4
@@ -8,37 +9,145 @@ import numpy as np
 # n = 6
 # num_de_variaveis = 2
 
-def sortear_sementes(n, K, sementes):
+def obter_gerador(gerador):
     """
 
+    :param gerador: Gerador de números aleatórios (``np.random.Generator`` ou
+        ``np.random.RandomState``) ou None para o estado global do NumPy
+    :return: Objeto com os métodos ``permutation``, ``choice`` e ``uniform``
+    """
+    if gerador is None:
+        # O estado global respeita np.random.seed(...)
+        return np.random
+    return gerador
+
+
+def sortear_sementes(n, K, sementes, gerador=None, pesos=None):
+    """
+
+    Sorteio uniforme, sem repetição, de K elementos por meio de uma
+    permutação (custo O(n), independentemente de K se aproximar de n).
+    Com pesos, cada elemento é sorteado com probabilidade proporcional ao
+    seu peso.
+
     :param n: Número máximo de elementos
     :param K: Número de k-clusters
+    :param sementes: Matriz de dados (n x p), densa ou esparsa
+    :param gerador: Gerador de números aleatórios (opcional)
+    :param pesos: Pesos dos elementos (n,), opcional
     :return: sementes_sorteadas = Array das sementes sorteadas
     """
 
-    comprimento_do_arranjo = False
-    comprimento_do_set = True
-    num_de_sorteios = 0
-    indices_das_sementes_sorteadas = np.zeros((K, 1), dtype=int)
-    while comprimento_do_arranjo != comprimento_do_set \
-            and num_de_sorteios <= n \
-            or comprimento_do_set != K:
-        indices_das_sementes_sorteadas = np.random.randint(0, n, K, dtype=int)
-        comprimento_do_arranjo = len(indices_das_sementes_sorteadas)
-        indices_das_sementes_sorteadas = set(indices_das_sementes_sorteadas)
-        comprimento_do_set = len(indices_das_sementes_sorteadas)
-        num_de_sorteios = num_de_sorteios + 1
-    indices_das_sementes_sorteadas = \
-        np.array(list(indices_das_sementes_sorteadas), dtype=int)
-
-
-    sementes_sorteadas = []
-    # # para todas os k-clusters fazer
-    for k in range(0, K, 1):
-        # formar k-medioides
-        sementes_sorteadas.append(sementes[indices_das_sementes_sorteadas[k]])
+    gerador = obter_gerador(gerador)
+    if pesos is None:
+        indices_das_sementes_sorteadas = gerador.permutation(n)[:K]
+    else:
+        indices_das_sementes_sorteadas = gerador.choice(
+            n, K, replace=False, p=pesos / np.sum(pesos))
+
+    # formar k-medioides
+    sementes_sorteadas = sementes[indices_das_sementes_sorteadas]
+    if sp.issparse(sementes_sorteadas):
+        sementes_sorteadas = sementes_sorteadas.toarray()
     sementes_sorteadas = np.array(sementes_sorteadas, dtype=float)
 
     return sementes_sorteadas
 
-# print(sortear_sementes(n, K, sementes))
\ No newline at end of file
+
+def sortear_sementes_k_means_pp(sementes, K, num_de_candidatos=None,
+                                gerador=None, normas_sementes=None, pesos=None):
+    r"""
+
+    Sorteio k-means++ guloso (amostragem D²).
+
+    A primeira semente é sorteada uniformemente. Cada semente seguinte é
+    escolhida entre ``num_de_candidatos`` candidatos sorteados com
+    probabilidade proporcional a :math:`D(x)^2`, a distância quadrada do
+    elemento à semente já escolhida mais próxima; fica o candidato que mais
+    reduz :math:`\sum_x D(x)^2`. As distâncias aos candidatos são calculadas
+    de uma só vez com um produto matricial; com sementes esparsas (CSR),
+    somente as linhas dos candidatos são densificadas. Com pesos, as
+    probabilidades e o potencial usam :math:`w(x) D(x)^2`.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa
+    :param K: Número de k-clusters
+    :param num_de_candidatos: Candidatos por passo (padrão: 2 + int(ln K))
+    :param gerador: Gerador de números aleatórios (opcional)
+    :param normas_sementes: Normas quadradas das sementes (n,), opcional
+    :param pesos: Pesos dos elementos (n,), opcional
+    :return: sementes_sorteadas = Array das sementes sorteadas
+    """
+
+    gerador = obter_gerador(gerador)
+    # Mantém float32 e float64 (sem cópia); demais tipos viram float64
+    if not sp.issparse(sementes):
+        sementes = np.asarray(sementes)
+    if sementes.dtype not in (np.float32, np.float64):
+        sementes = sementes.astype(float)
+    n = sementes.shape[0]
+
+    if num_de_candidatos is None:
+        num_de_candidatos = 2 + int(np.log(K))
+
+    if normas_sementes is None:
+        if sp.issparse(sementes):
+            normas_sementes = np.asarray(
+                sementes.multiply(sementes).sum(axis=1)).ravel()
+        else:
+            normas_sementes = np.einsum("ij,ij->i", sementes, sementes)
+
+    def linhas_densas(indices):
+        linhas = sementes[indices]
+        if sp.issparse(linhas):
+            linhas = linhas.toarray()
+        return linhas
+
+    def distancias_quadradas(indices):
+        # ||x||^2 - 2 x.c + ||c||^2 para todos os elementos e candidatos
+        distancias = sementes @ linhas_densas(indices).T
+        distancias *= -2.0
+        distancias += normas_sementes[:, np.newaxis]
+        distancias += normas_sementes[indices][np.newaxis, :]
+        np.maximum(distancias, 0.0, out=distancias)
+        return distancias
+
+    def ponderar(distancias):
+        if pesos is None:
+            return distancias
+        return distancias * (pesos if distancias.ndim == 1 else pesos[:, np.newaxis])
+
+    indices_das_sementes_sorteadas = np.empty(K, dtype=int)
+    if pesos is None:
+        indices_das_sementes_sorteadas[0] = gerador.choice(n)
+    else:
+        indices_das_sementes_sorteadas[0] = gerador.choice(n, p=pesos / np.sum(pesos))
+    # D(x)^2 = Distância quadrada à semente escolhida mais próxima
+    distancias_minimas = distancias_quadradas(indices_das_sementes_sorteadas[:1])[:, 0]
+
+    for k in range(1, K, 1):
+        distancias_ponderadas = ponderar(distancias_minimas)
+        potencial = distancias_ponderadas.sum(dtype=float)
+        if potencial > 0.0:
+            acumulado = np.cumsum(distancias_ponderadas, dtype=float)
+            candidatos = np.searchsorted(
+                acumulado, gerador.uniform(size=num_de_candidatos) * potencial,
+                side="right")
+            candidatos = np.minimum(candidatos, n - 1)
+        else:
+            # Todos os elementos coincidem com alguma semente: sorteio uniforme
+            candidatos = gerador.choice(n, num_de_candidatos)
+
+        # Potencial resultante de cada candidato e escolha do melhor
+        minimos_com_candidatos = np.minimum(distancias_minimas[:, np.newaxis],
+                                            distancias_quadradas(candidatos))
+        melhor = int(np.argmin(ponderar(minimos_com_candidatos).sum(axis=0,
+                                                                    dtype=float)))
+        indices_das_sementes_sorteadas[k] = candidatos[melhor]
+        distancias_minimas = minimos_com_candidatos[:, melhor]
+
+    sementes_sorteadas = np.array(linhas_densas(indices_das_sementes_sorteadas),
+                                  dtype=float)
+
+    return sementes_sorteadas
+
+# print(sortear_sementes(n, K, sementes))
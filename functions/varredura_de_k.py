@@ -0,0 +1,840 @@
+# -*- coding: utf-8 -*-
+r"""
+Módulo de varredura de k.
+
+Executa o k-means para todos os k entre ``num_de_k_inicial`` e ``K`` e reúne
+os resultados por k em uma única estrutura, consumida diretamente pelo
+Elbow Data Chart e pelos relatórios.
+
+Notas:
+  - Partida quente: a solução de k parte dos medioides convergidos de k - 1
+    mais um novo medioide, obtido pela divisão do cluster de maior SSE ou por
+    amostragem D².
+  - Varredura em paralelo: os valores de k são independentes e distribuídos
+    entre processos; os resultados são entregues à medida que ficam prontos.
+  - Varredura bissecante: uma única passagem de cima para baixo divide, a
+    cada passo, o cluster de maior SSE com um 2-means; as soluções de todos
+    os k são aninhadas e a árvore das divisões serve de ligação ao
+    dendrograma.
+  - Varredura de k-medoides: a matriz de distâncias condensada é calculada
+    uma única vez e compartilhada por todos os k; cada k parte dos medioides
+    de k - 1 mais um elemento sorteado por amostragem D². Para muitas
+    linhas, a varredura CLARA ajusta cada k sobre amostras, em paralelo.
+  - Varredura de k-prototypes: tabelas mistas (numéricas e categóricas),
+    com o mesmo peso das categóricas em todos os k.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions.arvore_kd as akd
+import functions.k_means as km
+import functions.k_medoides as kmd
+import functions.k_prototypes as kp
+import functions.linhas_repetidas as lr
+import functions.memoria_compartilhada as mc
+import functions.sortear_sementes as ss
+
+# Número padrão de tentativas independentes de cada 2-means da varredura
+# bissecante
+_NUM_DE_TENTATIVAS_POR_DIVISAO = 3
+
+
+def novo_resultado_da_varredura() -> Dict[str, List[Any]]:
+    """
+    Cria a estrutura vazia de resultados por k.
+
+    :returns: Dicionário de listas, alinhadas com ``ks``.
+    """
+    return {
+        "ks": [],
+        "distancias_otimas_lista": [],
+        "medioides_otimos_lista": [],
+        "ks_min_otimos_lista": [],
+        "WSs_total_otimo_lista": [],
+        "estatisticas_lista": [],
+    }
+
+
+def acrescentar_resultado(resultados: Dict[str, List[Any]], k: int,
+                           resultado: tuple, estatisticas: Dict[str, Any]) -> None:
+    """
+    Acrescenta o resultado de ``k_means`` para um k à estrutura da varredura.
+
+    :param resultados: Estrutura de resultados por k.
+    :param k: Número de k-clusters.
+    :param resultado: (distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo).
+    :param estatisticas: Estatísticas do ajuste.
+    """
+    distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo = resultado
+    resultados["ks"].append(int(k))
+    resultados["distancias_otimas_lista"].append(distancias_otimas)
+    resultados["medioides_otimos_lista"].append(medioides_otimos)
+    resultados["ks_min_otimos_lista"].append(ks_min_otimos)
+    resultados["WSs_total_otimo_lista"].append(WS_total_otimo)
+    resultados["estatisticas_lista"].append(estatisticas)
+
+
+def ordenar_resultado_por_k(resultados: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """
+    Ordena a estrutura de resultados por k crescente.
+
+    Necessário quando os resultados chegam fora de ordem (varredura em paralelo).
+
+    :param resultados: Estrutura de resultados por k.
+    :returns: Nova estrutura, com todas as listas ordenadas por k.
+    """
+    ordem = np.argsort(resultados["ks"], kind="stable")
+    return {chave: [lista[i] for i in ordem] for chave, lista in resultados.items()}
+
+
+def dividir_cluster_de_maior_sse(sementes: np.ndarray,
+                                 medioides: np.ndarray,
+                                 ks_min: np.ndarray,
+                                 distancias: np.ndarray,
+                                 pesos: Optional[np.ndarray] = None) -> np.ndarray:
+    r"""
+    Divide o cluster de maior SSE ao longo da sua direção principal.
+
+    O medioide :math:`c` do cluster de maior soma de distâncias quadradas é
+    substituído por :math:`c + s v` e o novo medioide é :math:`c - s v`, em que
+    :math:`v` é a direção principal do cluster e :math:`s` o desvio padrão
+    ao longo dela. Com sementes esparsas, somente as linhas do cluster
+    dividido são densificadas. Com pesos, o SSE, a direção principal e o
+    desvio padrão são ponderados.
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param medioides: Medioides convergidos de k - 1 (k - 1 x p).
+    :param ks_min: Etiquetas de k - 1 (n,) ou (n, 1).
+    :param distancias: Distância de cada elemento ao seu medioide (n,) ou (n, 1).
+    :param pesos: Pesos dos elementos (n,), opcional.
+    :returns: Medioides de partida para k (k x p).
+    """
+    ks_min = np.asarray(ks_min, dtype=int).ravel()
+    distancias = np.asarray(distancias, dtype=float).ravel()
+    quadrados = distancias ** 2 if pesos is None else pesos * distancias ** 2
+    sse = np.bincount(ks_min, weights=quadrados, minlength=medioides.shape[0])
+    pior = int(np.argmax(sse))
+
+    do_pior = ks_min == pior
+    elementos = sementes[do_pior]
+    if sp.issparse(elementos):
+        elementos = elementos.toarray()
+    centrados = elementos - medioides[pior]
+    if pesos is None:
+        massa = max(elementos.shape[0], 1)
+    else:
+        pesos_do_pior = np.asarray(pesos, dtype=float)[do_pior]
+        centrados = centrados * np.sqrt(pesos_do_pior)[:, np.newaxis]
+        massa = float(np.sum(pesos_do_pior))
+    # Direção principal via SVD do cluster centrado
+    _, valores_singulares, direcoes = np.linalg.svd(centrados, full_matrices=False)
+    passo = valores_singulares[0] / np.sqrt(massa) * direcoes[0]
+
+    medioides_de_partida = np.vstack([medioides, medioides[pior] - passo])
+    medioides_de_partida[pior] = medioides[pior] + passo
+
+    return medioides_de_partida
+
+
+def amostrar_novo_medioide_d2(sementes: np.ndarray,
+                              medioides: np.ndarray,
+                              distancias: np.ndarray,
+                              gerador=None,
+                              pesos: Optional[np.ndarray] = None) -> np.ndarray:
+    r"""
+    Acrescenta um medioide sorteado com probabilidade proporcional a :math:`D(x)^2`
+    (a :math:`w(x) D(x)^2`, com pesos).
+
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param medioides: Medioides convergidos de k - 1 (k - 1 x p).
+    :param distancias: Distância de cada elemento ao seu medioide (n,) ou (n, 1).
+    :param gerador: Gerador de números aleatórios (opcional).
+    :param pesos: Pesos dos elementos (n,), opcional.
+    :returns: Medioides de partida para k (k x p).
+    """
+    gerador = ss.obter_gerador(gerador)
+    potenciais = np.asarray(distancias, dtype=float).ravel() ** 2
+    if pesos is not None:
+        potenciais = potenciais * pesos
+    total = potenciais.sum()
+    if total > 0.0:
+        indice = int(np.searchsorted(np.cumsum(potenciais), gerador.uniform() * total,
+                                     side="right"))
+        indice = min(indice, sementes.shape[0] - 1)
+    else:
+        indice = int(gerador.choice(sementes.shape[0]))
+
+    novo = sementes[indice]
+    if sp.issparse(novo):
+        novo = novo.toarray()
+
+    return np.vstack([medioides, novo])
+
+
+def _compartilhar_arvore_kd(sementes, opcoes_do_k_means: Dict[str, Any]) -> None:
+    """
+    Constrói, uma única vez para toda a varredura, a árvore k-d do motor
+    ``"filtragem"`` e a acrescenta às opções de ``k_means``. Na varredura em
+    paralelo, a árvore é compartilhada entre os processos com a matriz, e não
+    serializada em cada tarefa.
+
+    :param sementes: Matriz de dados (n x p), já convertida e colapsada.
+    :param opcoes_do_k_means: Argumentos nomeados de ``k_means``, atualizados
+        no lugar.
+    """
+    if opcoes_do_k_means.get("algorithm") == "filtragem" and \
+            opcoes_do_k_means.get("arvore_kd") is None:
+        opcoes_do_k_means["arvore_kd"] = akd.construir_arvore_kd(
+            sementes, opcoes_do_k_means.get("sample_weight"))
+
+
+def iterar_varredura_com_partida_quente(
+        num_de_k_inicial: int,
+        K: int,
+        sementes: np.ndarray,
+        num_max_I: int,
+        novo_medioide: str = "dividir",
+        **opcoes_do_k_means: Any) -> Iterator[Tuple[int, tuple, Dict[str, Any]]]:
+    r"""
+    Varre k de ``num_de_k_inicial`` até ``K`` com partida quente.
+
+    O primeiro k é ajustado do zero por ``functions.k_means.k_means``. Cada k
+    seguinte parte dos medioides convergidos de k - 1 mais um novo medioide
+    (``novo_medioide="dividir"`` divide o cluster de maior SSE e ``"d2"``
+    sorteia um elemento por amostragem D²), de modo que converge em poucas
+    iterações.
+
+    Com ``colapsar_repetidas=True``, as linhas idênticas são colapsadas uma
+    única vez para toda a varredura (ver ``functions.linhas_repetidas``) e
+    os resultados de cada k são expandidos de volta para as linhas originais.
+
+    :param num_de_k_inicial: Número de k inicial.
+    :param K: Número total de k-clusters.
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param num_max_I: Número máximo de iterações de cada ajuste.
+    :param novo_medioide: ``"dividir"`` ou ``"d2"``.
+    :param opcoes_do_k_means: Demais argumentos nomeados de ``k_means``.
+    :returns: Iterador de ``(k, resultado, estatisticas)`` em ordem crescente
+        de k, em que ``resultado`` é a tupla retornada por ``k_means``.
+    """
+    if novo_medioide not in ("dividir", "d2"):
+        raise ValueError("Novo medioide desconhecido: '" + str(novo_medioide) +
+                         "'. Use \"dividir\" ou \"d2\".")
+
+    sementes = km.converter_sementes(sementes,
+                                     opcoes_do_k_means.get("dtype", np.float64))
+
+    if opcoes_do_k_means.pop("colapsar_repetidas", False):
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(
+            sementes, opcoes_do_k_means.get("sample_weight"))
+        opcoes_do_k_means["sample_weight"] = pesos
+        for k, resultado, estatisticas in iterar_varredura_com_partida_quente(
+                num_de_k_inicial, K, sementes, num_max_I, novo_medioide,
+                **opcoes_do_k_means):
+            yield k, lr.expandir_resultado(resultado, inversa), estatisticas
+        return
+    pesos = opcoes_do_k_means.get("sample_weight")
+    _compartilhar_arvore_kd(sementes, opcoes_do_k_means)
+
+    resultado = None
+    for k in range(num_de_k_inicial, K + 1, 1):
+        estatisticas: Dict[str, Any] = {}
+        if resultado is None:
+            resultado = km.k_means(num_de_k_inicial, k, sementes, num_max_I,
+                                   estatisticas=estatisticas, **opcoes_do_k_means)
+        else:
+            distancias_otimas, medioides_otimos, ks_min_otimos, _ = resultado
+            if novo_medioide == "dividir":
+                medioides_de_partida = dividir_cluster_de_maior_sse(
+                    sementes, medioides_otimos, ks_min_otimos, distancias_otimas,
+                    pesos)
+            else:
+                medioides_de_partida = amostrar_novo_medioide_d2(
+                    sementes, medioides_otimos, distancias_otimas, pesos=pesos)
+            resultado = km.k_means(num_de_k_inicial, k, sementes, num_max_I,
+                                   estatisticas=estatisticas,
+                                   medioides_iniciais=medioides_de_partida,
+                                   **opcoes_do_k_means)
+        yield k, resultado, estatisticas
+
+
+def varrer_k(num_de_k_inicial: int,
+             K: int,
+             sementes: np.ndarray,
+             num_max_I: int,
+             novo_medioide: str = "dividir",
+             **opcoes_do_k_means: Any) -> Dict[str, List[Any]]:
+    r"""
+    Varre k com partida quente e reúne os resultados por k.
+
+    Ver ``iterar_varredura_com_partida_quente`` para os parâmetros.
+
+    :returns: Dicionário com as listas ``ks``, ``distancias_otimas_lista``,
+        ``medioides_otimos_lista``, ``ks_min_otimos_lista``,
+        ``WSs_total_otimo_lista`` e ``estatisticas_lista``, alinhadas por k.
+    """
+    resultados = novo_resultado_da_varredura()
+    for k, resultado, estatisticas in iterar_varredura_com_partida_quente(
+            num_de_k_inicial, K, sementes, num_max_I, novo_medioide,
+            **opcoes_do_k_means):
+        acrescentar_resultado(resultados, k, resultado, estatisticas)
+
+    return resultados
+
+
+def _ajustar_k(num_de_k_inicial: int, k: int, sementes: np.ndarray,
+               num_max_I: int, semente_do_k: np.random.SeedSequence,
+               opcoes_do_k_means: Dict[str, Any]) -> Tuple[int, tuple, Dict[str, Any]]:
+    """
+    Ajusta o k-means para um único k com o seu próprio estado aleatório.
+
+    :returns: ``(k, resultado, estatisticas)``.
+    """
+    # Semente própria por k: o resultado não depende da ordem de execução,
+    # e o estado global do NumPy não é alterado
+    estatisticas: Dict[str, Any] = {}
+    resultado = km.k_means(num_de_k_inicial, k, sementes, num_max_I,
+                           estatisticas=estatisticas,
+                           semente_aleatoria=int(semente_do_k.generate_state(1)[0]),
+                           **opcoes_do_k_means)
+    return k, resultado, estatisticas
+
+
+def _ajustar_k_no_processo(num_de_k_inicial: int, k: int, num_max_I: int,
+                           semente_do_k: np.random.SeedSequence,
+                           opcoes_do_k_means: Dict[str, Any]) -> Tuple[int, tuple, Dict[str, Any]]:
+    """
+    Ajusta um k no processo trabalhador, sobre a matriz, os pesos e a árvore
+    k-d compartilhados.
+
+    :returns: ``(k, resultado, estatisticas)``.
+    """
+    opcoes_do_k_means = dict(opcoes_do_k_means,
+                             sample_weight=mc.arranjo_do_processo("pesos"),
+                             arvore_kd=mc.arranjo_do_processo("arvore_kd"))
+    return _ajustar_k(num_de_k_inicial, k, mc.matriz_do_processo(), num_max_I,
+                      semente_do_k, opcoes_do_k_means)
+
+
+def iterar_varredura_em_paralelo(
+        num_de_k_inicial: int,
+        K: int,
+        sementes: np.ndarray,
+        num_max_I: int,
+        n_jobs: int = -1,
+        semente_aleatoria: Optional[int] = None,
+        **opcoes_do_k_means: Any) -> Iterator[Tuple[int, tuple, Dict[str, Any]]]:
+    r"""
+    Varre k distribuindo os valores de k entre processos.
+
+    Cada k é ajustado do zero, de forma independente, por um processo do
+    conjunto; a matriz de dados é compartilhada uma única vez entre eles.
+    Os resultados são entregues à medida que ficam prontos, de modo que o
+    consumidor (relatórios, dendrogramas) trabalha enquanto os demais k
+    ainda estão sendo ajustados. Com ``colapsar_repetidas=True``, as linhas
+    idênticas são colapsadas uma única vez, antes da distribuição dos k.
+
+    :param num_de_k_inicial: Número de k inicial.
+    :param K: Número total de k-clusters.
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param num_max_I: Número máximo de iterações de cada ajuste.
+    :param n_jobs: Número de processos (``-1`` para todos os núcleos).
+    :param semente_aleatoria: Semente da varredura; sem ela, é sorteada do
+        estado global do NumPy.
+    :param opcoes_do_k_means: Demais argumentos nomeados de ``k_means``.
+    :returns: Iterador de ``(k, resultado, estatisticas)`` na ordem de
+        conclusão, em que ``resultado`` é a tupla retornada por ``k_means``.
+    """
+    sementes = km.converter_sementes(sementes,
+                                     opcoes_do_k_means.get("dtype", np.float64))
+
+    if opcoes_do_k_means.pop("colapsar_repetidas", False):
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(
+            sementes, opcoes_do_k_means.get("sample_weight"))
+        opcoes_do_k_means["sample_weight"] = pesos
+        for k, resultado, estatisticas in iterar_varredura_em_paralelo(
+                num_de_k_inicial, K, sementes, num_max_I, n_jobs,
+                semente_aleatoria, **opcoes_do_k_means):
+            yield k, lr.expandir_resultado(resultado, inversa), estatisticas
+        return
+
+    _compartilhar_arvore_kd(sementes, opcoes_do_k_means)
+
+    ks = list(range(num_de_k_inicial, K + 1, 1))
+
+    if semente_aleatoria is None:
+        semente_aleatoria = np.random.randint(0, 2 ** 31 - 1)
+    sementes_dos_ks = np.random.SeedSequence(semente_aleatoria).spawn(len(ks))
+
+    # Cada k já ocupa um processo: as reinicializações ficam em sequência
+    opcoes_do_k_means["n_jobs"] = 1
+
+    n_jobs = mc.num_de_processos(n_jobs, len(ks))
+    if n_jobs <= 1:
+        for k, semente_do_k in zip(ks, sementes_dos_ks):
+            yield _ajustar_k(num_de_k_inicial, k, sementes, num_max_I,
+                             semente_do_k, opcoes_do_k_means)
+        return
+
+    # Os pesos e a árvore k-d vão para a memória compartilhada com a matriz,
+    # em vez de serem serializados nas opções de cada tarefa
+    opcoes_das_tarefas = dict(opcoes_do_k_means)
+    arranjos = {"pesos": opcoes_das_tarefas.pop("sample_weight", None),
+                "arvore_kd": opcoes_das_tarefas.pop("arvore_kd", None)}
+
+    if sp.issparse(sementes):
+        compartilhar, anexar = mc.compartilhar_matriz_esparsa, mc.anexar_matriz_esparsa
+    else:
+        compartilhar, anexar = mc.compartilhar_matriz, mc.anexar_matriz
+    with compartilhar(sementes) as descritor, \
+            mc.compartilhar_arranjos(arranjos) as descritores_dos_arranjos:
+        with ProcessPoolExecutor(max_workers=n_jobs,
+                                 initializer=mc.anexar_matriz_e_arranjos,
+                                 initargs=(anexar, descritor,
+                                           descritores_dos_arranjos)) as executor:
+            futuros = [executor.submit(_ajustar_k_no_processo, num_de_k_inicial, k,
+                                       num_max_I, semente_do_k, opcoes_das_tarefas)
+                       for k, semente_do_k in zip(ks, sementes_dos_ks)]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+
+
+def varrer_k_em_paralelo(
+        num_de_k_inicial: int,
+        K: int,
+        sementes: np.ndarray,
+        num_max_I: int,
+        n_jobs: int = -1,
+        ao_concluir: Optional[Callable[[int, tuple, Dict[str, Any]], None]] = None,
+        semente_aleatoria: Optional[int] = None,
+        **opcoes_do_k_means: Any) -> Dict[str, List[Any]]:
+    r"""
+    Varre k em paralelo e reúne os resultados por k.
+
+    ``ao_concluir(k, resultado, estatisticas)`` é chamada assim que cada k
+    termina; a estrutura retornada só é montada após todos os k.
+    Ver ``iterar_varredura_em_paralelo`` para os demais parâmetros.
+
+    :returns: Dicionário com as listas ``ks``, ``distancias_otimas_lista``,
+        ``medioides_otimos_lista``, ``ks_min_otimos_lista``,
+        ``WSs_total_otimo_lista`` e ``estatisticas_lista``, ordenadas por k.
+    """
+    resultados = novo_resultado_da_varredura()
+    for k, resultado, estatisticas in iterar_varredura_em_paralelo(
+            num_de_k_inicial, K, sementes, num_max_I, n_jobs,
+            semente_aleatoria, **opcoes_do_k_means):
+        if ao_concluir is not None:
+            ao_concluir(k, resultado, estatisticas)
+        acrescentar_resultado(resultados, k, resultado, estatisticas)
+
+    return ordenar_resultado_por_k(resultados)
+
+
+def iterar_varredura_bissecante(
+        num_de_k_inicial: int,
+        K: int,
+        sementes: np.ndarray,
+        num_max_I: int,
+        **opcoes_do_k_means: Any) -> Iterator[Tuple[int, tuple, Dict[str, Any]]]:
+    r"""
+    Varre k com o k-means bissecante, em uma única passagem de cima para baixo.
+
+    Parte de um único cluster (a média, ponderada, de todos os elementos) e,
+    a cada passo, divide o cluster de maior SSE (soma, ponderada, das
+    distâncias quadradas) com um 2-means (``functions.k_means.k_means`` com
+    ``K = 2`` sobre as linhas do cluster). A solução de k + 1 é a de k com um
+    cluster dividido em dois, de modo que cada elemento é processado por
+    cerca de :math:`\log_2 K` ajustes de 2-means, em vez de um ajuste
+    completo por k.
+
+    O cluster dividido mantém a sua etiqueta e o novo cluster recebe a
+    etiqueta k; as estatísticas de cada k são as do 2-means que o produziu,
+    acrescidas de ``"divisoes"``: a lista, em ordem, de todas as divisões até
+    ele (``cluster_dividido``, ``novo_cluster``, ``sse``, ``WS_antes`` e
+    ``WS_depois``), consumida por ``ligacao_das_divisoes``.
+
+    Com ``colapsar_repetidas=True``, as linhas idênticas são colapsadas uma
+    única vez para toda a varredura e os resultados de cada k são expandidos
+    de volta para as linhas originais.
+
+    :param num_de_k_inicial: Número de k inicial (os k menores são
+        percorridos, mas não entregues).
+    :param K: Número total de k-clusters.
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param num_max_I: Número máximo de iterações de cada 2-means.
+    :param opcoes_do_k_means: Demais argumentos nomeados de ``k_means``,
+        repassados a cada 2-means (``n_init`` padrão: 3 tentativas por
+        divisão).
+    :returns: Iterador de ``(k, resultado, estatisticas)`` em ordem crescente
+        de k, em que ``resultado`` tem a forma da tupla retornada por
+        ``k_means``.
+    """
+    sementes = km.converter_sementes(sementes,
+                                     opcoes_do_k_means.get("dtype", np.float64))
+
+    if opcoes_do_k_means.pop("colapsar_repetidas", False):
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(
+            sementes, opcoes_do_k_means.get("sample_weight"))
+        opcoes_do_k_means["sample_weight"] = pesos
+        for k, resultado, estatisticas in iterar_varredura_bissecante(
+                num_de_k_inicial, K, sementes, num_max_I, **opcoes_do_k_means):
+            yield k, lr.expandir_resultado(resultado, inversa), estatisticas
+        return
+
+    # Cada divisão é um ajuste pequeno: algumas tentativas independentes
+    # bastam, em vez de esgotar o orçamento global de iterações
+    opcoes_do_k_means.setdefault("n_init", _NUM_DE_TENTATIVAS_POR_DIVISAO)
+    # Cada 2-means ajusta um subconjunto das linhas, com a sua própria árvore
+    opcoes_do_k_means.pop("arvore_kd", None)
+
+    pesos = opcoes_do_k_means.pop("sample_weight", None)
+    ponderado = pesos is not None
+    n = sementes.shape[0]
+    pesos = np.ones(n) if pesos is None else np.asarray(pesos, dtype=float).ravel()
+
+    # k = 1: um único cluster em torno da média (ponderada)
+    medioides = (np.asarray(sementes.T @ pesos, dtype=float).ravel() /
+                 float(np.sum(pesos)))[np.newaxis, :]
+    distancias = km.atribuir_etiquetas(
+        sementes, medioides, opcoes_do_k_means.get("dtype", np.float64))[0].ravel()
+    ks_min = np.zeros(n, dtype=int)
+    WS_total = float(np.dot(pesos, distancias)) if ponderado else float(np.sum(distancias))
+    divisoes: List[Dict[str, Any]] = []
+
+    if num_de_k_inicial <= 1:
+        yield 1, (distancias[:, np.newaxis].copy(), medioides.copy(),
+                  ks_min[:, np.newaxis].copy(), WS_total), {"divisoes": []}
+
+    for novo in range(1, K):
+        sse = np.bincount(ks_min, weights=pesos * distancias ** 2, minlength=novo)
+        pior = int(np.argmax(sse))
+        # Um cluster de SSE nulo tem todos os elementos iguais ao medioide
+        if sse[pior] <= 0.0:
+            raise ValueError("Não há linhas distintas suficientes para " +
+                             str(novo + 1) + " clusters.")
+
+        linhas = np.flatnonzero(ks_min == pior)
+        estatisticas: Dict[str, Any] = {}
+        distancias_do_par, medioides_do_par, ks_do_par, _ = km.k_means(
+            2, 2, sementes[linhas], num_max_I, estatisticas=estatisticas,
+            sample_weight=pesos[linhas] if ponderado else None,
+            **opcoes_do_k_means)
+
+        medioides = np.vstack([medioides, medioides_do_par[1]])
+        medioides[pior] = medioides_do_par[0]
+        ks_min[linhas[ks_do_par.ravel() == 1]] = novo
+        distancias[linhas] = distancias_do_par.ravel()
+
+        WS_antes = WS_total
+        WS_total = float(np.dot(pesos, distancias)) if ponderado else float(np.sum(distancias))
+        divisoes.append({"cluster_dividido": pior, "novo_cluster": novo,
+                         "sse": float(sse[pior]), "WS_antes": WS_antes,
+                         "WS_depois": WS_total})
+
+        if novo + 1 >= num_de_k_inicial:
+            estatisticas["divisoes"] = list(divisoes)
+            yield novo + 1, (distancias[:, np.newaxis].copy(), medioides.copy(),
+                             ks_min[:, np.newaxis].copy(), WS_total), estatisticas
+
+
+def varrer_k_bissecante(num_de_k_inicial: int,
+                        K: int,
+                        sementes: np.ndarray,
+                        num_max_I: int,
+                        **opcoes_do_k_means: Any) -> Dict[str, List[Any]]:
+    r"""
+    Varre k com o k-means bissecante e reúne os resultados por k.
+
+    Ver ``iterar_varredura_bissecante`` para os parâmetros.
+
+    :returns: Dicionário com as listas ``ks``, ``distancias_otimas_lista``,
+        ``medioides_otimos_lista``, ``ks_min_otimos_lista``,
+        ``WSs_total_otimo_lista`` e ``estatisticas_lista``, alinhadas por k.
+    """
+    resultados = novo_resultado_da_varredura()
+    for k, resultado, estatisticas in iterar_varredura_bissecante(
+            num_de_k_inicial, K, sementes, num_max_I, **opcoes_do_k_means):
+        acrescentar_resultado(resultados, k, resultado, estatisticas)
+
+    return resultados
+
+
+def iterar_varredura_k_medoides(
+        num_de_k_inicial: int,
+        K: int,
+        sementes: np.ndarray,
+        num_max_I: int,
+        **opcoes_do_k_medoides: Any) -> Iterator[Tuple[int, tuple, Dict[str, Any]]]:
+    r"""
+    Varre k de ``num_de_k_inicial`` até ``K`` com o k-medoides (FasterPAM).
+
+    A matriz de distâncias condensada (float32) é calculada uma única vez e
+    compartilhada por todos os k. O primeiro k é ajustado do zero por
+    ``functions.k_medoides.k_medoides``; cada k seguinte parte dos medioides
+    de k - 1 mais um elemento sorteado por amostragem D², de modo que poucas
+    passagens de trocas bastam.
+
+    Com ``colapsar_repetidas=True``, as linhas idênticas são colapsadas uma
+    única vez para toda a varredura (a matriz de distâncias é a das linhas
+    únicas) e os resultados de cada k são expandidos de volta para as linhas
+    originais.
+
+    :param num_de_k_inicial: Número de k inicial.
+    :param K: Número total de k-clusters.
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param num_max_I: Número máximo de passagens de trocas de cada ajuste.
+    :param opcoes_do_k_medoides: Demais argumentos nomeados de ``k_medoides``.
+    :returns: Iterador de ``(k, resultado, estatisticas)`` em ordem crescente
+        de k, em que ``resultado`` tem a forma da tupla retornada por
+        ``k_means`` e ``estatisticas["indices_dos_medioides"]`` são as linhas
+        de ``sementes`` escolhidas como medioides.
+    """
+    sementes = km.converter_sementes(sementes, np.float64)
+
+    if opcoes_do_k_medoides.pop("colapsar_repetidas", False):
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(
+            sementes, opcoes_do_k_medoides.get("sample_weight"))
+        opcoes_do_k_medoides["sample_weight"] = pesos
+        primeiras_ocorrencias = np.unique(inversa, return_index=True)[1]
+        for k, resultado, estatisticas in iterar_varredura_k_medoides(
+                num_de_k_inicial, K, sementes, num_max_I, **opcoes_do_k_medoides):
+            estatisticas["indices_dos_medioides"] = \
+                primeiras_ocorrencias[estatisticas["indices_dos_medioides"]]
+            yield k, lr.expandir_resultado(resultado, inversa), estatisticas
+        return
+
+    if opcoes_do_k_medoides.get("distancias") is None:
+        opcoes_do_k_medoides["distancias"] = kmd.matriz_de_distancias_condensada(
+            sementes, memoria_maxima=opcoes_do_k_medoides.get("memoria_maxima"))
+    semente_aleatoria = opcoes_do_k_medoides.pop("semente_aleatoria", None)
+    gerador = ss.obter_gerador(None if semente_aleatoria is None
+                               else np.random.default_rng(semente_aleatoria))
+    pesos = opcoes_do_k_medoides.get("sample_weight")
+
+    resultado = None
+    indices = None
+    for k in range(num_de_k_inicial, K + 1, 1):
+        estatisticas: Dict[str, Any] = {}
+        if resultado is not None:
+            potenciais = resultado[0].ravel() ** 2
+            if pesos is not None:
+                potenciais = potenciais * pesos
+            total = float(np.sum(potenciais))
+            # Os medioides estão a distância nula de si mesmos
+            if total <= 0.0:
+                raise ValueError("Não há linhas distintas suficientes para " +
+                                 str(k) + " medioides.")
+            indices = np.append(indices, int(gerador.choice(potenciais.size,
+                                                            p=potenciais / total)))
+        resultado = kmd.k_medoides(num_de_k_inicial, k, sementes, num_max_I,
+                                   estatisticas=estatisticas,
+                                   indices_iniciais=indices,
+                                   semente_aleatoria=semente_aleatoria,
+                                   **opcoes_do_k_medoides)
+        indices = estatisticas["indices_dos_medioides"]
+        yield k, resultado, estatisticas
+
+
+def varrer_k_medoides(num_de_k_inicial: int,
+                      K: int,
+                      sementes: np.ndarray,
+                      num_max_I: int,
+                      **opcoes_do_k_medoides: Any) -> Dict[str, List[Any]]:
+    r"""
+    Varre k com o k-medoides (FasterPAM) e reúne os resultados por k.
+
+    Ver ``iterar_varredura_k_medoides`` para os parâmetros.
+
+    :returns: Dicionário com as listas ``ks``, ``distancias_otimas_lista``,
+        ``medioides_otimos_lista``, ``ks_min_otimos_lista``,
+        ``WSs_total_otimo_lista`` e ``estatisticas_lista``, alinhadas por k.
+    """
+    resultados = novo_resultado_da_varredura()
+    for k, resultado, estatisticas in iterar_varredura_k_medoides(
+            num_de_k_inicial, K, sementes, num_max_I, **opcoes_do_k_medoides):
+        acrescentar_resultado(resultados, k, resultado, estatisticas)
+
+    return resultados
+
+
+def iterar_varredura_clara(
+        num_de_k_inicial: int,
+        K: int,
+        sementes: np.ndarray,
+        num_max_I: int,
+        semente_aleatoria: Optional[int] = None,
+        **opcoes_do_clara: Any) -> Iterator[Tuple[int, tuple, Dict[str, Any]]]:
+    r"""
+    Varre k de ``num_de_k_inicial`` até ``K`` com o k-medoides por amostragem
+    (``functions.k_medoides.clara``).
+
+    Cada k ajusta as suas amostras em paralelo (``n_jobs``) e as avalia sobre
+    todos os dados; nenhuma matriz de distâncias de todos os dados é
+    calculada. Com ``colapsar_repetidas=True``, as linhas idênticas são
+    colapsadas uma única vez para toda a varredura.
+
+    :param num_de_k_inicial: Número de k inicial.
+    :param K: Número total de k-clusters.
+    :param sementes: Matriz de dados (n x p), densa ou esparsa (CSR).
+    :param num_max_I: Número máximo de passagens de trocas de cada amostra.
+    :param semente_aleatoria: Semente da varredura; sem ela, é sorteada do
+        estado global do NumPy.
+    :param opcoes_do_clara: Demais argumentos nomeados de ``clara``.
+    :returns: Iterador de ``(k, resultado, estatisticas)`` em ordem crescente
+        de k, em que ``resultado`` tem a forma da tupla retornada por
+        ``k_means``.
+    """
+    sementes = km.converter_sementes(sementes, np.float64)
+
+    if opcoes_do_clara.pop("colapsar_repetidas", False):
+        sementes, pesos, inversa = lr.colapsar_linhas_repetidas(
+            sementes, opcoes_do_clara.get("sample_weight"))
+        opcoes_do_clara["sample_weight"] = pesos
+        primeiras_ocorrencias = np.unique(inversa, return_index=True)[1]
+        for k, resultado, estatisticas in iterar_varredura_clara(
+                num_de_k_inicial, K, sementes, num_max_I, semente_aleatoria,
+                **opcoes_do_clara):
+            estatisticas["indices_dos_medioides"] = \
+                primeiras_ocorrencias[estatisticas["indices_dos_medioides"]]
+            yield k, lr.expandir_resultado(resultado, inversa), estatisticas
+        return
+
+    ks = list(range(num_de_k_inicial, K + 1, 1))
+    if semente_aleatoria is None:
+        semente_aleatoria = np.random.randint(0, 2 ** 31 - 1)
+    sementes_dos_ks = np.random.SeedSequence(semente_aleatoria).spawn(len(ks))
+
+    for k, semente_do_k in zip(ks, sementes_dos_ks):
+        estatisticas: Dict[str, Any] = {}
+        resultado = kmd.clara(num_de_k_inicial, k, sementes, num_max_I,
+                              estatisticas=estatisticas,
+                              semente_aleatoria=int(semente_do_k.generate_state(1)[0]),
+                              **opcoes_do_clara)
+        yield k, resultado, estatisticas
+
+
+def varrer_k_clara(num_de_k_inicial: int,
+                   K: int,
+                   sementes: np.ndarray,
+                   num_max_I: int,
+                   **opcoes_do_clara: Any) -> Dict[str, List[Any]]:
+    r"""
+    Varre k com o k-medoides por amostragem (CLARA) e reúne os resultados
+    por k.
+
+    Ver ``iterar_varredura_clara`` para os parâmetros.
+
+    :returns: Dicionário com as listas ``ks``, ``distancias_otimas_lista``,
+        ``medioides_otimos_lista``, ``ks_min_otimos_lista``,
+        ``WSs_total_otimo_lista`` e ``estatisticas_lista``, alinhadas por k.
+    """
+    resultados = novo_resultado_da_varredura()
+    for k, resultado, estatisticas in iterar_varredura_clara(
+            num_de_k_inicial, K, sementes, num_max_I, **opcoes_do_clara):
+        acrescentar_resultado(resultados, k, resultado, estatisticas)
+
+    return resultados
+
+
+def iterar_varredura_k_prototypes(
+        num_de_k_inicial: int,
+        K: int,
+        sementes,
+        codigos: np.ndarray,
+        num_max_I: int,
+        **opcoes_do_k_prototypes: Any) -> Iterator[Tuple[int, tuple, Dict[str, Any]]]:
+    r"""
+    Varre k de ``num_de_k_inicial`` até ``K`` com o k-prototypes.
+
+    O peso :math:`\gamma` das variáveis categóricas é estimado uma única vez
+    (``functions.k_prototypes.gama_automatico``), de modo que os WS totais
+    de todos os k são comparáveis no Elbow Data Chart.
+
+    :param num_de_k_inicial: Número de k inicial.
+    :param K: Número total de k-clusters.
+    :param sementes: Bloco numérico (n x p), denso ou esparso (CSR).
+    :param codigos: Códigos categóricos (n x q), de
+        ``functions.k_modes.codificar_categoricas``.
+    :param num_max_I: Número máximo de iterações de cada ajuste.
+    :param opcoes_do_k_prototypes: Demais argumentos nomeados de
+        ``k_prototypes``.
+    :returns: Iterador de ``(k, resultado, estatisticas)`` em ordem crescente
+        de k, em que ``resultado`` tem a forma da tupla retornada por
+        ``k_means``.
+    """
+    if opcoes_do_k_prototypes.get("gama") is None:
+        opcoes_do_k_prototypes["gama"] = kp.gama_automatico(
+            sementes, opcoes_do_k_prototypes.get("sample_weight"))
+
+    for k in range(num_de_k_inicial, K + 1, 1):
+        estatisticas: Dict[str, Any] = {}
+        resultado = kp.k_prototypes(num_de_k_inicial, k, sementes, codigos, num_max_I,
+                                    estatisticas=estatisticas, **opcoes_do_k_prototypes)
+        yield k, resultado, estatisticas
+
+
+def ligacao_das_divisoes(divisoes: List[Dict[str, Any]],
+                         ks_min: np.ndarray) -> np.ndarray:
+    r"""
+    Converte a árvore de divisões do k-means bissecante em uma matriz de
+    ligação do SciPy (``scipy.cluster.hierarchy.linkage``) sobre os elementos.
+
+    Os elementos de cada cluster são unidos entre si na altura 0; em seguida,
+    as divisões são desfeitas da última para a primeira, cada uma na altura
+    do WS total antes dela, normalizado pelo WS total de k = 1 (a altura é
+    tornada não decrescente, como exige o dendrograma).
+
+    :param divisoes: Divisões até k, na ordem em que ocorreram (as
+        ``estatisticas["divisoes"]`` de ``iterar_varredura_bissecante``).
+    :param ks_min: Etiquetas dos elementos em k (n,) ou (n, 1).
+    :returns: Matriz de ligação (n - 1 x 4).
+    """
+    ks_min = np.asarray(ks_min, dtype=int).ravel()
+    n = ks_min.size
+    k = len(divisoes) + 1
+    ligacao = np.empty((n - 1, 4))
+    tamanhos = np.bincount(ks_min, minlength=k)
+    nos = np.full(k, -1)
+    linha = 0
+
+    # Elementos de cada cluster, em cadeia, na altura 0
+    ordem = np.argsort(ks_min, kind="stable")
+    inicios = np.concatenate(([0], np.cumsum(tamanhos)))
+    for cluster in range(k):
+        membros = ordem[inicios[cluster]:inicios[cluster + 1]]
+        if membros.size == 0:
+            continue
+        num_de_unioes = membros.size - 1
+        novos_nos = n + linha + np.arange(num_de_unioes)
+        ligacao[linha:linha + num_de_unioes, 0] = np.concatenate(
+            ([membros[0]], novos_nos[:-1]))
+        ligacao[linha:linha + num_de_unioes, 1] = membros[1:]
+        ligacao[linha:linha + num_de_unioes, 2] = 0.0
+        ligacao[linha:linha + num_de_unioes, 3] = np.arange(2, membros.size + 1)
+        nos[cluster] = novos_nos[-1] if num_de_unioes > 0 else membros[0]
+        linha += num_de_unioes
+
+    # Divisões desfeitas da última para a primeira
+    alturas = np.maximum.accumulate(np.array(
+        [divisao["WS_antes"] for divisao in reversed(divisoes)], dtype=float))
+    if divisoes:
+        alturas /= max(divisoes[0]["WS_antes"], np.finfo(float).tiny)
+    for divisao, altura in zip(reversed(divisoes), alturas):
+        dividido, novo = divisao["cluster_dividido"], divisao["novo_cluster"]
+        if nos[novo] < 0:
+            continue
+        if nos[dividido] < 0:
+            nos[dividido], tamanhos[dividido] = nos[novo], tamanhos[novo]
+            continue
+        tamanhos[dividido] += tamanhos[novo]
+        ligacao[linha] = (nos[dividido], nos[novo], altura, tamanhos[dividido])
+        nos[dividido] = n + linha
+        linha += 1
+
+    return ligacao
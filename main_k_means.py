@@ -18,13 +18,20 @@ Data da última modificação: Conforme registrado pelo computador.
 import time as time
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 import os as os
+import multiprocessing as mp
 import pickle as pkl
 import functions.validacoes_das_variaveis as vv
 import functions.k_means as km
+import functions.k_modes as kmo
+import functions.k_prototypes as kp
+import functions.coreset as cs
+import functions.varredura_de_k as vk
 import functions.gerar_grafico_elbow_data as ed
 import functions.gerar_relatorio_dos_clusteres as re
 import functions.gerar_grafico_dendrograma as de
+from functions.modelo_k_means import KMeansModel
 # Comentei para poder ser executado também em Sistemas Operacionais Linux:
 # import winsound as winsound
 
@@ -54,6 +61,10 @@ Observações práticas
 
   - Padronize as features antes do k-means (ex.: z-score) para equilibrar escalas.
 
+  - Alternativa à exportação One-Hot: o banco de dados bruto, com as colunas
+  categóricas como texto, é agrupado pelo k-prototypes (médias nas numéricas
+  e modas nas categóricas), sem dummies e sem distâncias artificiais.
+
   Se quiser, eu preparo e executo o k-means sobre esse “Cleaned Numeric Export — One-Hot
   (Filtered)” com padronização e número de clusters k definido por você.
 """
@@ -98,8 +109,34 @@ print("---")
 print("\nVARIÁVEL(IS):")
 # print("")
 
-# sementes = Sementes do BIG Data
-sementes = bd_auxiliar.values
+# tipo_de_dado = Precisão do cálculo das distâncias (np.float32 ou np.float64);
+# np.float32 usa metade da memória e é mais rápido, mas os WS relatados mudam:
+# um ajuste completo difere do de np.float64 em cerca de 1e-5 (relativo) e até
+# 1e-3 quando o arredondamento leva a outro ótimo local
+tipo_de_dado = np.float64
+
+# colunas_categoricas = Colunas não numéricas do banco de dados (por exemplo,
+# fabricante ou tipo de motor); codificadas uma única vez como inteiros
+# compactos (uint8/uint16) e agrupadas pelo k-prototypes, em vez de dummies
+colunas_categoricas = bd_auxiliar.select_dtypes(exclude="number").columns
+colunas_numericas = bd_auxiliar.columns.drop(colunas_categoricas)
+if len(colunas_categoricas) > 0:
+    codigos_categoricos, categorias = \
+        kmo.codificar_categoricas(bd_auxiliar[colunas_categoricas])
+else:
+    codigos_categoricos, categorias = None, None
+
+# sementes = Sementes do BIG Data (variáveis numéricas), convertidas uma
+# única vez em uma matriz C-contígua do tipo do cálculo
+sementes = np.ascontiguousarray(bd_auxiliar[colunas_numericas].values,
+                                dtype=tipo_de_dado)
+
+# densidade_maxima_da_esparsa = Fração máxima de valores não nulos para que
+# as sementes sejam mantidas como matriz esparsa (CSR), caso das exportações
+# one-hot (dummies); o k-means e os índices de validação não as densificam
+densidade_maxima_da_esparsa = 0.25
+if np.count_nonzero(sementes) <= densidade_maxima_da_esparsa * sementes.size:
+    sementes = sp.csr_matrix(sementes)
 
 # n = Número total de elementos
 n = sementes.shape[0]
@@ -159,18 +196,134 @@ populacao = \
 tempo_inicio = time.time()
 tempo_inicio_CPU = time.perf_counter()
 
-# os medioides_otimos devem ser um arranjo
-medioides_otimos_lista = []
-ks_min_otimos_lista = []
-WSs_total_otimo_lista = []
-
-for k in range(num_de_k_inicial, K + 1, 1):
-    [distancias_otimas, medioides_otimos, \
-    ks_min_otimos, WS_total_otimo] = \
-        km.k_means(num_de_k_inicial, k, sementes, num_max_I)
-    medioides_otimos_lista.append(medioides_otimos)
-    ks_min_otimos_lista.append(ks_min_otimos)
-    WSs_total_otimo_lista.append(WS_total_otimo)
+# Modo da varredura de k:
+#   "paralela"       = cada k em um processo; relatórios e dendrogramas são
+#                      gerados à medida que cada k fica pronto
+#   "partida_quente" = cada k parte dos medioides convergidos de k - 1
+#                      mais um novo medioide
+#   "bissecante"     = uma única passagem de cima para baixo, dividindo o
+#                      cluster de maior SSE com um 2-means; os dendrogramas
+#                      usam a própria árvore das divisões
+#   "k_medoides"     = k-medoides (FasterPAM): os medioides são linhas reais
+#                      do banco de dados; a matriz de distâncias (n² / 2
+#                      valores float32) é calculada uma única vez
+#   "clara"          = k-medoides por amostragem, para muitas linhas: cada k
+#                      é ajustado sobre várias amostras em paralelo e
+#                      avaliado sobre todas as linhas
+#   "k_prototypes"   = escolhido automaticamente quando há colunas categóricas
+# Este script não é protegido por "if __name__ == '__main__'": a varredura
+# paralela só é segura quando os processos são criados por "fork" (Linux)
+if mp.get_start_method() == "fork":
+    modo_da_varredura = "paralela"
+else:
+    modo_da_varredura = "partida_quente"
+# modo_da_varredura = "bissecante"
+# modo_da_varredura = "k_medoides"
+# modo_da_varredura = "clara"
+# Com colunas categóricas, a tabela mista é sempre agrupada pelo
+# k-prototypes (as demais varreduras usariam somente as numéricas)
+if codigos_categoricos is not None:
+    if modo_da_varredura != "k_prototypes":
+        print("\nColunas categóricas (" + ", ".join(map(str, colunas_categoricas)) +
+              "): o modo de varredura \"" + modo_da_varredura +
+              "\" foi substituído por \"k_prototypes\".")
+    modo_da_varredura = "k_prototypes"
+
+# Motor do k-means: com poucas variáveis e muitas linhas, o algoritmo de
+# filtragem (árvore k-d construída uma única vez para toda a varredura) sobre
+# todas as linhas, sem coreset, pois o custo de cada iteração cresce bem mais
+# devagar que n K; caso contrário, a escolha automática
+num_max_de_variaveis_para_filtragem = 3
+num_min_de_linhas_para_filtragem = 100000
+if modo_da_varredura in ("paralela", "partida_quente", "bissecante") and \
+        num_de_variaveis <= num_max_de_variaveis_para_filtragem and \
+        not sp.issparse(sementes) and n >= num_min_de_linhas_para_filtragem:
+    algoritmo_do_k_means = "filtragem"
+else:
+    algoritmo_do_k_means = "auto"
+
+# Coreset: com muitas linhas (e sem o motor de filtragem), a varredura de k
+# é executada sobre um pequeno subconjunto ponderado dos dados; os medioides
+# de cada k são depois levados a todas as linhas em uma única passagem. O
+# coreset aproxima somente o custo do k-means sobre as numéricas, sem a
+# parcela de Hamming do k-prototypes (linhas de categorias raras poderiam
+# ficar de fora): tabelas mistas usam todas as linhas. Os índices de
+# validação (CH, DB, silhueta) não aceitam pesos e, sobre o coreset
+# (amostrado por importância), seriam enviesados: com muitas linhas, são
+# calculados sobre uma amostra uniforme delas, com as etiquetas finais.
+# num_de_linhas_dos_indices = Tamanho da amostra uniforme dos índices de
+# validação com muitas linhas (o tamanho nominal do coreset, (1 + K) / epsilon²)
+num_min_de_linhas_para_coreset = 100000
+epsilon_do_coreset = 0.05
+num_de_linhas_dos_indices = int(np.ceil((1 + K) / epsilon_do_coreset ** 2))
+if n >= num_min_de_linhas_para_coreset and algoritmo_do_k_means != "filtragem" and \
+        modo_da_varredura != "k_prototypes":
+    dados_da_varredura, pesos_da_varredura, linhas_da_varredura = \
+        cs.construir_coreset(sementes, K, epsilon_do_coreset, dtype=tipo_de_dado)
+else:
+    dados_da_varredura, pesos_da_varredura = sementes, None
+    linhas_da_varredura = np.arange(n)
+if codigos_categoricos is not None:
+    codigos_da_varredura = codigos_categoricos[linhas_da_varredura]
+
+# As linhas repetidas (por exemplo, o mesmo motor ensaiado várias vezes)
+# são colapsadas em linhas únicas ponderadas; as etiquetas e distâncias de
+# cada k voltam expandidas para todas as linhas do banco de dados.
+if modo_da_varredura == "paralela":
+    varredura = vk.iterar_varredura_em_paralelo(num_de_k_inicial, K,
+                                                dados_da_varredura,
+                                                num_max_I, n_jobs=-1,
+                                                dtype=tipo_de_dado,
+                                                algorithm=algoritmo_do_k_means,
+                                                colapsar_repetidas=True,
+                                                sample_weight=pesos_da_varredura)
+elif modo_da_varredura == "bissecante":
+    varredura = vk.iterar_varredura_bissecante(num_de_k_inicial, K,
+                                               dados_da_varredura,
+                                               num_max_I,
+                                               dtype=tipo_de_dado,
+                                               algorithm=algoritmo_do_k_means,
+                                               colapsar_repetidas=True,
+                                               sample_weight=pesos_da_varredura)
+elif modo_da_varredura == "k_medoides":
+    varredura = vk.iterar_varredura_k_medoides(num_de_k_inicial, K,
+                                               dados_da_varredura,
+                                               num_max_I,
+                                               colapsar_repetidas=True,
+                                               sample_weight=pesos_da_varredura)
+elif modo_da_varredura == "k_prototypes":
+    varredura = vk.iterar_varredura_k_prototypes(num_de_k_inicial, K,
+                                                 dados_da_varredura,
+                                                 codigos_da_varredura,
+                                                 num_max_I,
+                                                 dtype=tipo_de_dado,
+                                                 sample_weight=pesos_da_varredura)
+elif modo_da_varredura == "clara":
+    varredura = vk.iterar_varredura_clara(num_de_k_inicial, K,
+                                          dados_da_varredura,
+                                          num_max_I, n_jobs=-1,
+                                          dtype=tipo_de_dado,
+                                          colapsar_repetidas=True,
+                                          sample_weight=pesos_da_varredura)
+else:
+    varredura = vk.iterar_varredura_com_partida_quente(num_de_k_inicial, K,
+                                                       dados_da_varredura,
+                                                       num_max_I,
+                                                       dtype=tipo_de_dado,
+                                                       algorithm=algoritmo_do_k_means,
+                                                       colapsar_repetidas=True,
+                                                       sample_weight=pesos_da_varredura)
+
+resultados_da_varredura = vk.novo_resultado_da_varredura()
+
+for k, resultado, estatisticas in varredura:
+
+    if pesos_da_varredura is not None:
+        # Etiquetas finais: todas as linhas, uma única passagem por k
+        resultado = km.atribuir_etiquetas(sementes, resultado[1], tipo_de_dado)
+
+    vk.acrescentar_resultado(resultados_da_varredura, k, resultado, estatisticas)
+    distancias_otimas, medioides_otimos, ks_min_otimos, WS_total_otimo = resultado
 
     # RESULTADO(S): ---
     print("\n---")
@@ -212,6 +365,11 @@ for k in range(num_de_k_inicial, K + 1, 1):
     if endereco.endswith("_") == True:
         endereco = endereco[:-1]
     endereco_antigo = endereco
+    # Varredura bissecante: a hierarquia é a árvore das divisões
+    if "divisoes" in estatisticas:
+        ligacao = vk.ligacao_das_divisoes(estatisticas["divisoes"], ks_min_otimos)
+    else:
+        ligacao = None
     de.gerar_grafico_dendrograma(endereco,
                                 banco_de_dados,
                                 distancias_otimas,
@@ -220,17 +378,64 @@ for k in range(num_de_k_inicial, K + 1, 1):
                                 populacao,
                                 titulo_do_eixo_x_do_dendrograma,
                                 K,
-                                num_max_I)
+                                num_max_I,
+                                ligacao=ligacao)
     endereco = endereco_antigo
 
+    # Salvar o modelo de k (sem pickle), para classificar novas linhas sem
+    # refazer a varredura; os protótipos de tabelas mistas não são
+    # classificáveis pela distância euclidiana do KMeansModel
+    if modo_da_varredura != "k_prototypes":
+        pasta_dos_modelos = os.path.join(script_dir, "outputs", "modelos")
+        os.makedirs(pasta_dos_modelos, exist_ok=True)
+        modelo = KMeansModel.a_partir_do_resultado(
+            resultado,
+            configuracao={"num_de_k_inicial": num_de_k_inicial,
+                          "num_max_I": num_max_I,
+                          "algorithm": algoritmo_do_k_means,
+                          "modo_da_varredura": modo_da_varredura},
+            variaveis=colunas_numericas,
+            dtype=tipo_de_dado)
+        modelo.salvar(os.path.join(pasta_dos_modelos,
+                                   os.path.basename(endereco) + "_k_" + str(k) + ".npz"))
+
+# Os k podem ter sido concluídos fora de ordem
+resultados_da_varredura = vk.ordenar_resultado_por_k(resultados_da_varredura)
+
+# os medioides_otimos devem ser um arranjo
+medioides_otimos_lista = resultados_da_varredura["medioides_otimos_lista"]
+ks_min_otimos_lista = resultados_da_varredura["ks_min_otimos_lista"]
+WSs_total_otimo_lista = resultados_da_varredura["WSs_total_otimo_lista"]
+
+# Índices de validação: com muitas linhas, sobre uma amostra uniforme delas
+# (sem o viés da amostragem por importância do coreset), com as etiquetas
+# finais
+if n >= num_min_de_linhas_para_coreset and n > num_de_linhas_dos_indices:
+    linhas_dos_indices = np.sort(np.random.default_rng().choice(
+        n, num_de_linhas_dos_indices, replace=False))
+    sementes_dos_indices = sementes[linhas_dos_indices]
+    ks_min_dos_indices = [ks_min[linhas_dos_indices] for ks_min in ks_min_otimos_lista]
+    if codigos_categoricos is not None:
+        codigos_dos_indices = codigos_categoricos[linhas_dos_indices]
+else:
+    sementes_dos_indices = sementes
+    ks_min_dos_indices = ks_min_otimos_lista
+    codigos_dos_indices = codigos_categoricos
+if modo_da_varredura == "k_prototypes":
+    # Sobre a tabela mista agrupada: numéricas e indicadores das categorias,
+    # com as distâncias euclidianas do k-prototypes (mesmo gama de todos os k)
+    sementes_dos_indices = kp.incorporar_tabela_mista(
+        sementes_dos_indices, codigos_dos_indices,
+        resultados_da_varredura["estatisticas_lista"][0]["gama"], tipo_de_dado)
+
 # Plotar o Elbow Data Chart e salvar relatório com sugestões/índices:
 sugestoes = ed.gerar_grafico_elbow_data(endereco,
                                         num_de_k_inicial,
                                         K,
                                         WSs_total_otimo_lista,
                                         num_max_I,
-                                        sementes=sementes,
-                                        ks_min_otimos_lista=ks_min_otimos_lista)
+                                        sementes=sementes_dos_indices,
+                                        ks_min_otimos_lista=ks_min_dos_indices)
 
 print("\nSuggested k (objective detectors):")
 for nome, k_sug in sugestoes.items():
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def gerador():
+    """Gerador de números aleatórios com semente fixa."""
+    return np.random.default_rng(0)
+
+
+@pytest.fixture(params=[2, 5], ids=["p2", "p5"])
+def dados_agrupados(request, gerador):
+    """Oito grupos gaussianos bem separados (2000 x p) e oito medioides de partida."""
+    p = request.param
+    centros = gerador.normal(scale=4.0, size=(8, p))
+    sementes = gerador.normal(size=(2000, p)) + np.repeat(centros, 250, axis=0)
+    medioides_iniciais = sementes[gerador.choice(2000, 8, replace=False)]
+    return sementes, medioides_iniciais
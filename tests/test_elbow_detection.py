@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import functions.k_means as km
+from functions.elbow_detection import validation_indices
+
+
+def test_indices_esparsos_reproduzem_densos(dados_agrupados, gerador):
+    sementes, medioides_iniciais = dados_agrupados
+    sementes = sementes * (gerador.random(sementes.shape) < 0.3)
+    etiquetas = {8: km.k_means(1, 8, sementes, 100,
+                               medioides_iniciais=medioides_iniciais)[2].ravel()}
+    densos = validation_indices(sementes, etiquetas)
+    esparsos = validation_indices(sp.csr_matrix(sementes), etiquetas)
+
+    for nome, por_k in densos.items():
+        assert esparsos[nome][8] == pytest.approx(por_k[8], rel=1e-9)
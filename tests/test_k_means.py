@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import functions.arvore_kd as akd
+import functions.k_means as km
+import functions.varredura_de_k as vk
+
+# Motores exatos: a partir dos mesmos medioides, devem reproduzir o Lloyd
+MOTORES_EXATOS = ["elkan", "hamerly", "yinyang", "filtragem"]
+
+
+@pytest.mark.parametrize("algorithm", MOTORES_EXATOS)
+def test_motor_exato_reproduz_lloyd(dados_agrupados, algorithm):
+    sementes, medioides_iniciais = dados_agrupados
+    referencia = km.k_means(1, 8, sementes, 100, algorithm="lloyd",
+                            medioides_iniciais=medioides_iniciais)
+    resultado = km.k_means(1, 8, sementes, 100, algorithm=algorithm,
+                           medioides_iniciais=medioides_iniciais)
+
+    np.testing.assert_array_equal(resultado[2], referencia[2])
+    np.testing.assert_allclose(resultado[1], referencia[1], rtol=0, atol=1e-10)
+    assert resultado[3] == pytest.approx(referencia[3], rel=1e-12)
+
+
+@pytest.mark.parametrize("algorithm", MOTORES_EXATOS)
+def test_motor_exato_evita_distancias(dados_agrupados, algorithm):
+    sementes, medioides_iniciais = dados_agrupados
+    estatisticas = {}
+    km.k_means(1, 8, sementes, 100, algorithm=algorithm, estatisticas=estatisticas,
+               medioides_iniciais=medioides_iniciais)
+
+    assert estatisticas["algorithm"] == algorithm
+    assert estatisticas["distancias_evitadas"] > 0
+
+
+def test_filtragem_com_pesos_reproduz_lloyd(dados_agrupados, gerador):
+    sementes, medioides_iniciais = dados_agrupados
+    pesos = gerador.uniform(0.5, 2.0, sementes.shape[0])
+    referencia = km.k_means(1, 8, sementes, 100, algorithm="lloyd",
+                            medioides_iniciais=medioides_iniciais, sample_weight=pesos)
+    resultado = km.k_means(1, 8, sementes, 100, algorithm="filtragem",
+                           medioides_iniciais=medioides_iniciais, sample_weight=pesos,
+                           arvore_kd=akd.construir_arvore_kd(sementes, pesos))
+
+    np.testing.assert_array_equal(resultado[2], referencia[2])
+    assert resultado[3] == pytest.approx(referencia[3], rel=1e-12)
+
+
+def test_filtragem_em_paralelo_independe_do_numero_de_processos(dados_agrupados):
+    sementes, _ = dados_agrupados
+    opcoes = {"algorithm": "filtragem", "semente_aleatoria": 3}
+    rodadas = [km.k_means(1, 8, sementes, 20, n_init=4, n_jobs=n_jobs, **opcoes)
+               for n_jobs in (1, 2)]
+    varreduras = [{k: resultado[3] for k, resultado, _ in
+                   vk.iterar_varredura_em_paralelo(2, 5, sementes, 20, n_jobs=n_jobs,
+                                                   **opcoes)}
+                  for n_jobs in (1, 2)]
+
+    np.testing.assert_array_equal(rodadas[0][2], rodadas[1][2])
+    assert rodadas[0][3] == pytest.approx(rodadas[1][3], rel=1e-12)
+    assert varreduras[0] == pytest.approx(varreduras[1], rel=1e-12)
+
+
+@pytest.mark.parametrize("algorithm", ["lloyd"] + MOTORES_EXATOS[:3])
+def test_esparsa_reproduz_densa(dados_agrupados, gerador, algorithm):
+    sementes, medioides_iniciais = dados_agrupados
+    sementes = sementes * (gerador.random(sementes.shape) < 0.3)
+    densa = km.k_means(1, 8, sementes, 100, algorithm=algorithm,
+                       medioides_iniciais=medioides_iniciais)
+    esparsa = km.k_means(1, 8, sp.csr_matrix(sementes), 100, algorithm=algorithm,
+                         medioides_iniciais=medioides_iniciais)
+
+    np.testing.assert_array_equal(esparsa[2], densa[2])
+    np.testing.assert_allclose(esparsa[0], densa[0], rtol=1e-9, atol=1e-9)
+    assert esparsa[3] == pytest.approx(densa[3], rel=1e-9)
+
+
+@pytest.fixture
+def linhas_repetidas(dados_agrupados, gerador):
+    """Linhas únicas, repetições inteiras de cada uma e as linhas repetidas."""
+    unicas, medioides_iniciais = dados_agrupados
+    repeticoes = gerador.integers(1, 5, unicas.shape[0])
+    return unicas, repeticoes, np.repeat(unicas, repeticoes, axis=0), medioides_iniciais
+
+
+@pytest.mark.parametrize("algorithm", ["lloyd", "hamerly"])
+def test_colapso_reproduz_ajuste_sem_colapso(linhas_repetidas, algorithm):
+    _, _, sementes, medioides_iniciais = linhas_repetidas
+    referencia = km.k_means(1, 8, sementes, 100, algorithm=algorithm,
+                            medioides_iniciais=medioides_iniciais)
+    colapsado = km.k_means(1, 8, sementes, 100, algorithm=algorithm,
+                           medioides_iniciais=medioides_iniciais,
+                           colapsar_repetidas=True)
+
+    np.testing.assert_array_equal(colapsado[2], referencia[2])
+    np.testing.assert_allclose(colapsado[0], referencia[0], rtol=1e-9, atol=1e-9)
+    assert colapsado[3] == pytest.approx(referencia[3], rel=1e-9)
+
+
+def test_pesos_inteiros_reproduzem_linhas_repetidas(linhas_repetidas):
+    unicas, repeticoes, sementes, medioides_iniciais = linhas_repetidas
+    referencia = km.k_means(1, 8, sementes, 100, medioides_iniciais=medioides_iniciais)
+    ponderado = km.k_means(1, 8, unicas, 100, medioides_iniciais=medioides_iniciais,
+                           sample_weight=repeticoes)
+
+    np.testing.assert_array_equal(np.repeat(ponderado[2], repeticoes, axis=0),
+                                  referencia[2])
+    np.testing.assert_allclose(ponderado[1], referencia[1], rtol=1e-9, atol=1e-9)
+    assert ponderado[3] == pytest.approx(referencia[3], rel=1e-9)
+
+
+def test_pesos_compartilhados_independem_do_numero_de_processos(linhas_repetidas):
+    _, _, sementes, _ = linhas_repetidas
+    opcoes = {"semente_aleatoria": 5, "colapsar_repetidas": True}
+    rodadas = [km.k_means(1, 8, sementes, 20, n_init=4, n_jobs=n_jobs, **opcoes)
+               for n_jobs in (1, 2)]
+    varreduras = [{k: resultado[3] for k, resultado, _ in
+                   vk.iterar_varredura_em_paralelo(2, 5, sementes, 20, n_jobs=n_jobs,
+                                                   **opcoes)}
+                  for n_jobs in (1, 2)]
+
+    np.testing.assert_array_equal(rodadas[0][2], rodadas[1][2])
+    assert rodadas[0][3] == pytest.approx(rodadas[1][3], rel=1e-12)
+    assert varreduras[0] == pytest.approx(varreduras[1], rel=1e-12)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from scipy.spatial.distance import pdist, squareform
+
+import functions.k_medoides as kmd
+
+
+@pytest.fixture
+def amostra_agrupada(dados_agrupados, gerador):
+    """Amostra pequena (160 linhas) dos dados agrupados, para a busca exaustiva."""
+    sementes, _ = dados_agrupados
+    return sementes[gerador.choice(sementes.shape[0], 160, replace=False)]
+
+
+@pytest.mark.parametrize("esparsa", [False, True], ids=["densa", "esparsa"])
+def test_matriz_condensada_reproduz_pdist(amostra_agrupada, esparsa):
+    sementes = sp.csr_matrix(amostra_agrupada) if esparsa else amostra_agrupada
+    distancias = kmd.matriz_de_distancias_condensada(sementes, dtype=np.float64,
+                                                     memoria_maxima=4096)
+
+    np.testing.assert_allclose(distancias, pdist(amostra_agrupada),
+                               rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("ponderado", [False, True], ids=["sem_pesos", "com_pesos"])
+def test_fasterpam_nao_melhora_com_uma_troca(amostra_agrupada, gerador, ponderado):
+    n = amostra_agrupada.shape[0]
+    pesos = gerador.uniform(0.5, 2.0, n) if ponderado else np.ones(n)
+    estatisticas = {}
+    _, medioides, ks_min, WS_total = kmd.k_medoides(
+        1, 4, amostra_agrupada, 100, estatisticas=estatisticas, semente_aleatoria=1,
+        sample_weight=pesos if ponderado else None)
+    indices = estatisticas["indices_dos_medioides"]
+
+    # Os medioides são linhas reais dos dados
+    np.testing.assert_array_equal(medioides, amostra_agrupada[indices])
+    assert estatisticas["convergiu"]
+
+    distancias = squareform(pdist(amostra_agrupada))
+
+    def custo(escolhidos):
+        return float(pesos @ np.min(distancias[:, escolhidos], axis=1))
+
+    assert WS_total == pytest.approx(custo(indices), rel=1e-6)
+    np.testing.assert_array_equal(ks_min.ravel(),
+                                  np.argmin(distancias[:, indices], axis=1))
+    # Nenhuma troca de um medioide por outro elemento reduz o custo
+    for posicao in range(indices.size):
+        for candidato in np.setdiff1d(np.arange(n), indices):
+            trocados = indices.copy()
+            trocados[posicao] = candidato
+            assert custo(trocados) >= WS_total * (1.0 - 1e-6)
+
+
+@pytest.mark.parametrize("esparsa", [False, True], ids=["densa", "esparsa"])
+def test_clara_independe_do_numero_de_processos(dados_agrupados, gerador, esparsa):
+    sementes, _ = dados_agrupados
+    pesos = gerador.uniform(0.5, 2.0, sementes.shape[0])
+    dados = sp.csr_matrix(sementes) if esparsa else sementes
+    resultados, estatisticas = [], []
+    for n_jobs in (1, 2):
+        estatisticas.append({})
+        resultados.append(kmd.clara(1, 8, dados, 20, estatisticas=estatisticas[-1],
+                                    num_de_amostras=3, n_jobs=n_jobs,
+                                    semente_aleatoria=2, sample_weight=pesos))
+
+    indices = estatisticas[0]["indices_dos_medioides"]
+    np.testing.assert_array_equal(estatisticas[1]["indices_dos_medioides"], indices)
+    np.testing.assert_array_equal(resultados[0][1], sementes[indices])
+    np.testing.assert_array_equal(resultados[1][2], resultados[0][2])
+    # WS total de todos os dados, ponderado, igual ao da amostra escolhida
+    assert resultados[0][3] == pytest.approx(
+        float(pesos @ resultados[0][0].ravel()), rel=1e-9)
+    assert resultados[0][3] == pytest.approx(min(estatisticas[0]["WSs_das_amostras"]),
+                                             rel=1e-9)
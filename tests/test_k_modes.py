@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import functions.k_modes as kmo
+
+
+@pytest.fixture
+def codigos_agrupados(gerador):
+    """Seis grupos categóricos (600 x 5): cada grupo tem um perfil, com 30% de ruído."""
+    perfis = gerador.integers(0, 6, size=(6, 5))
+    codigos = np.repeat(perfis, 100, axis=0)
+    ruido = gerador.random(codigos.shape) < 0.3
+    codigos[ruido] = gerador.integers(0, 6, size=int(np.sum(ruido)))
+    return codigos.astype(np.uint8)
+
+
+@pytest.mark.parametrize("ponderado", [False, True], ids=["sem_pesos", "com_pesos"])
+def test_modos_sao_o_argmax_do_bincount_por_cluster(codigos_agrupados, gerador, ponderado):
+    pesos = gerador.uniform(0.5, 2.0, codigos_agrupados.shape[0]) if ponderado else None
+    estatisticas = {}
+    distancias, modos, ks_min, WS_total = kmo.k_modes(
+        1, 6, codigos_agrupados, 100, estatisticas=estatisticas, semente_aleatoria=4,
+        sample_weight=pesos)
+    ks_min = ks_min.ravel()
+
+    assert estatisticas["convergiu"]
+    for k in np.unique(ks_min):
+        do_cluster = ks_min == k
+        for j in range(codigos_agrupados.shape[1]):
+            contagens = np.bincount(codigos_agrupados[do_cluster, j],
+                                    weights=None if pesos is None else pesos[do_cluster])
+            assert modos[k, j] == np.argmax(contagens)
+
+    # Dissimilaridade de Hamming de cada elemento à moda do seu cluster
+    diferencas = np.sum(codigos_agrupados != modos[ks_min], axis=1)
+    np.testing.assert_array_equal(distancias.ravel(), diferencas)
+    assert WS_total == pytest.approx(float(np.sum(
+        diferencas if pesos is None else pesos * diferencas)), rel=1e-12)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import functions.k_means as km
+import functions.k_prototypes as kp
+
+
+@pytest.fixture
+def tabela_mista(dados_agrupados, gerador):
+    """Bloco numérico agrupado, códigos categóricos (n x 3) e medioides de partida."""
+    sementes, medioides_iniciais = dados_agrupados
+    codigos = gerador.integers(0, 4, size=(sementes.shape[0], 3)).astype(np.uint8)
+    return sementes, codigos, medioides_iniciais
+
+
+def test_gama_nulo_reproduz_k_means(tabela_mista):
+    sementes, codigos, medioides_iniciais = tabela_mista
+    prototipos_iniciais = np.hstack((medioides_iniciais,
+                                     codigos[:medioides_iniciais.shape[0]]))
+    referencia = km.k_means(1, 8, sementes, 100, algorithm="lloyd",
+                            medioides_iniciais=medioides_iniciais)
+    resultado = kp.k_prototypes(1, 8, sementes, codigos, 100, gama=0.0,
+                                prototipos_iniciais=prototipos_iniciais,
+                                dtype=np.float64)
+
+    np.testing.assert_array_equal(resultado[2], referencia[2])
+    np.testing.assert_allclose(resultado[1][:, :sementes.shape[1]], referencia[1],
+                               rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(resultado[0], referencia[0], rtol=1e-9, atol=1e-9)
+    assert resultado[3] == pytest.approx(referencia[3], rel=1e-9)
+
+
+def test_tabela_incorporada_reproduz_o_custo(tabela_mista):
+    sementes, codigos, _ = tabela_mista
+    gama = 0.7
+    distancias, prototipos, ks_min, _ = kp.k_prototypes(
+        1, 8, sementes, codigos, 100, gama=gama, semente_aleatoria=1, dtype=np.float64)
+    p = sementes.shape[1]
+    ks_min = ks_min.ravel()
+    incorporada = kp.incorporar_tabela_mista(sementes, codigos, gama).toarray()
+    # Os protótipos incorporados junto com os dados, com as mesmas categorias
+    prototipos_incorporados = kp.incorporar_tabela_mista(
+        np.vstack((sementes, prototipos[:, :p])),
+        np.vstack((codigos, prototipos[:, p:].astype(np.uint8))),
+        gama).toarray()[sementes.shape[0]:]
+
+    np.testing.assert_allclose(
+        np.linalg.norm(incorporada - prototipos_incorporados[ks_min], axis=1),
+        distancias.ravel(), rtol=1e-9, atol=1e-9)
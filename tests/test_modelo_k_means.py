@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import functions.k_means as km
+from functions.modelo_k_means import KMeansModel
+
+
+@pytest.fixture
+def modelo_e_sementes(dados_agrupados):
+    """Modelo ajustado sobre os dados agrupados e as suas sementes."""
+    sementes, medioides_iniciais = dados_agrupados
+    resultado = km.k_means(1, 8, sementes, 100, medioides_iniciais=medioides_iniciais)
+    modelo = KMeansModel.a_partir_do_resultado(resultado, configuracao={"num_max_I": 100})
+    return modelo, sementes, resultado
+
+
+@pytest.mark.parametrize("extensao", [".npz", ".json"])
+def test_salvar_e_carregar_recupera_o_modelo(modelo_e_sementes, tmp_path, extensao):
+    modelo, sementes, _ = modelo_e_sementes
+    caminho = tmp_path / ("modelo" + extensao)
+    modelo.salvar(caminho)
+    carregado = KMeansModel.carregar(caminho)
+
+    np.testing.assert_array_equal(carregado.medioides, modelo.medioides)
+    np.testing.assert_array_equal(carregado.massas, modelo.massas)
+    np.testing.assert_array_equal(carregado.etiquetas, modelo.etiquetas)
+    assert carregado.dtype == modelo.dtype
+    assert carregado.configuracao == modelo.configuracao
+    np.testing.assert_array_equal(carregado.predict(sementes), modelo.predict(sementes))
+
+
+def test_predict_reproduz_as_etiquetas_do_ajuste(modelo_e_sementes):
+    modelo, sementes, resultado = modelo_e_sementes
+
+    np.testing.assert_array_equal(modelo.predict(sementes), resultado[2].ravel())
+    np.testing.assert_allclose(np.min(modelo.transform(sementes), axis=1),
+                               resultado[0].ravel(), rtol=1e-9, atol=1e-9)
+
+
+def test_partial_fit_reproduz_reajuste_com_partida_quente(dados_agrupados, gerador):
+    sementes, medioides_iniciais = dados_agrupados
+    sementes = sementes[gerador.permutation(sementes.shape[0])]
+    anteriores, novas = sementes[:1600], sementes[1600:]
+    modelo = KMeansModel.a_partir_do_resultado(
+        km.k_means(1, 8, anteriores, 100, medioides_iniciais=medioides_iniciais))
+    medioides_anteriores = modelo.medioides.copy()
+
+    modelo.partial_fit(novas, sementes_anteriores=anteriores, num_max_iteracoes=100)
+    reajuste = km.k_means(1, 8, sementes, 100, algorithm="lloyd",
+                          medioides_iniciais=medioides_anteriores)
+
+    np.testing.assert_array_equal(modelo.etiquetas, reajuste[2].ravel())
+    np.testing.assert_allclose(modelo.medioides, reajuste[1], rtol=1e-9, atol=1e-9)
+    assert modelo.configuracao["WS_total"] == pytest.approx(reajuste[3], rel=1e-9)